@@ -0,0 +1,527 @@
+import io
+import os
+import shutil
+
+# paths handed to a backend are always relative and "/"-separated, whatever
+# the storage underneath looks like. Archive and hashing modules are imported
+# by the backends that need them so plain directory builds start faster.
+# list_files() is always sorted so builds visit files in the same order, and
+# a backend given an mtime stamps every file with it for reproducible output.
+
+# zip timestamps cannot go back further than 1980-01-01
+ZIP_EPOCH = 315532800
+
+class Backend:
+  # archives cannot take back an entry, so a page that may fail part way
+  # through must be rendered in full before it is written to one
+  can_remove = True
+
+  def list_files(self, prefix=""):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def exists(self, path):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def version(self, path):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def read_bytes(self, path):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def open_write(self, path):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def remove(self, path):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def clear(self):
+    raise NotImplementedError("To be implemented by child classes")
+
+  def close(self):
+    pass
+
+  def read_text(self, path):
+    return self.read_bytes(path).decode("utf-8")
+
+  def read_head(self, path, size):
+    return self.read_bytes(path)[:size]
+
+  def map_file(self, path, min_size=0):
+    # only backends over real files can hand out a read-only mapping
+    return None
+
+  def write_bytes(self, path, data):
+    with self.open_write(path) as f:
+      f.write(data)
+
+  def write_text(self, path, text):
+    self.write_bytes(path, text.encode("utf-8"))
+
+  def open_text(self, path):
+    writer = CountingWriter(self.open_write(path))
+    return io.TextIOWrapper(writer, encoding="utf-8", newline="")
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+class CountingWriter(io.RawIOBase):
+  # lets open_text() callers see how many encoded bytes a page came to
+  def __init__(self, raw):
+    self.raw = raw
+    self.bytes_written = 0
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    self.raw.write(data)
+    self.bytes_written += len(data)
+    return len(data)
+
+  def close(self):
+    if not self.closed:
+      self.raw.close()
+    super().close()
+
+def under_prefix(path, prefix):
+  return prefix == "" or path.startswith(prefix.rstrip("/") + "/")
+
+class DirectoryBackend(Backend):
+  def __init__(self, root, mtime=None):
+    self.root = root
+    self.mtime = mtime
+
+  def full_path(self, path):
+    return os.path.join(self.root, *path.split("/"))
+
+  def list_files(self, prefix=""):
+    base = self.full_path(prefix) if prefix else self.root
+    files = []
+    for dir_path, dirnames, filenames in os.walk(base):
+      dirnames.sort()
+      for filename in sorted(filenames):
+        relative_path = os.path.relpath(os.path.join(dir_path, filename), self.root)
+        files.append(relative_path.replace(os.sep, "/"))
+    return files
+
+  def exists(self, path):
+    return os.path.isfile(self.full_path(path))
+
+  def version(self, path):
+    stat = os.stat(self.full_path(path))
+    return (stat.st_mtime_ns, stat.st_size)
+
+  def read_bytes(self, path):
+    with open(self.full_path(path), "rb") as f:
+      return f.read()
+
+  def read_head(self, path, size):
+    with open(self.full_path(path), "rb") as f:
+      return f.read(size)
+
+  def map_file(self, path, min_size=0):
+    import mmap
+    full_path = self.full_path(path)
+    size = os.path.getsize(full_path)
+    if size == 0 or size < min_size:
+      return None
+    with open(full_path, "rb") as f:
+      return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+  def open_write(self, path):
+    full_path = self.full_path(path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    return open(full_path, "wb")
+
+  def remove(self, path):
+    os.remove(self.full_path(path))
+
+  def clear(self):
+    if os.path.exists(self.root):
+      shutil.rmtree(self.root)
+
+  def close(self):
+    if self.mtime is None or not os.path.exists(self.root):
+      return
+    for dir_path, _, filenames in os.walk(self.root):
+      for filename in filenames:
+        os.utime(os.path.join(dir_path, filename), (self.mtime, self.mtime))
+      os.utime(dir_path, (self.mtime, self.mtime))
+
+class MemoryWriter(io.BytesIO):
+  # buffers one file and hands it to backend.store() when closed
+  def __init__(self, backend, path):
+    super().__init__()
+    self.backend = backend
+    self.path = path
+
+  def close(self):
+    if not self.closed:
+      self.backend.store(self.path, self.getvalue())
+    super().close()
+
+class MemoryBackend(Backend):
+  def __init__(self, files=None):
+    self.files = {}
+    self.revisions = {}
+    for path, data in (files or {}).items():
+      self.store(path, data.encode("utf-8") if isinstance(data, str) else data)
+
+  def store(self, path, data):
+    self.files[path] = data
+    self.revisions[path] = self.revisions.get(path, 0) + 1
+
+  def list_files(self, prefix=""):
+    return sorted(path for path in self.files if under_prefix(path, prefix))
+
+  def exists(self, path):
+    return path in self.files
+
+  def version(self, path):
+    if path not in self.files:
+      raise FileNotFoundError(path)
+    return self.revisions[path]
+
+  def read_bytes(self, path):
+    if path not in self.files:
+      raise FileNotFoundError(path)
+    return self.files[path]
+
+  def open_write(self, path):
+    return MemoryWriter(self, path)
+
+  def write_bytes(self, path, data):
+    self.store(path, bytes(data))
+
+  def remove(self, path):
+    del self.files[path]
+    # revisions keep counting, so a path written again never repeats a version
+    self.revisions[path] += 1
+
+  def clear(self):
+    for path in self.files:
+      self.revisions[path] += 1
+    self.files.clear()
+
+class ZipBackend(Backend):
+  can_remove = False
+
+  def __init__(self, file, mode="r", mtime=None):
+    import zipfile
+    self.mode = mode
+    self.mtime = mtime
+    self.archive = zipfile.ZipFile(
+      file,
+      mode,
+      compression=zipfile.ZIP_DEFLATED,
+    )
+
+  def list_files(self, prefix=""):
+    return sorted(
+      name for name in self.archive.namelist()
+      if not name.endswith("/") and under_prefix(name, prefix)
+    )
+
+  def exists(self, path):
+    try:
+      self.archive.getinfo(path)
+    except KeyError:
+      return False
+    return True
+
+  def version(self, path):
+    info = self.archive.getinfo(path)
+    return (info.CRC, info.file_size)
+
+  def read_bytes(self, path):
+    try:
+      return self.archive.read(path)
+    except KeyError:
+      raise FileNotFoundError(path)
+
+  def open_write(self, path):
+    if self.mtime is None:
+      return self.archive.open(path, "w")
+    import time
+    import zipfile
+    date_time = time.gmtime(max(self.mtime, ZIP_EPOCH))[:6]
+    info = zipfile.ZipInfo(path, date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return self.archive.open(info, "w")
+
+  def remove(self, path):
+    raise NotImplementedError("Entries cannot be removed from a zip archive")
+
+  def clear(self):
+    if self.archive.namelist():
+      raise NotImplementedError("A zip archive can only be built from scratch")
+
+  def close(self):
+    self.archive.close()
+
+class TarBackend(Backend):
+  can_remove = False
+
+  def __init__(self, file, mode="r", mtime=None):
+    import tarfile
+    import threading
+    self.mode = mode
+    self.mtime = mtime
+    self.compressed_file = None
+    self.owned_file = None
+    if mode == "w:gz" and mtime is not None:
+      # tarfile stamps the gzip header with the current time and file name
+      import gzip
+      if isinstance(file, (str, os.PathLike)):
+        self.owned_file = file = open(file, "wb")
+      self.compressed_file = gzip.GzipFile(
+        filename="",
+        mode="wb",
+        fileobj=file,
+        mtime=mtime,
+      )
+      self.archive = tarfile.open(fileobj=self.compressed_file, mode="w")
+    elif isinstance(file, (str, os.PathLike)):
+      self.archive = tarfile.open(file, mode)
+    else:
+      self.archive = tarfile.open(fileobj=file, mode=mode)
+    self.members = None
+    # extractfile() shares the archive's file position between callers
+    self.read_lock = threading.Lock()
+
+  def member_map(self):
+    if self.members is None:
+      self.members = {
+        member.name: member
+        for member in self.archive.getmembers()
+        if member.isfile()
+      }
+    return self.members
+
+  def list_files(self, prefix=""):
+    return sorted(name for name in self.member_map() if under_prefix(name, prefix))
+
+  def exists(self, path):
+    return path in self.member_map()
+
+  def version(self, path):
+    member = self.member_map()[path]
+    return (member.mtime, member.size)
+
+  def read_bytes(self, path):
+    if path not in self.member_map():
+      raise FileNotFoundError(path)
+    with self.read_lock:
+      return self.archive.extractfile(self.member_map()[path]).read()
+
+  def open_write(self, path):
+    return MemoryWriter(self, path)
+
+  def store(self, path, data):
+    # tar headers need the size up front, so each file is buffered once and
+    # appended to the stream; nothing touches the host filesystem per file
+    import tarfile
+    info = tarfile.TarInfo(path)
+    info.size = len(data)
+    info.mode = 0o644
+    if self.mtime is not None:
+      info.mtime = self.mtime
+    self.archive.addfile(info, io.BytesIO(data))
+    if self.members is not None:
+      self.members[path] = info
+
+  def remove(self, path):
+    raise NotImplementedError("Entries cannot be removed from a tar archive")
+
+  def clear(self):
+    if self.mode.startswith("r"):
+      raise NotImplementedError("A tar archive can only be built from scratch")
+
+  def close(self):
+    self.archive.close()
+    if self.compressed_file is not None:
+      self.compressed_file.close()
+    if self.owned_file is not None:
+      self.owned_file.close()
+
+class ContentAddressedBackend(Backend):
+  def __init__(self, root):
+    import json
+    self.root = root
+    self.manifest_path = os.path.join(root, "manifest.json")
+    self.manifest = {}
+    self.blobs_written = 0
+    self.blobs_reused = 0
+    try:
+      with open(self.manifest_path, encoding="utf-8") as f:
+        self.manifest = json.load(f)
+    except FileNotFoundError:
+      pass
+
+  def blob_path(self, digest):
+    return os.path.join(self.root, "blobs", digest[:2], digest[2:])
+
+  def list_files(self, prefix=""):
+    return sorted(path for path in self.manifest if under_prefix(path, prefix))
+
+  def exists(self, path):
+    return path in self.manifest
+
+  def version(self, path):
+    if path not in self.manifest:
+      raise FileNotFoundError(path)
+    return self.manifest[path]
+
+  def read_bytes(self, path):
+    if path not in self.manifest:
+      raise FileNotFoundError(path)
+    with open(self.blob_path(self.manifest[path]), "rb") as f:
+      return f.read()
+
+  def open_write(self, path):
+    return MemoryWriter(self, path)
+
+  def store(self, path, data):
+    import hashlib
+    import threading
+    digest = hashlib.sha256(data).hexdigest()
+    blob_path = self.blob_path(digest)
+    if os.path.exists(blob_path):
+      self.blobs_reused += 1
+    else:
+      os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+      # threads writing the same new blob each need their own temporary file
+      tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+      with open(tmp_path, "wb") as f:
+        f.write(data)
+      os.replace(tmp_path, blob_path)
+      self.blobs_written += 1
+    self.manifest[path] = digest
+
+  def remove(self, path):
+    del self.manifest[path]
+
+  def clear(self):
+    # blobs are kept so the next build can reuse every unchanged output
+    self.manifest = {}
+
+  def collect_garbage(self):
+    live = set(self.manifest.values())
+    removed = 0
+    blobs_dir = os.path.join(self.root, "blobs")
+    for dir_path, _, filenames in os.walk(blobs_dir):
+      for filename in filenames:
+        digest = os.path.basename(dir_path) + filename
+        if digest not in live:
+          os.remove(os.path.join(dir_path, filename))
+          removed += 1
+    return removed
+
+  def export(self, output):
+    for path in sorted(self.manifest):
+      output.write_bytes(path, self.read_bytes(path))
+
+  def close(self):
+    import json
+    os.makedirs(self.root, exist_ok=True)
+    tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      json.dump(self.manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, self.manifest_path)
+
+class ArchiveUpdate(Backend):
+  # archives cannot drop or replace entries in place, so an incremental build
+  # into one holds its writes in memory and, on a clean close, writes a new
+  # archive with them and every old entry it did not rewrite or remove
+  def __init__(self, target, open_archive):
+    self.target = target
+    self.open_archive = open_archive
+    self.previous = open_input_backend(target)
+    self.written = MemoryBackend()
+    self.removed = set()
+
+  def list_files(self, prefix=""):
+    paths = set(self.previous.list_files(prefix)) - self.removed
+    return sorted(paths | set(self.written.list_files(prefix)))
+
+  def exists(self, path):
+    if self.written.exists(path):
+      return True
+    return path not in self.removed and self.previous.exists(path)
+
+  def version(self, path):
+    if self.written.exists(path):
+      return ("written", self.written.version(path))
+    if path in self.removed:
+      raise FileNotFoundError(path)
+    return self.previous.version(path)
+
+  def read_bytes(self, path):
+    if self.written.exists(path):
+      return self.written.read_bytes(path)
+    if path in self.removed:
+      raise FileNotFoundError(path)
+    return self.previous.read_bytes(path)
+
+  def open_write(self, path):
+    self.removed.discard(path)
+    return self.written.open_write(path)
+
+  def remove(self, path):
+    if self.written.exists(path):
+      self.written.remove(path)
+    self.removed.add(path)
+
+  def clear(self):
+    raise NotImplementedError("An archive update keeps the existing entries")
+
+  def close(self):
+    tmp_path = f"{self.target}.{os.getpid()}.tmp"
+    try:
+      with self.open_archive(tmp_path) as archive:
+        for path in self.list_files():
+          archive.write_bytes(path, self.read_bytes(path))
+    finally:
+      self.previous.close()
+    os.replace(tmp_path, self.target)
+
+  def __exit__(self, exc_type, *exc_info):
+    if exc_type is None:
+      self.close()
+    else:
+      # a failed build leaves the previous archive as it was
+      self.previous.close()
+
+def open_archive_writer(target, mtime=None):
+  if target.endswith(".zip"):
+    return lambda path: ZipBackend(path, "w", mtime)
+  if target.endswith((".tar.gz", ".tgz")):
+    return lambda path: TarBackend(path, "w:gz", mtime)
+  if target.endswith(".tar"):
+    return lambda path: TarBackend(path, "w", mtime)
+  return None
+
+def open_output_backend(target, mtime=None, incremental=False):
+  # incremental builds (--changed, --only-failed) update an existing archive
+  # rather than starting it over
+  if target.startswith("cas:"):
+    return ContentAddressedBackend(target[len("cas:"):])
+  open_archive = open_archive_writer(target, mtime)
+  if open_archive is None:
+    return DirectoryBackend(target, mtime)
+  if incremental and os.path.exists(target):
+    return ArchiveUpdate(target, open_archive)
+  return open_archive(target)
+
+def open_input_backend(target):
+  if target.startswith("cas:"):
+    return ContentAddressedBackend(target[len("cas:"):])
+  if target.endswith(".zip"):
+    return ZipBackend(target)
+  if target.endswith((".tar.gz", ".tgz", ".tar")):
+    return TarBackend(target, "r:*")
+  return DirectoryBackend(target)
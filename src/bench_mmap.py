@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# each path runs in its own interpreter so ru_maxrss is that path's peak alone
+
+def write_sample(path, size_mb):
+  section = (
+    "## Reference entry\n\n"
+    "Some **bold** text, some `code` and a [link](/reference/entry).\n\n"
+    "- first item\n- second item\n\n"
+    "```\nvalue = compute(1, 2)\n```\n\n"
+  )
+  repeats = size_mb * (1 << 20) // len(section.encode("utf-8"))
+  with open(path, "w", encoding="utf-8") as f:
+    f.write("# Generated reference\n\n")
+    for _ in range(repeats):
+      f.write(section)
+
+def render(path, mode):
+  import resource
+  from mappedsource import MappedMarkdown
+  from frontmatter import parse_front_matter
+  from utilities import markdown_to_html_node, extract_title, write_page_to
+  template = "<title>{{ Title }}</title>{{ Content }}"
+  start = time.perf_counter()
+  with open(os.devnull, "w", encoding="utf-8") as out:
+    if mode == "mmap":
+      document = MappedMarkdown.open(path)
+      write_page_to(out, template, document.title(), document.to_html_node(), "/")
+      document.close()
+    else:
+      with open(path, encoding="utf-8") as f:
+        metadata, md = parse_front_matter(f.read())
+      title = metadata.get("title") or extract_title(md)
+      write_page_to(out, template, title, markdown_to_html_node(md), "/")
+  seconds = time.perf_counter() - start
+  max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  print(json.dumps({"seconds": seconds, "max_rss_mb": max_rss_kb / 1024}))
+
+def measure(path, mode):
+  result = subprocess.run(
+    [sys.executable, os.path.abspath(__file__), "--render", mode, path],
+    cwd=SRC_DIR,
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  return json.loads(result.stdout)
+
+def main():
+  if sys.argv[1:2] == ["--render"]:
+    render(sys.argv[3], sys.argv[2])
+    return
+  size_mb = int(sys.argv[1]) if len(sys.argv) >= 2 else 500
+  with tempfile.TemporaryDirectory() as root:
+    path = os.path.join(root, "reference.md")
+    write_sample(path, size_mb)
+    print(f"{size_mb} MB source")
+    for mode in ["read", "mmap"]:
+      report = measure(path, mode)
+      print(f"  {mode:>4}: {report['seconds']:7.1f} s  peak RSS {report['max_rss_mb']:8.1f} MB")
+
+if __name__ == "__main__":
+  main()
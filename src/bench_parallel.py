@@ -0,0 +1,86 @@
+import io
+import os
+import sys
+import time
+import pickle
+import tempfile
+import multiprocessing
+
+# the naive pool re-reads the template and each source in its workers and
+# pickles every rendered page back to the parent; the shared-memory pool
+# reads the corpus once and only sends status records back
+
+def write_site(root, page_count):
+  section = (
+    "## Section\n\n"
+    "Some **bold** text, some `code` and a [link](/pages/page-0).\n\n"
+    "- first item\n- second item\n\n"
+    "```python\ndef compute(a, b):\n  return a + b  # sum\n```\n\n"
+  )
+  os.makedirs(os.path.join(root, "content", "pages"))
+  with open(os.path.join(root, "template.html"), "w", encoding="utf-8") as f:
+    f.write("<!doctype html><title>{{ Title }}</title><article>{{ Content }}</article>")
+  for i in range(page_count):
+    path = os.path.join(root, "content", "pages", f"page-{i}.md")
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(f"# Page {i}\n\n" + section * 40)
+
+def naive_render(source_path):
+  from frontmatter import parse_front_matter
+  from utilities import markdown_to_html_node, extract_title, write_page_to
+  with open("template.html", encoding="utf-8") as f:
+    template = f.read()
+  with open(source_path, encoding="utf-8") as f:
+    metadata, md = parse_front_matter(f.read())
+  title = metadata.get("title") or extract_title(md)
+  page = io.StringIO()
+  write_page_to(page, template, title, markdown_to_html_node(md), "/")
+  return source_path, page.getvalue()
+
+def run_naive(root, source_paths, workers):
+  ipc_bytes = 0
+  with multiprocessing.Pool(workers) as pool:
+    for source_path, html in pool.imap(naive_render, source_paths, 16):
+      ipc_bytes += len(pickle.dumps((source_path, html)))
+      dest_path = os.path.join(root, "naive", os.path.relpath(source_path, "content"))
+      os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+      with open(os.path.splitext(dest_path)[0] + ".html", "w", encoding="utf-8") as f:
+        f.write(html)
+  return ipc_bytes
+
+def run_shared(root, source_paths, workers):
+  from backends import DirectoryBackend
+  from builder import Builder
+  from links import LinkGraph
+  from parallel import ParallelRenderer
+  builder = Builder(DirectoryBackend("."), DirectoryBackend(os.path.join(root, "shared")))
+  builder.links = LinkGraph(builder.content_dir)
+  ipc_bytes = 0
+  with ParallelRenderer(builder, workers) as renderer:
+    renderer.open(source_paths)
+    renderer.start()
+    for record in renderer.render(source_paths):
+      ipc_bytes += len(pickle.dumps(record))
+  return ipc_bytes
+
+def main():
+  sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+  page_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 2000
+  workers = int(sys.argv[2]) if len(sys.argv) >= 3 else os.cpu_count() or 4
+  with tempfile.TemporaryDirectory() as root:
+    write_site(root, page_count)
+    os.chdir(root)
+    source_paths = sorted(
+      os.path.join("content", "pages", name).replace(os.sep, "/")
+      for name in os.listdir(os.path.join("content", "pages"))
+    )
+    print(f"{page_count} pages, {workers} workers")
+    for name, run in [("naive", run_naive), ("shared", run_shared)]:
+      start = time.perf_counter()
+      ipc_bytes = run(root, source_paths, workers)
+      seconds = time.perf_counter() - start
+      print(f"  {name:>6}: {seconds:6.2f} s  {ipc_bytes / (1 << 20):8.2f} MB back to the parent")
+    os.chdir("/")
+
+if __name__ == "__main__":
+  main()
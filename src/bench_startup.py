@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+
+def project_modules():
+  return {
+    filename[:-len(".py")]
+    for filename in os.listdir(SRC_DIR)
+    if filename.endswith(".py") and not filename.startswith("test_")
+  }
+
+def parse_import_times(stderr):
+  # lines look like "import time:  self [us] | cumulative | imported package",
+  # with nested imports indented under the module that triggered them
+  times = {}
+  top_level = set()
+  for line in stderr.splitlines():
+    if not line.startswith("import time:"):
+      continue
+    _, cumulative, name = line[len("import time:"):].split("|")
+    if not cumulative.strip().isdigit():
+      continue
+    times[name.strip()] = int(cumulative)
+    if name[1:2] != " ":
+      top_level.add(name.strip())
+  return times, top_level
+
+def project_import_time(times, top_level):
+  return sum(times[name] for name in top_level & project_modules())
+
+def import_times(*args):
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", *args],
+    cwd=ROOT_DIR,
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  return parse_import_times(result.stderr)
+
+def main_import_times():
+  return import_times("-c", f"import sys; sys.path.insert(0, {SRC_DIR!r}); import main")
+
+def preview_import_times(source_path):
+  return import_times(os.path.join(SRC_DIR, "main.py"), "--preview", source_path)
+
+def preview_wall_time(source_path, runs=5):
+  best = None
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run(
+      [sys.executable, os.path.join(SRC_DIR, "main.py"), "--preview", source_path],
+      cwd=ROOT_DIR,
+      stdout=subprocess.DEVNULL,
+      check=True,
+    )
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def main():
+  source_path = sys.argv[1] if len(sys.argv) >= 2 else os.path.join("content", "index.md")
+  main_times, main_top_level = main_import_times()
+  preview_times, preview_top_level = preview_import_times(source_path)
+  print(f"import main: {project_import_time(main_times, main_top_level) / 1000:.1f} ms")
+  print(f"preview imports: {project_import_time(preview_times, preview_top_level) / 1000:.1f} ms")
+  print("slowest preview imports:")
+  for name, cumulative in sorted(preview_times.items(), key=lambda item: -item[1])[:10]:
+    print(f"  {cumulative / 1000:8.1f} ms  {name}")
+  print(f"preview wall time (best of 5): {preview_wall_time(source_path) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+  main()
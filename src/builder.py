@@ -0,0 +1,639 @@
+import io
+import os
+import json
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from drafts import HeaderIndex, skip_reason
+from events import EventStream
+from highlight import HighlightCache
+from includes import IncludeResolver
+from listing import ListingIndex
+from links import LinkGraph, page_links, mapped_page_links, with_prefetch_links
+from critical import CriticalCss, node_tags
+from leafnode import LeafNode
+from locales import LocaleIndex, with_alternate_links
+from mappedsource import MappedMarkdown
+from shard import shard_of
+from frontmatter import parse_front_matter
+from utilities import (
+  MarkdownError,
+  RenderDeadline,
+  RenderScope,
+  markdown_to_html_node,
+  extract_title,
+  write_page_to,
+  write_page_targets,
+)
+
+class Builder:
+  def __init__(
+    self,
+    source,
+    output,
+    basepath="/",
+    cache_dir=None,
+    content_dir="content",
+    static_dir="static",
+    template_path="template.html",
+    partials_dir="partials",
+    targets=None,
+    locales=None,
+    events=None,
+    mmap_threshold=8 << 20,
+    keep_going=False,
+    render_timeout=None,
+    critical_css=False,
+    prefetch_limit=0,
+    shard=None,
+    now=None,
+  ):
+    self.source = source
+    # every (output, basepath) pair gets the same pages; markdown is parsed
+    # and rendered once and only the basepath is substituted per target
+    self.targets = targets if targets is not None else [(output, basepath)]
+    self.output, self.basepath = self.targets[0]
+    self.cache_dir = cache_dir
+    self.content_dir = content_dir
+    self.static_dir = static_dir
+    self.template_path = template_path
+    self.partials_dir = partials_dir
+    self.locales = list(locales or [])
+    self.events = events if events is not None else EventStream()
+    self.build_started = None
+    # sources at least this large are parsed block by block off an mmap
+    self.mmap_threshold = mmap_threshold
+    # with keep_going a failing page is recorded and the build carries on;
+    # failures persist so a later build_failed() can retry just those pages
+    self.keep_going = keep_going
+    # seconds one page may take to parse and write; None means no limit
+    self.render_timeout = render_timeout
+    # inline the stylesheet rules each page can use and prefetch the pages it
+    # links to; the css analysis is shared by pages with the same tags
+    self.critical_css = critical_css
+    self.prefetch_limit = prefetch_limit
+    # (i, N) renders only shard i of N; listing pages are left to the merge
+    self.shard = shard
+    # drafts and pages whose publish_at is after now (the build's start by
+    # default) are skipped before they are parsed
+    self.now = now
+    self.build_time = None
+    self.headers = None
+    self.critical = None
+    self.failures = None
+    self.template = None
+    self.template_version = None
+    self.includes = None
+    self.listings = None
+    self.links = None
+    self.locale_index = None
+    self.preview_includes = None
+    # each builder highlights through its own cache, handed to every render
+    self.highlight_cache = HighlightCache(
+      os.path.join(cache_dir, "highlight") if cache_dir is not None else None
+    )
+
+  def load_template(self):
+    # long-lived builders only re-read the template when it actually changed
+    version = self.source.version(self.template_path)
+    if version != self.template_version:
+      self.template = self.source.read_text(self.template_path)
+      self.template_version = version
+    return self.template
+
+  def new_include_resolver(self):
+    return IncludeResolver(self.partials_dir, self.source.read_text)
+
+  def state_path(self, name):
+    if self.shard is not None:
+      # shards built from one checkout keep their state apart
+      index, count = self.shard
+      return os.path.join(self.cache_dir, f"shard-{index}-of-{count}", name)
+    return os.path.join(self.cache_dir, name)
+
+  def in_shard(self, path):
+    if self.shard is None:
+      return True
+    if self.locales and path.startswith(self.content_dir + "/"):
+      locale, relative_path = self.locale_index.split_path(path)
+      if locale is not None:
+        # every locale's copy of a page is rendered by the same shard
+        path = relative_path
+    index, count = self.shard
+    return shard_of(path, count) == index
+
+  def start_build(self):
+    self.build_started = time.perf_counter()
+    self.build_time = self.now if self.now is not None else datetime.now(timezone.utc)
+    self.load_headers()
+
+  def load_headers(self):
+    if self.headers is None:
+      self.headers = HeaderIndex()
+      if self.cache_dir is not None:
+        self.headers.load(self.state_path("headers.json"))
+
+  def skip_reason(self, source_path):
+    now = self.build_time
+    if now is None:
+      now = self.now if self.now is not None else datetime.now(timezone.utc)
+    return skip_reason(self.headers.header(self.source, source_path), now)
+
+  def is_published(self, source_path):
+    return self.skip_reason(source_path) is None
+
+  def load_state(self):
+    self.load_headers()
+    if self.includes is None:
+      self.includes = self.new_include_resolver()
+      if self.cache_dir is not None:
+        self.includes.load(self.state_path("includes.json"))
+    if self.listings is None:
+      self.listings = self.new_listing_index()
+      if self.cache_dir is not None:
+        self.listings.load(self.state_path("listings.json"))
+    if self.links is None:
+      self.links = LinkGraph(self.content_dir)
+      if self.cache_dir is None or not self.links.load(self.state_path("links.json")):
+        # nothing saved yet: read every page's links so wiki-links resolve
+        for source_path in self.source.list_files(self.content_dir):
+          if source_path.endswith(".md"):
+            self.index_links(source_path)
+    if self.locales and self.locale_index is None:
+      self.index_locales()
+    if self.failures is None:
+      self.failures = {}
+      if self.cache_dir is not None:
+        self.load_failures()
+
+  def new_listing_index(self):
+    return ListingIndex(self.content_dir, locales=self.locales)
+
+  def index_locales(self):
+    # one listing pass; every page's translations and fallbacks come from it
+    self.locale_index = LocaleIndex(self.locales, self.content_dir)
+    for source_path in self.source.list_files(self.content_dir):
+      if source_path.endswith(".md") and self.is_published(source_path):
+        self.locale_index.add(source_path)
+
+  def read_page_links(self, source, source_path):
+    mapped = None
+    if self.mmap_threshold is not None:
+      mapped = source.map_file(source_path, self.mmap_threshold)
+    if mapped is not None:
+      document = MappedMarkdown(mapped)
+      try:
+        return (document.title(), *mapped_page_links(mapped))
+      finally:
+        document.close()
+    metadata, md = parse_front_matter(source.read_text(source_path))
+    return (metadata.get("title") or extract_title(md), *page_links(md))
+
+  def index_links(self, source_path, source=None):
+    # returns the other pages that need rendering again; a page that cannot
+    # be read drops out of the graph and its render reports why
+    source = source or self.source
+    if not source.exists(source_path) or not self.is_published(source_path):
+      return self.links.remove_page(source_path)
+    try:
+      title, links, wiki = self.read_page_links(source, source_path)
+    except Exception:
+      return self.links.remove_page(source_path)
+    return self.links.update_page(source_path, title, links, wiki)
+
+  def save_state(self):
+    if self.cache_dir is None:
+      return
+    self.includes.save(self.state_path("includes.json"))
+    self.listings.save(self.state_path("listings.json"))
+    self.links.save(self.state_path("links.json"))
+    self.headers.save(self.state_path("headers.json"))
+    self.save_failures()
+
+  def load_failures(self):
+    try:
+      with open(self.state_path("failures.json"), encoding="utf-8") as f:
+        failures = json.load(f)
+    except FileNotFoundError:
+      return
+    self.failures = {failure["source"]: failure for failure in failures}
+
+  def save_failures(self):
+    os.makedirs(os.path.dirname(self.state_path("failures.json")), exist_ok=True)
+    with open(self.state_path("failures.json"), "w", encoding="utf-8") as f:
+      json.dump([self.failures[path] for path in sorted(self.failures)], f, indent=2)
+
+  def record_failure(self, source_path, dest_path, error):
+    message = getattr(error, "message", str(error))
+    location = getattr(error, "source_path", None) or source_path
+    line = getattr(error, "line", None)
+    self.failures[source_path] = {
+      "source": source_path,
+      "dest": dest_path,
+      "location": location if line is None else f"{location}:{line}",
+      "error": message,
+    }
+    self.events.emit("error", source=source_path, location=location, line=line, error=message)
+
+  def page_dest_path(self, source_path):
+    relative_path = source_path[len(self.content_dir) + 1:]
+    return os.path.splitext(relative_path)[0] + ".html"
+
+  def remove_static(self, static_files):
+    for path in static_files:
+      destination = path[len(self.static_dir) + 1:]
+      for output, _ in self.targets:
+        if output.exists(destination):
+          output.remove(destination)
+
+  def copy_static(self, static_files):
+    for path in static_files:
+      destination = path[len(self.static_dir) + 1:]
+      data = self.source.read_bytes(path)
+      for output, _ in self.targets:
+        output.write_bytes(destination, data)
+      self.events.emit(
+        "static-copied",
+        source=path,
+        dest=destination,
+        bytes=len(data) * len(self.targets),
+      )
+
+  def render_scope(self):
+    resolve = self.links.resolve if self.links is not None else None
+    return RenderScope(self.highlight_cache, resolve)
+
+  def parse_page(self, source_path, documents):
+    # a large page's nodes are read lazily off its mapping, which is closed by
+    # the documents ExitStack once the page has been written
+    cache = self.highlight_cache
+    scope = self.render_scope()
+    hits, misses = cache.hits, cache.misses
+    self.includes.forget(source_path)
+    mapped = None
+    if self.mmap_threshold is not None:
+      mapped = self.source.map_file(source_path, self.mmap_threshold)
+    if mapped is not None:
+      document = documents.enter_context(MappedMarkdown(mapped))
+      metadata = document.metadata
+      title = document.title()
+      html_node = document.to_html_node(self.includes, source_path, scope)
+    else:
+      text = self.source.read_text(source_path)
+      metadata, md = parse_front_matter(text)
+      title = metadata.get("title") or extract_title(md)
+      try:
+        html_node = markdown_to_html_node(md, self.includes, source_path, scope)
+      except MarkdownError as error:
+        if error.source_path == source_path and error.line is not None:
+          # lines are counted from the end of the front matter
+          error.line += text.count("\n", 0, len(text) - len(md))
+        raise
+    if not title:
+      raise MarkdownError("no title: add a '# ' heading or a title in front matter", source_path)
+    if cache.hits != hits:
+      self.events.emit("cache-hit", cache="highlight", source=source_path, count=cache.hits - hits)
+    if cache.misses != misses:
+      self.events.emit("cache-miss", cache="highlight", source=source_path, count=cache.misses - misses)
+    return {**metadata, "title": title}, html_node
+
+  def new_critical_css(self):
+    if not self.critical_css:
+      return None
+    return CriticalCss(self.source.read_text, self.source.exists, self.static_dir)
+
+  def page_template(self, template, page_path, html_node, alternate_links=None):
+    # per-page links go in after critical css is inlined, so pages that
+    # share a template and tag set share one analysis
+    url = self.links.url_for(page_path)
+    backlinks = None
+    if "{{ Backlinks }}" in template:
+      backlinks = self.links.backlinks_html(url)
+    if self.critical is not None:
+      tags = node_tags(html_node)
+      if tags is not None:
+        if backlinks:
+          tags.update(("ul", "li", "a"))
+        template = self.critical.inline(template, tags)
+    if backlinks is not None:
+      template = template.replace("{{ Backlinks }}", backlinks)
+    template = with_alternate_links(template, alternate_links)
+    if self.prefetch_limit:
+      template = with_prefetch_links(template, self.links.prefetch_urls(url, self.prefetch_limit))
+    return template
+
+  def write_page(
+    self,
+    page_path,
+    metadata,
+    html_node,
+    template,
+    source_path=None,
+    alternate_links=None,
+  ):
+    dest_path = self.page_dest_path(page_path)
+    template = self.page_template(template, page_path, html_node, alternate_links)
+    bytes_written = write_page_targets(
+      self.targets,
+      dest_path,
+      template,
+      metadata["title"],
+      html_node,
+      self.stream_pages(),
+    )
+    self.listings.add_page(page_path, metadata)
+    self.events.emit(
+      "page-done",
+      source=source_path or page_path,
+      dest=dest_path,
+      bytes=bytes_written,
+    )
+    return dest_path
+
+  def remove_page(self, page_path):
+    self.listings.remove_page(page_path)
+    dest_path = self.page_dest_path(page_path)
+    for output, _ in self.targets:
+      if output.exists(dest_path):
+        output.remove(dest_path)
+
+  def stream_pages(self):
+    # a keep-going build carries on past a page that fails while it is
+    # written; an archive could not drop what was streamed of it
+    return not self.keep_going or all(output.can_remove for output, _ in self.targets)
+
+  def discard_page(self, page_path):
+    # a page that failed part way through streaming must not be left behind
+    try:
+      self.remove_page(page_path)
+    except NotImplementedError:
+      pass
+
+  def render_page(self, source_path):
+    dest_path = self.page_dest_path(source_path)
+    self.events.emit("page-started", source=source_path, dest=dest_path)
+    try:
+      with RenderDeadline(self.render_timeout), ExitStack() as documents:
+        metadata, html_node = self.parse_page(source_path, documents)
+        self.write_page(source_path, metadata, html_node, self.load_template())
+    except Exception as error:
+      self.record_failure(source_path, dest_path, error)
+      if not self.keep_going:
+        raise
+      self.discard_page(source_path)
+      return None
+    self.failures.pop(source_path, None)
+    return dest_path
+
+  def render_translations(self, relative_path):
+    # an untranslated page reuses the default locale's rendered body rather
+    # than parsing the same markdown again for every locale
+    template = self.load_template()
+    alternate_links = self.locale_index.alternate_links(relative_path)
+    page_locales = self.locale_index.page_locales(relative_path)
+    rendered = []
+    parsed = {}
+    # a mapped source stays open until every locale's copy is written
+    with ExitStack() as documents:
+      for locale in self.locales:
+        page_path = self.locale_index.page_path(locale, relative_path)
+        if locale not in page_locales:
+          self.remove_page(page_path)
+          continue
+        source_path = self.locale_index.source_for(locale, relative_path)
+        dest_path = self.page_dest_path(page_path)
+        self.events.emit("page-started", source=source_path, dest=dest_path)
+        try:
+          with RenderDeadline(self.render_timeout):
+            if source_path not in parsed:
+              parsed[source_path] = self.parse_page(source_path, documents)
+            metadata, html_node = parsed[source_path]
+            if source_path != page_path and not isinstance(html_node, LeafNode):
+              html_node = LeafNode(None, "".join(html_node.iter_html()))
+              parsed[source_path] = (metadata, html_node)
+            rendered.append(
+              self.write_page(
+                page_path,
+                metadata,
+                html_node,
+                template,
+                source_path,
+                alternate_links,
+              )
+            )
+        except Exception as error:
+          self.record_failure(source_path, dest_path, error)
+          if not self.keep_going:
+            raise
+          self.discard_page(page_path)
+          continue
+        self.failures.pop(source_path, None)
+    return rendered
+
+  def render_markdown(self, markdown, full_page=False):
+    # previews share one resolver so partials stay parsed between requests
+    if self.preview_includes is None:
+      self.preview_includes = self.new_include_resolver()
+    metadata, md = parse_front_matter(markdown)
+    with RenderDeadline(self.render_timeout):
+      html_node = markdown_to_html_node(md, self.preview_includes, scope=self.render_scope())
+    if not full_page:
+      return html_node.to_html()
+    title = metadata.get("title") or extract_title(md)
+    f = io.StringIO()
+    write_page_to(f, self.load_template(), title, html_node, self.basepath)
+    return f.getvalue()
+
+  def parallel_renderer(self, workers):
+    if workers is None or workers < 2 or self.locales:
+      return None
+    from parallel import ParallelRenderer, can_render_in_parallel
+    if not can_render_in_parallel(self.targets):
+      return None
+    return ParallelRenderer(self, workers)
+
+  def render_pages(self, content_files):
+    rendered = []
+    for source_path in content_files:
+      if not self.in_shard(source_path):
+        continue
+      if not source_path.endswith(".md"):
+        self.events.emit("file-skipped", source=source_path, reason="not markdown")
+        continue
+      if self.locales and self.locale_index.split_path(source_path)[0] is not None:
+        continue
+      dest_path = self.render_page(source_path)
+      if dest_path is not None:
+        rendered.append(dest_path)
+    return rendered
+
+  def render_pages_in_parallel(self, renderer, content_files):
+    source_paths = []
+    for source_path in content_files:
+      if not self.in_shard(source_path):
+        continue
+      if source_path.endswith(".md"):
+        source_paths.append(source_path)
+      else:
+        self.events.emit("file-skipped", source=source_path, reason="not markdown")
+    rendered = []
+    for record in renderer.render(source_paths):
+      dest_path = self.apply_page_record(record)
+      if dest_path is not None:
+        rendered.append(dest_path)
+    return rendered
+
+  def apply_page_record(self, record):
+    # a worker's page arrives as its events, includes and metadata; the html
+    # itself is already in the output
+    for event in record["events"]:
+      fields = dict(event)
+      del fields["elapsed"]
+      self.events.emit(fields.pop("event"), **fields)
+    for includer, partials in record["includes"].items():
+      self.includes.edges.setdefault(includer, set()).update(partials)
+    failure = record["failure"]
+    if failure is not None:
+      self.failures[record["source"]] = failure
+      if not self.keep_going:
+        error = [event for event in record["events"] if event["event"] == "error"][-1]
+        raise MarkdownError(error["error"], error["location"], error["line"])
+      return None
+    self.listings.add_page(record["source"], record["metadata"])
+    return record["dest"]
+
+  def build(self, workers=None):
+    static_files = [
+      path for path in self.source.list_files(self.static_dir) if self.in_shard(path)
+    ]
+    content_files = self.source.list_files(self.content_dir)
+    self.start_build()
+    self.headers.retain(path for path in content_files if path.endswith(".md"))
+    skipped = {}
+    for source_path in content_files:
+      if source_path.endswith(".md") and self.in_shard(source_path):
+        reason = self.skip_reason(source_path)
+        if reason is not None:
+          skipped[source_path] = reason
+    content_files = [path for path in content_files if path not in skipped]
+    if self.locales:
+      self.index_locales()
+    self.events.emit(
+      "build-started",
+      pages=sum(path.endswith(".md") and self.in_shard(path) for path in content_files),
+      static_files=len(static_files),
+    )
+    for source_path, reason in skipped.items():
+      self.events.emit("file-skipped", source=source_path, reason=reason)
+    for output, _ in self.targets:
+      output.clear()
+    self.copy_static(static_files)
+    self.includes = self.new_include_resolver()
+    self.preview_includes = None
+    self.listings = self.new_listing_index()
+    self.failures = {}
+    # every page's links are read before any page is rendered, so wiki-links
+    # and backlinks see the whole site
+    self.links = LinkGraph(self.content_dir)
+    self.critical = self.new_critical_css()
+    markdown_files = [path for path in content_files if path.endswith(".md")]
+    renderer = self.parallel_renderer(workers)
+    if renderer is None:
+      for source_path in markdown_files:
+        self.index_links(source_path)
+      rendered = self.render_pages(content_files)
+    else:
+      with renderer:
+        # the index pass reads the same shared copy the workers render from
+        corpus = renderer.open(content_files)
+        for source_path in markdown_files:
+          self.index_links(source_path, corpus)
+        renderer.start()
+        rendered = self.render_pages_in_parallel(renderer, content_files)
+    if self.locales:
+      for relative_path in sorted(self.locale_index.pages):
+        if self.in_shard(relative_path):
+          rendered.extend(self.render_translations(relative_path))
+    if self.shard is None:
+      rendered.extend(self.listings.render(self.load_template(), self.targets, self.events))
+    self.save_state()
+    self.finish_build(rendered)
+    return rendered
+
+  def finish_build(self, rendered):
+    seconds = time.perf_counter() - self.build_started
+    self.events.emit(
+      "build-done",
+      pages=len(rendered),
+      failed=len(self.failures),
+      seconds=seconds,
+    )
+
+  def build_changed(self, changed_paths):
+    self.start_build()
+    self.load_state()
+    self.includes.invalidate(changed_paths)
+    if self.preview_includes is not None:
+      self.preview_includes.invalidate(changed_paths)
+    self.critical = self.new_critical_css()
+    pages = self.includes.pages_affected_by(changed_paths)
+    static_files = []
+    rerender_all = False
+    for path in changed_paths:
+      path = os.path.normpath(path)
+      if path.startswith(self.content_dir + "/") and path.endswith(".md"):
+        pages.add(path)
+        # pages linked from it only render again if their backlinks changed
+        pages.update(self.index_links(path))
+      elif path.startswith(self.static_dir + "/"):
+        static_files.append(path)
+        # inlined critical css is taken from the stylesheets
+        if self.critical is not None and path.endswith(".css"):
+          rerender_all = True
+      elif path == os.path.normpath(self.template_path):
+        rerender_all = True
+    if rerender_all:
+      pages.update(
+        path for path in self.source.list_files(self.content_dir) if path.endswith(".md")
+      )
+      self.listings.mark_all_dirty()
+    if self.shard is not None:
+      pages = {path for path in pages if self.in_shard(path)}
+      static_files = [path for path in static_files if self.in_shard(path)]
+    self.events.emit("build-started", pages=len(pages), static_files=len(static_files))
+    self.remove_static(path for path in static_files if not self.source.exists(path))
+    self.copy_static(path for path in static_files if self.source.exists(path))
+    translations = set()
+    rendered = []
+    for source_path in sorted(pages):
+      if self.locales:
+        locale, relative_path = self.locale_index.split_path(source_path)
+        if locale is not None:
+          # a translation changing touches every locale's copy of the page
+          if self.source.exists(source_path) and self.is_published(source_path):
+            self.locale_index.add(source_path)
+          else:
+            self.includes.forget(source_path)
+            self.locale_index.remove(source_path)
+            self.failures.pop(source_path, None)
+          translations.add(relative_path)
+          continue
+      if not self.source.exists(source_path) or not self.is_published(source_path):
+        self.includes.forget(source_path)
+        self.remove_page(source_path)
+        self.failures.pop(source_path, None)
+        continue
+      dest_path = self.render_page(source_path)
+      if dest_path is not None:
+        rendered.append(dest_path)
+    for relative_path in sorted(translations):
+      rendered.extend(self.render_translations(relative_path))
+    if self.shard is None:
+      rendered.extend(self.listings.render(self.load_template(), self.targets, self.events))
+    self.save_state()
+    self.finish_build(rendered)
+    return rendered
+
+  def build_failed(self):
+    self.load_state()
+    return self.build_changed(sorted(self.failures))
@@ -0,0 +1,149 @@
+import re
+from tablenode import TableNode
+
+# a page's render-blocking stylesheets are replaced by an inline <style> with
+# only the rules whose type selectors the page can match, and the full sheet
+# moves to the end of <body>. Matching is by tag name alone, so class, id,
+# attribute and pseudo parts never drop a rule; a rule is only left out when
+# it names a tag the page does not emit.
+
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_DELIMITER_PATTERN = re.compile(r"[{};]")
+ATTRIBUTE_SELECTOR_PATTERN = re.compile(r"\[[^\]]*\]")
+PSEUDO_SELECTOR_PATTERN = re.compile(r"::?[a-zA-Z-]+(?:\([^)]*\))?")
+TYPE_SELECTOR_PATTERN = re.compile(r"(?:^|[\s>+~])([a-zA-Z][a-zA-Z0-9-]*)")
+HTML_TAG_PATTERN = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)")
+STYLESHEET_LINK_PATTERN = re.compile(r'[ \t]*<link\b[^>]*\brel="stylesheet"[^>]*>\n?')
+HREF_PATTERN = re.compile(r'\bhref="(/[^"]*)"')
+# a table streams its rows, so its tags are known without building them
+TABLE_TAGS = {"table", "thead", "tbody", "tr", "th", "td"}
+
+def selector_tags(selector):
+  selector = ATTRIBUTE_SELECTOR_PATTERN.sub("", selector)
+  selector = PSEUDO_SELECTOR_PATTERN.sub("", selector)
+  return frozenset(tag.lower() for tag in TYPE_SELECTOR_PATTERN.findall(selector))
+
+def parse_css(css):
+  # [(selector tag sets, text)] for style rules, [(prelude, rules)] for
+  # @media and @supports; any other at-rule is kept as it is
+  rules = []
+  position = 0
+  depth = 0
+  prelude_end = 0
+  for match in CSS_DELIMITER_PATTERN.finditer(css):
+    char = match.group()
+    if char == ";" and depth == 0:
+      statement = " ".join(css[position:match.end()].split())
+      if statement:
+        rules.append((None, statement))
+      position = match.end()
+    elif char == "{":
+      if depth == 0:
+        prelude_end = match.start()
+      depth += 1
+    elif char == "}" and depth > 0:
+      depth -= 1
+      if depth > 0:
+        continue
+      prelude = " ".join(css[position:prelude_end].split())
+      body = " ".join(css[prelude_end + 1:match.start()].split())
+      if prelude.startswith(("@media", "@supports")):
+        rules.append((prelude, parse_css(body)))
+      elif prelude.startswith("@"):
+        rules.append((None, f"{prelude}{{{body}}}"))
+      else:
+        selectors = [selector_tags(selector) for selector in prelude.split(",")]
+        rules.append((selectors, f"{prelude}{{{body}}}"))
+      position = match.end()
+  return rules
+
+def used_css(rules, tags):
+  parts = []
+  for selectors, rule in rules:
+    if selectors is None:
+      parts.append(rule)
+    elif isinstance(selectors, str):
+      inner = used_css(rule, tags)
+      if inner:
+        parts.append(f"{selectors}{{{inner}}}")
+    elif any(selector <= tags for selector in selectors):
+      parts.append(rule)
+  return "".join(parts)
+
+def node_tags(node):
+  # None when part of the tree is parsed lazily and can only be walked by
+  # rendering it
+  tags = set()
+  pending = [node]
+  while pending:
+    node = pending.pop()
+    if isinstance(node, TableNode):
+      tags.update(TABLE_TAGS)
+      continue
+    if node.tag is not None:
+      tags.add(node.tag)
+    if node.value is not None and "<" in node.value:
+      # markup inside a value, e.g. highlighted code; text is escaped
+      tags.update(tag.lower() for tag in HTML_TAG_PATTERN.findall(node.value))
+    if node.children is None:
+      continue
+    if not isinstance(node.children, list):
+      return None
+    pending.extend(node.children)
+  return tags
+
+class CriticalCss:
+  def __init__(self, read_text, exists, static_dir="static"):
+    self.read_text = read_text
+    self.exists = exists
+    self.static_dir = static_dir
+    self.stylesheets = {}
+    self.templates = {}
+    self.pages = {}
+
+  def stylesheet(self, href):
+    if href not in self.stylesheets:
+      path = self.static_dir + href
+      if self.exists(path):
+        self.stylesheets[href] = parse_css(COMMENT_PATTERN.sub("", self.read_text(path)))
+      else:
+        self.stylesheets[href] = None
+    return self.stylesheets[href]
+
+  def template_parts(self, template):
+    # (template without its inlinable stylesheet links, the links, their
+    # parsed rules, the template's own tags)
+    if template not in self.templates:
+      head, _, tail = template.partition("</head>")
+      links = []
+      rules = []
+      for match in STYLESHEET_LINK_PATTERN.finditer(head):
+        href = HREF_PATTERN.search(match.group())
+        sheet = self.stylesheet(href.group(1)) if href is not None else None
+        if sheet is not None:
+          links.append(match.group())
+          rules.extend(sheet)
+      for link in links:
+        head = head.replace(link, "", 1)
+      tags = {tag.lower() for tag in HTML_TAG_PATTERN.findall(template)}
+      stripped = f"{head}</head>{tail}" if links else template
+      self.templates[template] = (stripped, links, rules, tags)
+    return self.templates[template]
+
+  def inline(self, template, tags):
+    # one analysis per template and tag set; pages sharing both reuse it
+    key = (template, frozenset(tags))
+    if key not in self.pages:
+      stripped, links, rules, template_tags = self.template_parts(template)
+      if not links:
+        self.pages[key] = template
+      else:
+        style = f"<style>{used_css(rules, template_tags | tags)}</style>"
+        page = stripped.replace("</head>", style + "</head>", 1)
+        sheets = "".join(link.strip() for link in links)
+        if "</body>" in page:
+          page = page.replace("</body>", sheets + "</body>", 1)
+        else:
+          page += sheets
+        self.pages[key] = page
+    return self.pages[key]
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import socket
+import threading
+import socketserver
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Protocol: newline-delimited JSON over a Unix socket, one response line per
+# request line, any number of requests per connection.
+#   {"op": "ping"}
+#   {"op": "render", "markdown": "...", "full_page": false}
+#   {"op": "rebuild", "paths": ["partials/footer.md", ...]}
+#   {"op": "build"}
+# Responses carry "ok" plus "html"/"rendered" on success or "error" on failure.
+
+class ReadWriteLock:
+  # any number of readers or one writer; a waiting writer holds back new
+  # readers, so a steady stream of renders cannot starve a rebuild
+  def __init__(self):
+    self.condition = threading.Condition()
+    self.readers = 0
+    self.writing = False
+    self.writers_waiting = 0
+
+  @contextmanager
+  def read(self):
+    with self.condition:
+      while self.writing or self.writers_waiting:
+        self.condition.wait()
+      self.readers += 1
+    try:
+      yield
+    finally:
+      with self.condition:
+        self.readers -= 1
+        if self.readers == 0:
+          self.condition.notify_all()
+
+  @contextmanager
+  def write(self):
+    with self.condition:
+      self.writers_waiting += 1
+      while self.writing or self.readers:
+        self.condition.wait()
+      self.writers_waiting -= 1
+      self.writing = True
+    try:
+      yield
+    finally:
+      with self.condition:
+        self.writing = False
+        self.condition.notify_all()
+
+class RenderRequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    # each connection has its own thread that only waits for request lines;
+    # the requests themselves run on the pool, so idle connections hold no
+    # worker however many a client keeps open
+    for line in self.rfile:
+      if line.strip() == b"":
+        continue
+      response = self.server.pool.submit(self.server.dispatch, line).result()
+      self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+      self.wfile.flush()
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  # connection threads are not joined on close; a client may hold its
+  # connection open for as long as it likes
+  daemon_threads = True
+
+  def __init__(self, socket_path, builder, workers=4):
+    self.socket_path = socket_path
+    self.builder = builder
+    self.pool = ThreadPoolExecutor(max_workers=workers)
+    # builds reset the template, includes and link graph renders read, so
+    # they run alone; renders share the lock and run concurrently
+    self.lock = ReadWriteLock()
+    if os.path.exists(socket_path):
+      os.remove(socket_path)
+    super().__init__(socket_path, RenderRequestHandler)
+
+  def dispatch(self, line):
+    try:
+      payload = json.loads(line)
+      op = payload.get("op")
+      match op:
+        case "ping":
+          return {"ok": True}
+        case "render":
+          with self.lock.read():
+            html = self.builder.render_markdown(
+              payload["markdown"],
+              payload.get("full_page", False),
+            )
+          return {"ok": True, "html": html}
+        case "rebuild":
+          with self.lock.write():
+            rendered = self.builder.build_changed(payload["paths"])
+          return {"ok": True, "rendered": rendered}
+        case "build":
+          with self.lock.write():
+            rendered = self.builder.build()
+          return {"ok": True, "rendered": rendered}
+        case _:
+          return {"ok": False, "error": f"Unknown op: {op}"}
+    except Exception as e:
+      return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+  def server_close(self):
+    super().server_close()
+    self.pool.shutdown(wait=True)
+    if os.path.exists(self.socket_path):
+      os.remove(self.socket_path)
+
+class RenderClient:
+  def __init__(self, socket_path):
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self.sock.connect(socket_path)
+    self.reader = self.sock.makefile("rb")
+
+  def request(self, payload):
+    self.sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+    return json.loads(self.reader.readline())
+
+  def close(self):
+    self.reader.close()
+    self.sock.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+def main():
+  from backends import DirectoryBackend
+  from builder import Builder
+  socket_path = sys.argv[1] if len(sys.argv) >= 2 else "ssg.sock"
+  basepath = sys.argv[2] if len(sys.argv) >= 3 else "/"
+  builder = Builder(
+    DirectoryBackend("."),
+    DirectoryBackend("docs"),
+    basepath,
+    cache_dir=".cache",
+    # previews come from users; one pathological page must not hold a worker
+    render_timeout=10,
+  )
+  builder.load_state()
+  with RenderServer(socket_path, builder, workers=os.cpu_count() or 4) as server:
+    print(f"Serving renders on {socket_path}")
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+
+if __name__ == "__main__":
+  main()
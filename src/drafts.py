@@ -0,0 +1,76 @@
+import os
+from datetime import datetime, timezone
+from frontmatter import read_front_matter
+
+# a page with `draft: true`, or a `publish_at` date or time still to come, is
+# left out of the build before it is parsed. Only its front matter is read,
+# and the fields that decide this are cached by file version, so a repeat
+# build does not open an unchanged draft at all. The cache holds the fields
+# rather than the decision, so a scheduled page appears once its time passes.
+
+HEADER_FIELDS = ("draft", "publish_at")
+
+def publish_time(value):
+  # an iso date or datetime, UTC unless it says otherwise
+  try:
+    moment = datetime.fromisoformat(value)
+  except ValueError:
+    return None
+  if moment.tzinfo is None:
+    moment = moment.replace(tzinfo=timezone.utc)
+  return moment
+
+def skip_reason(header, now):
+  if header.get("draft", "").lower() in ("true", "yes", "1"):
+    return "draft"
+  if "publish_at" in header:
+    moment = publish_time(header["publish_at"])
+    # a date that cannot be read keeps the page back rather than publishing it early
+    if moment is None:
+      return "invalid publish_at"
+    if moment > now:
+      return "scheduled"
+  return None
+
+class HeaderIndex:
+  def __init__(self):
+    self.entries = {}
+    self.reads = 0
+
+  def header(self, source, path):
+    version = source.version(path)
+    entry = self.entries.get(path)
+    if entry is None or entry["version"] != version:
+      self.reads += 1
+      metadata = read_front_matter(lambda size: source.read_head(path, size))
+      header = {key: metadata[key] for key in HEADER_FIELDS if key in metadata}
+      entry = {"version": version, "header": header}
+      self.entries[path] = entry
+    return entry["header"]
+
+  def retain(self, paths):
+    paths = set(paths)
+    for path in list(self.entries):
+      if path not in paths:
+        del self.entries[path]
+
+  def save(self, index_path):
+    import json
+    parent_dirs = os.path.dirname(index_path)
+    if parent_dirs:
+      os.makedirs(parent_dirs, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+      json.dump(self.entries, f, indent=2, sort_keys=True)
+
+  def load(self, index_path):
+    import json
+    try:
+      with open(index_path, encoding="utf-8") as f:
+        entries = json.load(f)
+    except FileNotFoundError:
+      return
+    for entry in entries.values():
+      # versions are tuples, which json hands back as lists
+      if isinstance(entry["version"], list):
+        entry["version"] = tuple(entry["version"])
+    self.entries = entries
@@ -0,0 +1,106 @@
+import sys
+import time
+import threading
+
+# builds report progress as events instead of printing; a handler is any
+# callable taking the event dict, and with no handlers emit() is nearly free.
+#
+#   build-started  pages, static_files
+#   page-started   source, dest
+#   page-done      source, dest, bytes
+#   static-copied  source, dest, bytes
+#   file-skipped   source, reason ("not markdown", "draft", "scheduled" or
+#                  "invalid publish_at")
+#   cache-hit      cache, source, count
+#   cache-miss     cache, source, count
+#   error          source, location, line, error
+#   build-done     pages, failed, seconds
+
+class EventStream:
+  def __init__(self, *handlers):
+    self.handlers = list(handlers)
+    self.started = time.perf_counter()
+    self.lock = threading.Lock()
+
+  def add_handler(self, handler):
+    self.handlers.append(handler)
+
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  def emit(self, event, **fields):
+    if not self.handlers:
+      return
+    event = {"event": event, "elapsed": round(self.elapsed(), 6), **fields}
+    with self.lock:
+      for handler in self.handlers:
+        handler(event)
+
+class JsonLinesWriter:
+  def __init__(self, f):
+    import json
+    self.f = f
+    self.dumps = json.dumps
+
+  def __call__(self, event):
+    self.f.write(self.dumps(event) + "\n")
+    self.f.flush()
+
+def format_bytes(count):
+  if count < 1024:
+    return f"{count:.0f} B"
+  for unit in ["KB", "MB", "GB"]:
+    count /= 1024
+    if count < 1024 or unit == "GB":
+      return f"{count:.1f} {unit}"
+
+class ProgressBar:
+  def __init__(self, f=None, width=30, interval=0.1):
+    self.f = f or sys.stderr
+    self.width = width
+    self.interval = interval
+    self.live = self.f.isatty()
+    self.total = 0
+    self.done = 0
+    self.bytes = 0
+    self.errors = 0
+    self.last_draw = 0
+
+  def line(self, elapsed):
+    files_per_second = self.done / elapsed if elapsed else 0
+    bytes_per_second = self.bytes / elapsed if elapsed else 0
+    # listing pages are only known once rendered, so the total can grow
+    total = max(self.total, self.done)
+    counts = f"{self.done}/{total}" if total else str(self.done)
+    line = (
+      f"{counts} files {format_bytes(self.bytes)}"
+      f" {files_per_second:.0f} files/s {format_bytes(bytes_per_second)}/s"
+    )
+    if self.errors:
+      line += f" {self.errors} errors"
+    if not total:
+      return line
+    filled = self.width * self.done // total
+    return f"[{'#' * filled}{'-' * (self.width - filled)}] {line}"
+
+  def __call__(self, event):
+    kind = event["event"]
+    if kind == "build-started":
+      self.total = event["pages"] + event["static_files"]
+    elif kind in ("page-done", "static-copied"):
+      self.done += 1
+      self.bytes += event["bytes"] or 0
+    elif kind == "error":
+      self.errors += 1
+    elif kind == "build-done":
+      # a log file only gets the summary; a terminal gets it over the bar
+      if self.live:
+        self.f.write(f"\r{self.line(event['seconds'])}\x1b[K\n")
+      else:
+        self.f.write(f"{self.line(event['seconds'])}\n")
+      self.f.flush()
+      return
+    if self.live and event["elapsed"] - self.last_draw >= self.interval:
+      self.last_draw = event["elapsed"]
+      self.f.write(f"\r{self.line(event['elapsed'])}\x1b[K")
+      self.f.flush()
@@ -0,0 +1,31 @@
+import re
+
+FRONT_MATTER_PATTERN = re.compile(r"---[ \t]*\n(.*?)\n---[ \t]*(?:\n|$)", re.DOTALL)
+
+def parse_front_matter(markdown):
+  match = FRONT_MATTER_PATTERN.match(markdown)
+  if match is None:
+    return {}, markdown
+  metadata = {}
+  for line in match.group(1).splitlines():
+    key, separator, value = line.partition(":")
+    if not separator or key.strip() == "":
+      continue
+    metadata[key.strip().lower()] = value.strip().strip("\"'")
+  return metadata, markdown[match.end():]
+
+def read_front_matter(read_head, size=4096):
+  # parses only a file's front matter; read_head(n) returns its first n bytes
+  # and more are read only while the closing line is still missing
+  while True:
+    head = read_head(size)
+    if not head.startswith(b"---"):
+      return {}
+    text = head.decode("utf-8", "replace")
+    match = FRONT_MATTER_PATTERN.match(text)
+    complete = len(head) < size
+    if match is not None and (complete or match.end() < len(text)):
+      return parse_front_matter(text[:match.end()])[0]
+    if complete:
+      return {}
+    size *= 4
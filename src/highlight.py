@@ -0,0 +1,171 @@
+import os
+import re
+import threading
+
+# bump whenever the token rules or the emitted markup change, so stale
+# cache entries from an older highlighter are never served
+HIGHLIGHTER_VERSION = "2"
+
+LANGUAGE_ALIASES = {
+  "py": "python",
+  "python3": "python",
+  "js": "javascript",
+  "sh": "bash",
+  "shell": "bash",
+  "golang": "go",
+}
+
+# an unclosed block comment runs to the end of the code, as it does for the
+# compiler; failing the match instead rescans the rest of the code from every
+# later "/*", which is quadratic on input like "/* /* /* ..."
+LANGUAGE_RULES = {
+  "python": {
+    "comment": r"#[^\n]*",
+    "string": r"\"\"\"[\s\S]*?\"\"\"|'''[\s\S]*?'''|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    "keywords": [
+      "and", "as", "assert", "async", "await", "break", "class", "continue",
+      "def", "del", "elif", "else", "except", "finally", "for", "from",
+      "global", "if", "import", "in", "is", "lambda", "match", "case",
+      "nonlocal", "not", "or", "pass", "raise", "return", "try", "while",
+      "with", "yield", "None", "True", "False",
+    ],
+  },
+  "javascript": {
+    "comment": r"//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)",
+    "string": r"`(?:\\.|[^`\\])*`|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    "keywords": [
+      "async", "await", "break", "case", "catch", "class", "const",
+      "continue", "default", "delete", "do", "else", "export", "extends",
+      "finally", "for", "function", "if", "import", "in", "instanceof",
+      "let", "new", "return", "switch", "this", "throw", "try", "typeof",
+      "var", "void", "while", "yield", "null", "undefined", "true", "false",
+    ],
+  },
+  "go": {
+    "comment": r"//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)",
+    "string": r"`[^`]*`|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'",
+    "keywords": [
+      "break", "case", "chan", "const", "continue", "default", "defer",
+      "else", "fallthrough", "for", "func", "go", "goto", "if", "import",
+      "interface", "map", "package", "range", "return", "select", "struct",
+      "switch", "type", "var", "nil", "true", "false",
+    ],
+  },
+  "bash": {
+    "comment": r"#[^\n]*",
+    "string": r"\"(?:\\.|[^\"\\])*\"|'[^']*'",
+    "keywords": [
+      "if", "then", "else", "elif", "fi", "for", "while", "until", "do",
+      "done", "case", "esac", "function", "in", "return", "export", "local",
+    ],
+  },
+}
+
+TOKEN_CLASSES = {
+  "comment": "tok-comment",
+  "string": "tok-string",
+  "number": "tok-number",
+  "keyword": "tok-keyword",
+}
+
+_lexers = {}
+
+def escape(text):
+  # html.escape pulls in html.entities; these three are all code needs
+  return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def normalize_language(info_string):
+  if not info_string:
+    return None
+  language = info_string.split()[0].lower()
+  return LANGUAGE_ALIASES.get(language, language)
+
+def is_supported(language):
+  return language in LANGUAGE_RULES
+
+def get_lexer(language):
+  if language not in _lexers:
+    rules = LANGUAGE_RULES[language]
+    keywords = "|".join(map(re.escape, rules["keywords"]))
+    _lexers[language] = re.compile(
+      f"(?P<comment>{rules['comment']})"
+      f"|(?P<string>{rules['string']})"
+      r"|(?P<number>\b\d+(?:\.\d+)?\b)"
+      f"|(?P<keyword>\\b(?:{keywords})\\b)"
+    )
+  return _lexers[language]
+
+def highlight_code(code, language):
+  lexer = get_lexer(language)
+  html_parts = []
+  position = 0
+  for match in lexer.finditer(code):
+    html_parts.append(escape(code[position:match.start()]))
+    css_class = TOKEN_CLASSES[match.lastgroup]
+    token = escape(match.group())
+    html_parts.append(f'<span class="{css_class}">{token}</span>')
+    position = match.end()
+  html_parts.append(escape(code[position:]))
+  return "".join(html_parts)
+
+def cache_key(language, code):
+  import hashlib
+  code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+  key_source = f"{language}\0{code_hash}\0{HIGHLIGHTER_VERSION}"
+  return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+class HighlightCache:
+  def __init__(self, cache_dir=None):
+    self.cache_dir = cache_dir
+    self.memory = {}
+    self.hits = 0
+    self.misses = 0
+
+  def path_for(self, key):
+    return os.path.join(self.cache_dir, key[:2], key[2:] + ".html")
+
+  def get(self, key):
+    if key in self.memory:
+      self.hits += 1
+      return self.memory[key]
+    if self.cache_dir is not None:
+      try:
+        with open(self.path_for(key), encoding="utf-8") as f:
+          html = f.read()
+      except FileNotFoundError:
+        html = None
+      if html is not None:
+        self.memory[key] = html
+        self.hits += 1
+        return html
+    self.misses += 1
+    return None
+
+  def put(self, key, html):
+    self.memory[key] = html
+    if self.cache_dir is None:
+      return
+    path = self.path_for(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write-then-rename so concurrent builds never read a partial entry; the
+    # temporary name is per thread, as renders in one process share the cache
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+      f.write(html)
+    os.replace(tmp_path, path)
+
+# used when a render is given no cache of its own; it is never replaced, so
+# one build's on-disk cache cannot leak into another's renders
+_default_cache = HighlightCache()
+
+def highlight(code, language, cache=None):
+  if not is_supported(language):
+    return None
+  if cache is None:
+    cache = _default_cache
+  key = cache_key(language, code)
+  html = cache.get(key)
+  if html is None:
+    html = highlight_code(code, language)
+    cache.put(key, html)
+  return html
@@ -8,6 +8,9 @@ class HtmlNode:
   def to_html(self):
     raise NotImplementedError("To be implemented by child classes")
 
+  def iter_html(self):
+    yield self.to_html()
+
   def props_to_html(self):
     if not self.props:
       return ""
@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+from utilities import MarkdownError
+
+INCLUDE_PATTERN = re.compile(
+  r'^[ \t]*\{\{<\s*include\s+"([^"\n]+)"\s*>\}\}[ \t]*$',
+  re.MULTILINE,
+)
+
+class IncludeCycleError(Exception):
+  pass
+
+def read_local_text(path):
+  with open(path, encoding="utf-8") as f:
+    return f.read()
+
+class IncludeResolver:
+  def __init__(self, partials_dir="partials", read_text=None):
+    self.partials_dir = partials_dir
+    self.read_text = read_text or read_local_text
+    self.nodes = {}
+    self.edges = {}
+    # a resolver can be shared by concurrent renders, so each thread tracks
+    # its own chain of partials for cycle detection
+    self.local = threading.local()
+
+  def partial_path(self, name, includer=None, line=None):
+    # include names come from page authors, and through the daemon from
+    # anyone who can reach its socket; none may read outside the partials
+    path = os.path.normpath(os.path.join(self.partials_dir, name.lstrip("/")))
+    relative = os.path.relpath(path, self.partials_dir)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+      raise MarkdownError(f"include {name!r} is outside {self.partials_dir}", includer, line)
+    return path
+
+  def split_markdown(self, markdown):
+    # (text, include name, lines before the segment in markdown)
+    segments = []
+    position = 0
+    line = 0
+    for match in INCLUDE_PATTERN.finditer(markdown):
+      segments.append((markdown[position:match.start()], None, line))
+      line += markdown.count("\n", position, match.start())
+      segments.append(("", match.group(1), line))
+      line += markdown.count("\n", match.start(), match.end())
+      position = match.end()
+    segments.append((markdown[position:], None, line))
+    return segments
+
+  def resolve(self, name, includer, parse, line=None):
+    path = self.partial_path(name, includer, line)
+    if includer is not None:
+      self.edges.setdefault(os.path.normpath(includer), set()).add(path)
+    expanding = self.expanding()
+    if path in expanding:
+      chain = expanding[expanding.index(path):] + [path]
+      raise IncludeCycleError(f"Include cycle: {' -> '.join(chain)}")
+    if path not in self.nodes:
+      markdown = self.read_text(path)
+      expanding.append(path)
+      try:
+        self.nodes[path] = parse(markdown, path)
+      finally:
+        expanding.pop()
+    return self.nodes[path]
+
+  def expanding(self):
+    if not hasattr(self.local, "expanding"):
+      self.local.expanding = []
+    return self.local.expanding
+
+  def forget(self, includer):
+    self.edges.pop(os.path.normpath(includer), None)
+
+  def included_by(self):
+    included_by = {}
+    for includer, partials in self.edges.items():
+      for partial in partials:
+        included_by.setdefault(partial, set()).add(includer)
+    return included_by
+
+  def includers_of(self, changed_paths, included_by):
+    seen = set()
+    pending = [os.path.normpath(path) for path in changed_paths]
+    while pending:
+      path = pending.pop()
+      for includer in included_by.get(path, ()):
+        if includer not in seen:
+          seen.add(includer)
+          pending.append(includer)
+    return seen
+
+  def pages_affected_by(self, changed_paths):
+    included_by = self.included_by()
+    affected = self.includers_of(changed_paths, included_by)
+    return {path for path in affected if path not in included_by}
+
+  def invalidate(self, changed_paths):
+    # drop cached nodes of changed partials and of every partial embedding them
+    stale = self.includers_of(changed_paths, self.included_by())
+    stale.update(os.path.normpath(path) for path in changed_paths)
+    for path in stale:
+      self.nodes.pop(path, None)
+
+  def save(self, graph_path):
+    import json
+    parent_dirs = os.path.dirname(graph_path)
+    if parent_dirs:
+      os.makedirs(parent_dirs, exist_ok=True)
+    edges = {
+      includer: sorted(partials)
+      for includer, partials in sorted(self.edges.items())
+    }
+    with open(graph_path, "w", encoding="utf-8") as f:
+      json.dump({"edges": edges}, f, indent=2)
+
+  def load(self, graph_path):
+    import json
+    try:
+      with open(graph_path, encoding="utf-8") as f:
+        edges = json.load(f)["edges"]
+    except FileNotFoundError:
+      return
+    for includer, partials in edges.items():
+      self.edges.setdefault(includer, set()).update(partials)
@@ -0,0 +1,248 @@
+import os
+import re
+from listing import page_url
+from leafnode import LeafNode
+from parentnode import ParentNode
+from utilities import LINK_PATTERN, WIKI_LINK_PATTERN
+
+# every page's outgoing links are collected before anything is rendered, so
+# [[Title]] links resolve through one title -> url map and each page can list
+# the pages linking to it. Plain links are recorded by target url, wiki-links
+# by title, so a link to a page that does not exist yet starts resolving as
+# soon as a page takes that title.
+MAPPED_LINK_PATTERN = re.compile(LINK_PATTERN.pattern.encode("utf-8"))
+MAPPED_WIKI_LINK_PATTERN = re.compile(WIKI_LINK_PATTERN.pattern.encode("utf-8"))
+
+def title_key(title):
+  return " ".join(title.split()).casefold()
+
+def link_target(href):
+  # only root-relative links can name a page; /blog/first/, /blog/first and
+  # /blog/first#top all name the same one
+  if not href.startswith("/") or href.startswith("//"):
+    return None
+  href = href.split("#", 1)[0].split("?", 1)[0]
+  if href.endswith("/index.html"):
+    href = href[:-len("index.html")]
+  if len(href) > 1:
+    href = href.rstrip("/")
+  return href or "/"
+
+def page_links(markdown):
+  links = {link_target(href) for _, href in LINK_PATTERN.findall(markdown)}
+  links.discard(None)
+  wiki = {title_key(title) for title, _ in WIKI_LINK_PATTERN.findall(markdown)}
+  return links, wiki
+
+def mapped_page_links(buffer):
+  links = {
+    link_target(href.decode("utf-8"))
+    for _, href in MAPPED_LINK_PATTERN.findall(buffer)
+  }
+  links.discard(None)
+  wiki = {
+    title_key(title.decode("utf-8"))
+    for title, _ in MAPPED_WIKI_LINK_PATTERN.findall(buffer)
+  }
+  return links, wiki
+
+class LinkGraph:
+  def __init__(self, content_dir="content"):
+    self.content_dir = content_dir
+    self.pages = {}
+    self.sources_by_url = {}
+    self.urls_by_title = {}
+    self.link_refs = {}
+    self.wiki_refs = {}
+
+  def url_for(self, source_path):
+    return page_url(os.path.relpath(source_path, self.content_dir))
+
+  def resolve_key(self, key):
+    urls = self.urls_by_title.get(key)
+    # two pages with one title resolve to the same one on every build
+    return min(urls) if urls else None
+
+  def resolve(self, title):
+    return self.resolve_key(title_key(title))
+
+  def targets(self, source_path):
+    page = self.pages.get(source_path)
+    if page is None:
+      return set()
+    targets = set(page["links"])
+    for key in page["wiki"]:
+      url = self.resolve_key(key)
+      if url is not None:
+        targets.add(url)
+    return targets
+
+  def linking_sources(self, url):
+    sources = set(self.link_refs.get(url, ()))
+    source_path = self.sources_by_url.get(url)
+    if source_path is not None and self.pages[source_path]["title"]:
+      key = title_key(self.pages[source_path]["title"])
+      if self.resolve_key(key) == url:
+        sources.update(self.wiki_refs.get(key, ()))
+    sources.discard(source_path)
+    return sources
+
+  def backlinks(self, url):
+    sources = self.linking_sources(url)
+    return sorted(
+      (self.pages[source]["title"] or self.pages[source]["url"], self.pages[source]["url"])
+      for source in sources
+    )
+
+  def backlinks_html(self, url):
+    backlinks = self.backlinks(url)
+    if not backlinks:
+      return ""
+    items = [
+      ParentNode("li", [LeafNode("a", title, {"href": href})])
+      for title, href in backlinks
+    ]
+    return ParentNode("ul", items, {"class": "backlinks"}).to_html()
+
+  def prefetch_urls(self, url, limit):
+    # the pages this one links to, most linked-to across the site first;
+    # ranks can drift in incremental builds until the page renders again
+    source_path = self.sources_by_url.get(url)
+    if source_path is None:
+      return []
+    targets = [
+      target for target in self.targets(source_path)
+      if target != url and target in self.sources_by_url
+    ]
+    targets.sort(key=lambda target: (-len(self.linking_sources(target)), target))
+    return targets[:limit]
+
+  def add_page(self, source_path, title, links, wiki):
+    self.discard_page(source_path)
+    url = self.url_for(source_path)
+    self.pages[source_path] = {
+      "url": url,
+      "title": title,
+      "links": set(links),
+      "wiki": set(wiki),
+    }
+    self.sources_by_url[url] = source_path
+    if title:
+      self.urls_by_title.setdefault(title_key(title), set()).add(url)
+    for target in links:
+      self.link_refs.setdefault(target, set()).add(source_path)
+    for key in wiki:
+      self.wiki_refs.setdefault(key, set()).add(source_path)
+
+  def discard_page(self, source_path):
+    page = self.pages.pop(source_path, None)
+    if page is None:
+      return
+    self.sources_by_url.pop(page["url"], None)
+    if page["title"]:
+      key = title_key(page["title"])
+      self.urls_by_title[key].discard(page["url"])
+      if not self.urls_by_title[key]:
+        del self.urls_by_title[key]
+    for target in page["links"]:
+      self.link_refs[target].discard(source_path)
+    for key in page["wiki"]:
+      self.wiki_refs[key].discard(source_path)
+
+  def neighbours(self, title, links, wiki):
+    # every page whose backlinks or resolved wiki-links a page with these
+    # links and this title can touch
+    urls = set(links)
+    urls.update(filter(None, map(self.resolve_key, wiki)))
+    if title:
+      key = title_key(title)
+      urls.update(self.urls_by_title.get(key, ()))
+      for source in self.wiki_refs.get(key, ()):
+        urls.add(self.pages[source]["url"])
+        urls.update(self.targets(source))
+    return {self.sources_by_url[url] for url in urls if url in self.sources_by_url}
+
+  def page_state(self, source_path):
+    page = self.pages.get(source_path)
+    if page is None:
+      return None
+    wiki = sorted((key, self.resolve_key(key) or "") for key in page["wiki"])
+    return self.backlinks(page["url"]), wiki
+
+  def update_page(self, source_path, title=None, links=(), wiki=(), exists=True):
+    # returns the other pages whose backlinks or wiki-link targets changed,
+    # which are the only ones that need rendering again
+    candidates = self.neighbours(title, links, wiki)
+    page = self.pages.get(source_path)
+    if page is not None:
+      candidates.update(self.neighbours(page["title"], page["links"], page["wiki"]))
+    before = {source: self.page_state(source) for source in candidates}
+    if exists:
+      self.add_page(source_path, title, links, wiki)
+    else:
+      self.discard_page(source_path)
+    changed = {
+      source for source in candidates
+      if source in self.pages and before[source] != self.page_state(source)
+    }
+    changed.discard(source_path)
+    return changed
+
+  def remove_page(self, source_path):
+    return self.update_page(source_path, exists=False)
+
+  def save(self, graph_path):
+    import json
+    parent_dirs = os.path.dirname(graph_path)
+    if parent_dirs:
+      os.makedirs(parent_dirs, exist_ok=True)
+    data = {
+      source_path: {
+        "title": page["title"],
+        "links": sorted(page["links"]),
+        "wiki": sorted(page["wiki"]),
+      }
+      for source_path, page in sorted(self.pages.items())
+    }
+    with open(graph_path, "w", encoding="utf-8") as f:
+      json.dump(data, f, indent=2)
+
+  def load(self, graph_path):
+    import json
+    try:
+      with open(graph_path, encoding="utf-8") as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return False
+    for source_path, page in data.items():
+      self.add_page(source_path, page["title"], page["links"], page["wiki"])
+    return True
+
+def with_prefetch_links(template, urls):
+  if not urls:
+    return template
+  links = "".join(f'<link rel="prefetch" href="{url}">' for url in urls)
+  return template.replace("</head>", links + "</head>", 1)
+
+def read_link_graph(content_dir="content", now=None):
+  # the graph of a site on disk, for rendering one page outside a build
+  from datetime import datetime, timezone
+  from drafts import skip_reason
+  from frontmatter import parse_front_matter
+  from utilities import extract_title
+  now = now or datetime.now(timezone.utc)
+  graph = LinkGraph(content_dir)
+  for dirpath, _, filenames in os.walk(content_dir):
+    for filename in sorted(filenames):
+      if not filename.endswith(".md"):
+        continue
+      source_path = os.path.join(dirpath, filename)
+      try:
+        with open(source_path, encoding="utf-8") as f:
+          metadata, md = parse_front_matter(f.read())
+        title = metadata.get("title") or extract_title(md)
+      except Exception:
+        continue
+      if skip_reason(metadata, now) is None:
+        graph.add_page(source_path, title, *page_links(md))
+  return graph
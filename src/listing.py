@@ -0,0 +1,256 @@
+import os
+import bisect
+from datetime import date
+from leafnode import LeafNode
+from parentnode import ParentNode
+from utilities import write_page_targets
+
+def page_url(relative_path):
+  path = os.path.splitext(relative_path)[0].replace(os.sep, "/")
+  if path == "index":
+    return "/"
+  if path.endswith("/index"):
+    return "/" + path[:-len("/index")]
+  return f"/{path}.html"
+
+def listing_sort_key(entry):
+  # newest first, undated entries last, then by title; the url keeps keys
+  # unique so an entry can always be found again by bisecting
+  try:
+    ordinal = date.fromisoformat(entry["date"]).toordinal()
+  except (TypeError, ValueError):
+    return (1, 0, entry["title"], entry["url"])
+  return (0, -ordinal, entry["title"], entry["url"])
+
+class SectionIndex:
+  def __init__(self, section, per_page=10):
+    self.section = section
+    self.per_page = per_page
+    self.keys = []
+    self.entries = []
+    self.keys_by_url = {}
+    self.dirty_from = 0
+    self.rendered_page_count = 0
+
+  def page_count(self):
+    return max(1, -(-len(self.entries) // self.per_page))
+
+  def mark_dirty(self, position):
+    if self.dirty_from is None or position < self.dirty_from:
+      self.dirty_from = position
+
+  def add(self, url, title, published=None):
+    entry = {"url": url, "title": title, "date": published}
+    key = listing_sort_key(entry)
+    if self.keys_by_url.get(url) == key:
+      position = bisect.bisect_left(self.keys, key)
+      if self.entries[position] == entry:
+        # a page rendered again with the same title and date shifts nothing
+        return position
+    self.remove(url)
+    position = bisect.bisect_left(self.keys, key)
+    self.keys.insert(position, key)
+    self.entries.insert(position, entry)
+    self.keys_by_url[url] = key
+    self.mark_dirty(position)
+    return position
+
+  def remove(self, url):
+    key = self.keys_by_url.pop(url, None)
+    if key is None:
+      return None
+    position = bisect.bisect_left(self.keys, key)
+    del self.keys[position]
+    del self.entries[position]
+    self.mark_dirty(position)
+    return position
+
+  def dirty_pages(self):
+    if self.dirty_from is None:
+      return []
+    first_page = self.dirty_from // self.per_page + 1
+    page_count = self.page_count()
+    if self.rendered_page_count and self.rendered_page_count != page_count:
+      # the old or new last page gains or loses its "Older" link
+      first_page = min(first_page, self.rendered_page_count, page_count)
+    return list(range(first_page, page_count + 1))
+
+  def stale_pages(self):
+    return list(range(self.page_count() + 1, self.rendered_page_count + 1))
+
+  def mark_rendered(self):
+    self.dirty_from = None
+    self.rendered_page_count = self.page_count()
+
+  def page_entries(self, page_number):
+    start = (page_number - 1) * self.per_page
+    return self.entries[start:start + self.per_page]
+
+  def page_path(self, page_number):
+    if page_number == 1:
+      return f"{self.section}/index.html"
+    return f"{self.section}/page/{page_number}/index.html"
+
+  def page_href(self, page_number):
+    if page_number == 1:
+      return f"/{self.section}/"
+    return f"/{self.section}/page/{page_number}/"
+
+  def page_title(self, page_number):
+    title = self.section.rsplit("/", 1)[-1].replace("-", " ").title()
+    if page_number == 1:
+      return title
+    return f"{title} - Page {page_number}"
+
+  def page_to_html_node(self, page_number):
+    list_items = []
+    for entry in self.page_entries(page_number):
+      children = [LeafNode("a", entry["title"], {"href": entry["url"]})]
+      if entry["date"]:
+        children.append(LeafNode(None, " "))
+        children.append(LeafNode("time", entry["date"], {"datetime": entry["date"]}))
+      list_items.append(ParentNode("li", children))
+    nav_links = []
+    if page_number > 1:
+      nav_links.append(
+        LeafNode("a", "Newer", {"href": self.page_href(page_number - 1), "rel": "prev"})
+      )
+    if page_number < self.page_count():
+      nav_links.append(
+        LeafNode("a", "Older", {"href": self.page_href(page_number + 1), "rel": "next"})
+      )
+    children = [
+      LeafNode("h1", self.page_title(page_number)),
+      ParentNode("ul", list_items),
+    ]
+    if nav_links:
+      children.append(ParentNode("nav", nav_links))
+    return ParentNode("div", children)
+
+  def to_dict(self):
+    return {
+      "per_page": self.per_page,
+      "entries": self.entries,
+      "rendered_page_count": self.rendered_page_count,
+    }
+
+  @classmethod
+  def from_dict(cls, section, data):
+    section_index = cls(section, data["per_page"])
+    for entry in data["entries"]:
+      section_index.add(entry["url"], entry["title"], entry["date"])
+    section_index.dirty_from = None
+    section_index.rendered_page_count = data["rendered_page_count"]
+    return section_index
+
+class ListingIndex:
+  def __init__(self, content_dir="content", per_page=10, locales=()):
+    self.content_dir = content_dir
+    self.per_page = per_page
+    self.locales = set(locales)
+    self.sections = {}
+    self.section_roots = set()
+
+  def section_for(self, url):
+    parts = url.strip("/").split("/")
+    if parts == [""]:
+      return None, False
+    if parts[0] in self.locales:
+      # sections are per locale, e.g. "de/blog"; a locale's home page is not one
+      if len(parts) == 1:
+        return None, False
+      return f"{parts[0]}/{parts[1]}", len(parts) == 2
+    return parts[0], len(parts) == 1
+
+  def add_page(self, source_path, metadata):
+    url = page_url(os.path.relpath(source_path, self.content_dir))
+    section, is_section_root = self.section_for(url)
+    if section is None:
+      return
+    if is_section_root:
+      # a section with its own index page keeps it instead of a listing
+      self.section_roots.add(section)
+      return
+    if section not in self.sections:
+      self.sections[section] = SectionIndex(section, self.per_page)
+    self.sections[section].add(url, metadata["title"], metadata.get("date"))
+
+  def mark_all_dirty(self):
+    # a new template changes every listing page
+    for section_index in self.sections.values():
+      section_index.mark_dirty(0)
+
+  def remove_page(self, source_path):
+    url = page_url(os.path.relpath(source_path, self.content_dir))
+    section, is_section_root = self.section_for(url)
+    if is_section_root:
+      self.section_roots.discard(section)
+    elif section in self.sections:
+      self.sections[section].remove(url)
+
+  def render(self, template, targets, events=None):
+    rendered = []
+    for section, section_index in sorted(self.sections.items()):
+      if section in self.section_roots:
+        continue
+      for page_number in section_index.dirty_pages():
+        dest_path = section_index.page_path(page_number)
+        if events is not None:
+          events.emit("page-started", source=None, dest=dest_path)
+        bytes_written = write_page_targets(
+          targets,
+          dest_path,
+          template,
+          section_index.page_title(page_number),
+          section_index.page_to_html_node(page_number),
+        )
+        if events is not None:
+          events.emit("page-done", source=None, dest=dest_path, bytes=bytes_written)
+        rendered.append(dest_path)
+      for page_number in section_index.stale_pages():
+        dest_path = section_index.page_path(page_number)
+        for output, _ in targets:
+          if output.exists(dest_path):
+            output.remove(dest_path)
+      section_index.mark_rendered()
+    return rendered
+
+  def to_dict(self):
+    return {
+      "section_roots": sorted(self.section_roots),
+      "sections": {
+        section: section_index.to_dict()
+        for section, section_index in sorted(self.sections.items())
+      },
+    }
+
+  def merge(self, data):
+    # entries recorded by another build of part of the site, e.g. a shard;
+    # every section they touch renders again
+    self.section_roots.update(data["section_roots"])
+    for section, section_data in data["sections"].items():
+      if section not in self.sections:
+        self.sections[section] = SectionIndex(section, section_data["per_page"])
+      for entry in section_data["entries"]:
+        self.sections[section].add(entry["url"], entry["title"], entry["date"])
+
+  def save(self, index_path):
+    import json
+    parent_dirs = os.path.dirname(index_path)
+    if parent_dirs:
+      os.makedirs(parent_dirs, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+      json.dump(self.to_dict(), f, indent=2)
+
+  def load(self, index_path):
+    import json
+    try:
+      with open(index_path, encoding="utf-8") as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return
+    self.section_roots = set(data["section_roots"])
+    self.sections = {
+      section: SectionIndex.from_dict(section, section_data)
+      for section, section_data in data["sections"].items()
+    }
@@ -0,0 +1,94 @@
+import sys
+import time
+import threading
+from daemon import RenderClient
+
+SAMPLE_MARKDOWN = """# Load test
+
+Some **bold** text, some _italic_ text and a [link](/blog/).
+
+- one
+  - nested
+- two
+
+```python
+def main():
+  return 42
+```
+"""
+
+def percentile(samples, pct):
+  ordered = sorted(samples)
+  index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+  return ordered[index]
+
+def run_load(
+  socket_path,
+  clients=8,
+  requests_per_client=200,
+  markdown=SAMPLE_MARKDOWN,
+  rebuild_paths=None,
+):
+  # with rebuild_paths, one more client keeps rebuilding those paths while
+  # the renders run, so renders overlap the builder's state being reset
+  latencies = []
+  errors = []
+  rebuilds = 0
+  lock = threading.Lock()
+  done = threading.Event()
+
+  def client_loop():
+    samples = []
+    with RenderClient(socket_path) as client:
+      for _ in range(requests_per_client):
+        start = time.perf_counter()
+        response = client.request({"op": "render", "markdown": markdown})
+        samples.append(time.perf_counter() - start)
+        if not response["ok"]:
+          errors.append(response["error"])
+    with lock:
+      latencies.extend(samples)
+
+  def rebuild_loop():
+    nonlocal rebuilds
+    with RenderClient(socket_path) as client:
+      while not done.is_set():
+        response = client.request({"op": "rebuild", "paths": rebuild_paths})
+        rebuilds += 1
+        if not response["ok"]:
+          errors.append(response["error"])
+
+  threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+  rebuilder = threading.Thread(target=rebuild_loop) if rebuild_paths else None
+  start = time.perf_counter()
+  if rebuilder is not None:
+    rebuilder.start()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  done.set()
+  if rebuilder is not None:
+    rebuilder.join()
+  return {
+    "requests": len(latencies),
+    "errors": len(errors),
+    "rebuilds": rebuilds,
+    "p50_ms": percentile(latencies, 50) * 1000,
+    "p99_ms": percentile(latencies, 99) * 1000,
+    "throughput_rps": len(latencies) / elapsed,
+  }
+
+def main():
+  socket_path = sys.argv[1] if len(sys.argv) >= 2 else "ssg.sock"
+  clients = int(sys.argv[2]) if len(sys.argv) >= 3 else 8
+  requests_per_client = int(sys.argv[3]) if len(sys.argv) >= 4 else 200
+  report = run_load(socket_path, clients, requests_per_client)
+  print(f"requests: {report['requests']} ({report['errors']} errors)")
+  print(f"p50: {report['p50_ms']:.2f} ms")
+  print(f"p99: {report['p99_ms']:.2f} ms")
+  print(f"throughput: {report['throughput_rps']:.0f} req/s")
+
+if __name__ == "__main__":
+  main()
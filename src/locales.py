@@ -0,0 +1,75 @@
+from listing import page_url
+
+# content/<locale>/<path> trees; the first locale is the default and every
+# page missing from another locale falls back to the default's rendering
+
+class LocaleIndex:
+  def __init__(self, locales, content_dir="content"):
+    self.locales = list(locales)
+    self.default_locale = self.locales[0]
+    self.content_dir = content_dir
+    self.pages = {}
+
+  def split_path(self, source_path):
+    parts = source_path[len(self.content_dir) + 1:].split("/", 1)
+    if len(parts) != 2 or parts[0] not in self.locales:
+      return None, None
+    return parts[0], parts[1]
+
+  def add(self, source_path):
+    locale, relative_path = self.split_path(source_path)
+    if locale is None:
+      return False
+    self.pages.setdefault(relative_path, {})[locale] = source_path
+    return True
+
+  def remove(self, source_path):
+    locale, relative_path = self.split_path(source_path)
+    if locale is None:
+      return False
+    sources = self.pages.get(relative_path, {})
+    sources.pop(locale, None)
+    if not sources:
+      self.pages.pop(relative_path, None)
+    return True
+
+  def sources(self, relative_path):
+    return self.pages.get(relative_path, {})
+
+  def page_path(self, locale, relative_path):
+    return f"{self.content_dir}/{locale}/{relative_path}"
+
+  def page_locales(self, relative_path):
+    sources = self.sources(relative_path)
+    if self.default_locale in sources:
+      return list(self.locales)
+    return [locale for locale in self.locales if locale in sources]
+
+  def source_for(self, locale, relative_path):
+    sources = self.sources(relative_path)
+    return sources.get(locale) or sources.get(self.default_locale)
+
+  def url_map(self, relative_path):
+    return {
+      locale: page_url(f"{locale}/{relative_path}")
+      for locale in self.page_locales(relative_path)
+    }
+
+  def alternate_links(self, relative_path):
+    urls = self.url_map(relative_path)
+    if len(urls) < 2:
+      return ""
+    links = [
+      f'<link rel="alternate" hreflang="{locale}" href="{url}" />'
+      for locale, url in urls.items()
+    ]
+    if self.default_locale in urls:
+      links.append(
+        f'<link rel="alternate" hreflang="x-default" href="{urls[self.default_locale]}" />'
+      )
+    return "".join(links)
+
+def with_alternate_links(template, links):
+  if not links:
+    return template
+  return template.replace("</head>", links + "</head>", 1)
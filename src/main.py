@@ -1,76 +1,231 @@
-import os
 import sys
-import shutil
-from textnode import TextNode, TextType
-from utilities import (generate_page)
 
-def copy_static_files_to_public(output_dir):
-  if os.path.exists(output_dir):
-    print("Removing existing public directory", end="...")
-    try:
-      shutil.rmtree(output_dir)
-    except Exception as e:
-      print(f"Error:\n{e}")
-    print("Done!")
-  copy_static_recursive("static", output_dir)
-  
-def copy_static_recursive(source, output_dir):
-  destination = os.path.join(output_dir, "/".join(source.split("/")[1:]))
-  print(f"Copying {source} to {destination}", end="...")
-  if os.path.isfile(source):
-    try:
-      shutil.copy(source, destination)
-    except Exception as e:
-      print(f"Error:\n{e}")
-    print("Done!")
-  else:
-    os.makedirs(destination, exist_ok=True)
-    print("Done!")
-    content_list = os.listdir(source)
-    for item in content_list:
-      path = os.path.join(source, item)
-      copy_static_recursive(path, output_dir)
+# everything beyond sys is imported inside the command that needs it, so a
+# single-page preview never pays for the builder, backends or archive modules
+
+def preview(source_path, basepath):
+  from includes import IncludeResolver
+  from frontmatter import parse_front_matter
+  from utilities import RenderScope, markdown_to_html_node, extract_title, write_page_to
+  with open("template.html", encoding="utf-8") as f:
+    template = f.read()
+  with open(source_path, encoding="utf-8") as f:
+    metadata, md = parse_front_matter(f.read())
+  title = metadata.get("title") or extract_title(md)
+  graph = None
+
+  def resolve_wiki_link(title):
+    # the site's links are only read once the page turns out to have a wiki-link
+    nonlocal graph
+    if graph is None:
+      from links import read_link_graph
+      graph = read_link_graph()
+    return graph.resolve(title)
 
-def generate_pages_recursive(
-  dir_path_content,
-  template_path,
-  dest_dir_path,
-  basepath
+  html_node = markdown_to_html_node(
+    md,
+    IncludeResolver("partials"),
+    source_path,
+    scope=RenderScope(resolve_wiki_link=resolve_wiki_link),
+  )
+  write_page_to(sys.stdout, template, title, html_node, basepath)
+
+def build(
+  basepath,
+  output_target,
+  changed_paths,
+  extra_targets=(),
+  locales=None,
+  mtime=None,
+  manifest_path=None,
+  events=None,
+  keep_going=False,
+  only_failed=False,
+  render_timeout=None,
+  workers=None,
+  critical_css=False,
+  prefetch_limit=0,
+  shard=None,
 ):
-  item_name = os.path.basename(dir_path_content)
-  if os.path.isfile(dir_path_content):
-    filename, ext = os.path.splitext(item_name)
-    if ext == ".md":
-      new_file = os.path.join(dest_dir_path, filename + ".html")
-      generate_page(dir_path_content, template_path, new_file, basepath)
-    else:
-      print(f"Skipping file {item_name}, as it is not markdown")
-  else:
-    contents = os.listdir(dir_path_content)
-    for item in contents:
-      next_item_path = os.path.join(dir_path_content, item)
-      next_dest_path = (
-        dest_dir_path if os.path.isfile(next_item_path)
-        else os.path.join(dest_dir_path, item)
-      )
-      generate_pages_recursive(
-        next_item_path,
-        template_path,
-        next_dest_path,
-        basepath
+  from contextlib import ExitStack
+  from backends import DirectoryBackend, open_output_backend, open_input_backend
+  from builder import Builder
+  with ExitStack() as stack:
+    targets = [
+      (
+        stack.enter_context(
+          open_output_backend(target, mtime, only_failed or changed_paths is not None)
+        ),
+        target_basepath,
       )
+      for target_basepath, target in [(basepath, output_target), *extra_targets]
+    ]
+    builder = Builder(
+      DirectoryBackend("."),
+      None,
+      cache_dir=".cache",
+      targets=targets,
+      locales=locales,
+      events=events,
+      keep_going=keep_going or only_failed,
+      render_timeout=render_timeout,
+      critical_css=critical_css,
+      prefetch_limit=prefetch_limit,
+      shard=shard,
+    )
+    if only_failed:
+      builder.build_failed()
+    elif changed_paths is not None:
+      builder.build_changed(changed_paths)
+    else:
+      builder.build(workers)
+  if manifest_path is not None:
+    from verify import digest_manifest, write_manifest
+    with open_input_backend(output_target) as output:
+      write_manifest(digest_manifest(output), manifest_path)
+  if shard is not None:
+    # each target's partial output is described next to it for merge
+    from verify import digest_manifest, write_manifest
+    from shard import shard_manifest, shard_manifest_path
+    for target_basepath, target in [(basepath, output_target), *extra_targets]:
+      with open_input_backend(target) as output:
+        manifest = shard_manifest(builder, target_basepath, digest_manifest(output))
+      write_manifest(manifest, shard_manifest_path(target))
+  return builder.failures
 
-def main():
-  # first cmd line arg should be the root path for site if different from '/'
-  basepath = sys.argv[1] if len(sys.argv) >= 2 else "/"
-  output_dir = "docs"
-  copy_static_files_to_public(output_dir)
-  generate_pages_recursive(
-    "content",
-    "template.html",
-    output_dir,
-    basepath,
+def merge(shard_targets, output_target, mtime=None, manifest_path=None, events=None):
+  from backends import open_input_backend
+  from shard import merge_shards
+  with open("template.html", encoding="utf-8") as f:
+    template = f.read()
+  _, failures = merge_shards(shard_targets, output_target, template, mtime, events)
+  if manifest_path is not None:
+    from verify import digest_manifest, write_manifest
+    with open_input_backend(output_target) as output:
+      write_manifest(digest_manifest(output), manifest_path)
+  return failures
+
+def report_failures(failures):
+  for failure in failures.values():
+    print(f"{failure['location']}: {failure['error']}", file=sys.stderr)
+  print(f"{len(failures)} pages failed, see .cache/failures.json", file=sys.stderr)
+  sys.exit(1)
+
+def parse_args(argv):
+  import argparse
+  def extra_target(value):
+    target_basepath, separator, target = value.partition("=")
+    if not separator:
+      raise argparse.ArgumentTypeError(f"expected BASEPATH=OUTPUT, got {value!r}")
+    return target_basepath, target
+  def shard(value):
+    from shard import ShardError, parse_shard
+    try:
+      return parse_shard(value)
+    except ShardError as error:
+      raise argparse.ArgumentTypeError(str(error)) from None
+  common = argparse.ArgumentParser(add_help=False)
+  # `--output TARGET` writes to a directory, a .zip/.tar/.tar.gz archive or
+  # a content-addressed store given as cas:DIR
+  common.add_argument("--output", default="docs", metavar="TARGET")
+  # `--reproducible` pins every output mtime to $SOURCE_DATE_EPOCH (or 0) and
+  # `--manifest FILE` records a sha256 per output file for verify.py
+  common.add_argument("--reproducible", action="store_true")
+  common.add_argument("--manifest", metavar="FILE")
+  # `--events DEST` writes JSON-lines build events to a file, "-" for stdout
+  # or fd:N for an inherited descriptor; `--quiet` drops the progress bar
+  common.add_argument("--events", metavar="DEST")
+  common.add_argument("--quiet", action="store_true")
+  parser = argparse.ArgumentParser(prog="main.py")
+  commands = parser.add_subparsers(dest="command", required=True)
+  build_parser = commands.add_parser("build", parents=[common], help="build the site (default)")
+  # the root path for the site if different from '/'
+  build_parser.add_argument("basepath", nargs="?", default="/")
+  # `--changed FILE...` re-renders only the pages affected by those files
+  build_parser.add_argument("--changed", nargs="+", metavar="FILE")
+  # `--target BASEPATH=OUTPUT` (repeatable) builds the same site for another
+  # deployment from the same parse, e.g. --target /mirror/=mirror.zip
+  build_parser.add_argument(
+    "--target",
+    dest="extra_targets",
+    action="append",
+    default=[],
+    type=extra_target,
+    metavar="BASEPATH=OUTPUT",
   )
+  # `--locales en,de` treats content/<locale>/ as translations of the first
+  # locale, which untranslated pages fall back to
+  build_parser.add_argument("--locales", type=lambda value: value.split(","))
+  # `--keep-going` records failing pages in .cache/failures.json and builds
+  # the rest; `--only-failed` re-renders just those pages into the output
+  build_parser.add_argument("--keep-going", action="store_true")
+  build_parser.add_argument("--only-failed", action="store_true")
+  # `--render-timeout SECONDS` fails any page that takes longer to render
+  build_parser.add_argument("--render-timeout", type=float, metavar="SECONDS")
+  # `--jobs N` renders a full build in N processes sharing one copy of the
+  # sources; it needs directory outputs and falls back to one process otherwise
+  build_parser.add_argument("--jobs", dest="workers", type=int, metavar="N")
+  # `--critical-css` inlines the stylesheet rules each page can use and
+  # loads the full sheet last; `--prefetch N` adds prefetch hints for up to
+  # N of the pages each page links to
+  build_parser.add_argument("--critical-css", action="store_true")
+  build_parser.add_argument("--prefetch", dest="prefetch_limit", type=int, default=0, metavar="N")
+  # `--shard i/N` renders the i-th of N deterministic slices of the site next
+  # to a shard manifest; `merge SHARD_OUTPUT...` then combines all N into
+  # --output and renders the listing pages
+  build_parser.add_argument("--shard", type=shard, metavar="i/N")
+  # `--preview FILE` renders one page to stdout without building the site
+  build_parser.add_argument("--preview", metavar="FILE")
+  merge_parser = commands.add_parser("merge", parents=[common], help="combine shard outputs")
+  merge_parser.add_argument("shards", nargs="+", metavar="SHARD_OUTPUT")
+  # `build` is the default command, so `main.py /blog/` still builds
+  if not argv or argv[0] not in ("build", "merge", "-h", "--help"):
+    argv = ["build", *argv]
+  return parser.parse_args(argv)
+
+def main():
+  args = parse_args(sys.argv[1:])
+  if args.command == "build" and args.preview is not None:
+    preview(args.preview, args.basepath)
+    return
+  mtime = None
+  if args.reproducible:
+    import os
+    mtime = int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+  from events import EventStream, JsonLinesWriter, ProgressBar
+  events = EventStream()
+  if not args.quiet:
+    events.add_handler(ProgressBar(sys.stderr))
+  if args.events is not None:
+    if args.events == "-":
+      events_file = sys.stdout
+    elif args.events.startswith("fd:"):
+      events_file = open(int(args.events[len("fd:"):]), "w", encoding="utf-8", closefd=False)
+    else:
+      events_file = open(args.events, "w", encoding="utf-8")
+    events.add_handler(JsonLinesWriter(events_file))
+  if args.command == "merge":
+    failures = merge(args.shards, args.output, mtime, args.manifest, events)
+  else:
+    failures = build(
+      args.basepath,
+      args.output,
+      args.changed,
+      args.extra_targets,
+      args.locales,
+      mtime,
+      args.manifest,
+      events,
+      args.keep_going,
+      args.only_failed,
+      args.render_timeout,
+      args.workers,
+      args.critical_css,
+      args.prefetch_limit,
+      args.shard,
+    )
+  if failures:
+    report_failures(failures)
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  main()
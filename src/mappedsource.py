@@ -0,0 +1,120 @@
+import re
+import mmap
+from frontmatter import parse_front_matter
+from parentnode import ParentNode
+from utilities import (
+  markdown_to_located_blocks,
+  markdown_to_html_nodes,
+  list_marker,
+  title_from_blocks,
+  RenderTimeout,
+  deadline_passed,
+)
+
+# large sources are parsed straight off an mmap: block boundaries are found
+# on the raw bytes and only one block is decoded at a time. A block can only
+# end at a run of blank lines; ASCII whitespace is enough to find those runs
+# because every candidate is re-split by markdown_to_blocks after decoding.
+BLANK_LINES_PATTERN = re.compile(rb"\n(?:[ \t\r\f\v]*\n)+")
+LEADING_BLANK_LINES_PATTERN = re.compile(rb"(?:[ \t\r\f\v]*\n)*")
+FRONT_MATTER_PATTERN = re.compile(rb"---[ \t]*\n.*?\n---[ \t]*(?:\n|$)", re.DOTALL)
+
+class MappedChildren:
+  # re-iterable, so a node tree over a mapping can be rendered more than once
+  def __init__(self, iter_nodes):
+    self.iter_nodes = iter_nodes
+
+  def __iter__(self):
+    return self.iter_nodes()
+
+class MappedMarkdown:
+  def __init__(self, buffer, release_interval=1 << 24):
+    self.buffer = buffer
+    self.release_interval = release_interval
+    match = FRONT_MATTER_PATTERN.match(buffer)
+    if match is None:
+      self.metadata = {}
+      self.body_start = 0
+    else:
+      self.metadata, _ = parse_front_matter(buffer[:match.end()].decode("utf-8"))
+      self.body_start = match.end()
+
+  @classmethod
+  def open(cls, path):
+    with open(path, "rb") as f:
+      return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+  def first_line(self, start):
+    start = LEADING_BLANK_LINES_PATTERN.match(self.buffer, start).end()
+    end = self.buffer.find(b"\n", start)
+    if end == -1:
+      end = len(self.buffer)
+    return self.buffer[start:end].decode("utf-8")
+
+  def continues_list(self, block_start, next_start):
+    if self.buffer[next_start:next_start + 1] not in (b" ", b"\t"):
+      return False
+    return list_marker(self.first_line(block_start).expandtabs(4)) is not None
+
+  def iter_block_spans(self):
+    start = self.body_start
+    for match in BLANK_LINES_PATTERN.finditer(self.buffer, self.body_start):
+      if self.continues_list(start, match.end()):
+        continue
+      yield start, match.start()
+      start = match.end()
+    yield start, len(self.buffer)
+
+  def release(self, start, end):
+    # pages behind the cursor are dropped from this process's RSS; they stay
+    # in the page cache, so nothing is re-read from disk
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start and hasattr(self.buffer, "madvise"):
+      self.buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+    return end
+
+  def iter_located_blocks(self):
+    # (line number, block); lines are counted on each span as it is decoded
+    # and on the short blank runs between spans, never on the whole prefix
+    released = 0
+    line = self.buffer[:self.body_start].count(b"\n")
+    previous_end = self.body_start
+    for start, end in self.iter_block_spans():
+      line += self.buffer[previous_end:start].count(b"\n")
+      text = self.buffer[start:end].decode("utf-8")
+      for block_line, block in markdown_to_located_blocks(text):
+        yield line + block_line + 1, block
+      line += text.count("\n")
+      previous_end = end
+      if start - released >= self.release_interval:
+        released = self.release(released, start)
+
+  def iter_blocks(self):
+    for _, block in self.iter_located_blocks():
+      yield block
+
+  def title(self):
+    return self.metadata.get("title") or title_from_blocks(self.iter_blocks())
+
+  def iter_html_nodes(self, includes=None, source_path=None, scope=None):
+    # the scope is entered per block, never held across a yield
+    for line, block in self.iter_located_blocks():
+      if deadline_passed():
+        raise RenderTimeout("render timed out", source_path, line)
+      yield from markdown_to_html_nodes(block, includes, source_path, scope, line - 1)
+
+  def to_html_node(self, includes=None, source_path=None, scope=None):
+    return ParentNode(
+      "div",
+      MappedChildren(lambda: self.iter_html_nodes(includes, source_path, scope)),
+    )
+
+  def close(self):
+    self.buffer.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
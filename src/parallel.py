@@ -0,0 +1,200 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from backends import Backend, DirectoryBackend, under_prefix
+from events import EventStream
+
+# a process-parallel build reads every source once into a single shared
+# memory segment with an offset table. Workers attach to it by name, decode
+# pages straight out of it and write their own output files, so all that
+# comes back to the parent is one small status record per page.
+
+class SharedCorpus:
+  def __init__(self, segment, offsets):
+    self.segment = segment
+    self.offsets = offsets
+
+  @classmethod
+  def create(cls, backend, paths):
+    contents = [backend.read_bytes(path) for path in paths]
+    segment = shared_memory.SharedMemory(create=True, size=max(1, sum(map(len, contents))))
+    offsets = {}
+    position = 0
+    for path, data in zip(paths, contents):
+      segment.buf[position:position + len(data)] = data
+      offsets[path] = (position, len(data))
+      position += len(data)
+    return cls(segment, offsets)
+
+  @classmethod
+  def attach(cls, name, offsets):
+    # pool workers share the parent's resource tracker, so attaching does not
+    # make them owners; only the parent unlinks the segment
+    return cls(shared_memory.SharedMemory(name=name), offsets)
+
+  def view(self, path):
+    start, length = self.offsets[path]
+    return self.segment.buf[start:start + length]
+
+  def close(self):
+    self.segment.close()
+
+  def unlink(self):
+    self.segment.unlink()
+
+class CorpusBackend(Backend):
+  # read-only; a page is decoded from the segment without an extra copy
+  def __init__(self, corpus):
+    self.corpus = corpus
+    self.paths = sorted(corpus.offsets)
+
+  def list_files(self, prefix=""):
+    return [path for path in self.paths if under_prefix(path, prefix)]
+
+  def exists(self, path):
+    return path in self.corpus.offsets
+
+  def version(self, path):
+    return self.corpus.offsets[path]
+
+  def read_bytes(self, path):
+    with self.corpus.view(path) as view:
+      return bytes(view)
+
+  def read_text(self, path):
+    with self.corpus.view(path) as view:
+      return str(view, "utf-8")
+
+class PageRecorder:
+  # stands in for the worker's listing index; the parent owns the real one
+  def __init__(self):
+    self.metadata = {}
+
+  def add_page(self, source_path, metadata):
+    self.metadata[source_path] = metadata
+
+  def remove_page(self, source_path):
+    self.metadata.pop(source_path, None)
+
+_worker = None
+
+def init_worker(segment_name, offsets, settings):
+  global _worker
+  from builder import Builder
+  corpus = SharedCorpus.attach(segment_name, offsets)
+  events = []
+  builder = Builder(
+    CorpusBackend(corpus),
+    None,
+    cache_dir=settings["cache_dir"],
+    content_dir=settings["content_dir"],
+    template_path=settings["template_path"],
+    partials_dir=settings["partials_dir"],
+    static_dir=settings["static_dir"],
+    targets=[
+      (DirectoryBackend(root), basepath)
+      for root, basepath in settings["targets"]
+    ],
+    events=EventStream(events.append),
+    mmap_threshold=None,
+    keep_going=True,
+    render_timeout=settings["render_timeout"],
+    critical_css=settings["critical_css"],
+    prefetch_limit=settings["prefetch_limit"],
+  )
+  builder.includes = builder.new_include_resolver()
+  builder.listings = PageRecorder()
+  builder.links = settings["links"]
+  builder.failures = {}
+  builder.critical = builder.new_critical_css()
+  _worker = (builder, events)
+
+def render_in_worker(source_path):
+  builder, events = _worker
+  events.clear()
+  dest_path = builder.render_page(source_path)
+  # partials record their own includes only when first parsed, so every
+  # record carries them and the parent merges
+  includes = {
+    includer: sorted(partials)
+    for includer, partials in builder.includes.edges.items()
+    if includer == source_path or not under_prefix(includer, builder.content_dir)
+  }
+  return {
+    "source": source_path,
+    "dest": dest_path,
+    "metadata": builder.listings.metadata.pop(source_path, None),
+    "includes": includes,
+    "failure": builder.failures.pop(source_path, None),
+    "events": list(events),
+  }
+
+def can_render_in_parallel(targets):
+  # workers write their pages themselves, which only plain directories allow
+  return all(type(output) is DirectoryBackend for output, _ in targets)
+
+class ParallelRenderer:
+  def __init__(self, builder, workers):
+    self.builder = builder
+    self.workers = workers
+    self.corpus = None
+    self.pool = None
+
+  def corpus_paths(self, content_files):
+    builder = self.builder
+    paths = (
+      [builder.template_path]
+      + [path for path in content_files if path.endswith(".md")]
+      + builder.source.list_files(builder.partials_dir)
+    )
+    if builder.critical_css:
+      paths += [
+        path for path in builder.source.list_files(builder.static_dir)
+        if path.endswith(".css")
+      ]
+    return paths
+
+  def open(self, content_files):
+    builder = self.builder
+    self.corpus = SharedCorpus.create(builder.source, self.corpus_paths(content_files))
+    return CorpusBackend(self.corpus)
+
+  def start(self):
+    builder = self.builder
+    settings = {
+      "cache_dir": builder.cache_dir,
+      "content_dir": builder.content_dir,
+      "template_path": builder.template_path,
+      "partials_dir": builder.partials_dir,
+      "static_dir": builder.static_dir,
+      "targets": [(output.root, basepath) for output, basepath in builder.targets],
+      "render_timeout": builder.render_timeout,
+      "critical_css": builder.critical_css,
+      "prefetch_limit": builder.prefetch_limit,
+      "links": builder.links,
+    }
+    self.pool = multiprocessing.Pool(
+      self.workers,
+      initializer=init_worker,
+      initargs=(self.corpus.segment.name, self.corpus.offsets, settings),
+    )
+
+  def render(self, source_paths):
+    chunksize = max(1, len(source_paths) // (self.workers * 4))
+    return self.pool.imap(render_in_worker, source_paths, chunksize)
+
+  def close(self, finished=True):
+    if self.pool is not None:
+      if finished:
+        self.pool.close()
+      else:
+        self.pool.terminate()
+      self.pool.join()
+    if self.corpus is not None:
+      self.corpus.close()
+      self.corpus.unlink()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, *exc_info):
+    self.close(exc_type is None)
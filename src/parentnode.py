@@ -14,5 +14,15 @@ class ParentNode(HtmlNode):
         children_html += child.to_html()
     return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
 
+  def iter_html(self):
+    if self.tag is None:
+      raise ValueError("ParentNode must have a tag")
+    if self.children is None:
+      raise ValueError("ParentNode must have children")
+    yield f"<{self.tag}{self.props_to_html()}>"
+    for child in self.children:
+      yield from child.iter_html()
+    yield f"</{self.tag}>"
+
   def __repr__(self):
     return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
\ No newline at end of file
@@ -0,0 +1,107 @@
+import json
+import hashlib
+
+# `--shard i/N` renders the pages and static files whose path hashes to
+# shard i. Every shard still reads the whole site's links, so wiki-links and
+# backlinks come out as in a single build. Listing pages need every page's
+# metadata and are left to merge_shards, which combines the shard outputs
+# using the manifest each shard writes next to its output.
+
+class ShardError(Exception):
+  pass
+
+def parse_shard(value):
+  index, _, count = value.partition("/")
+  try:
+    index, count = int(index), int(count)
+  except ValueError:
+    raise ShardError(f"expected --shard i/N, got {value!r}") from None
+  if not 1 <= index <= count:
+    raise ShardError(f"shard {index}/{count} is out of range")
+  return index, count
+
+def shard_of(path, count):
+  # hash() is salted per process; a digest gives every machine the same split
+  digest = hashlib.sha256(path.encode("utf-8")).digest()
+  return int.from_bytes(digest[:8], "big") % count + 1
+
+def shard_manifest_path(target):
+  if target.startswith("cas:"):
+    target = target[len("cas:"):]
+  return target.rstrip("/") + ".shard.json"
+
+def shard_manifest(builder, basepath, digests):
+  index, count = builder.shard
+  return {
+    "shard": index,
+    "count": count,
+    "basepath": basepath,
+    "listings": builder.listings.to_dict(),
+    "failures": [builder.failures[path] for path in sorted(builder.failures)],
+    "files": digests,
+  }
+
+def load_shard_manifests(shard_targets):
+  manifests = []
+  for target in shard_targets:
+    manifest_path = shard_manifest_path(target)
+    try:
+      with open(manifest_path, encoding="utf-8") as f:
+        manifests.append(json.load(f))
+    except FileNotFoundError:
+      raise ShardError(f"{target}: no shard manifest at {manifest_path}") from None
+  if not manifests:
+    raise ShardError("no shards to merge")
+  count = manifests[0]["count"]
+  basepath = manifests[0]["basepath"]
+  for target, manifest in zip(shard_targets, manifests):
+    if manifest["count"] != count or manifest["basepath"] != basepath:
+      raise ShardError(f"{target}: shard {manifest['shard']}/{manifest['count']} is from another build")
+  indexes = sorted(manifest["shard"] for manifest in manifests)
+  if indexes != list(range(1, count + 1)):
+    raise ShardError(f"expected shards 1 to {count}, got {indexes}")
+  return manifests
+
+def merge_shards(shard_targets, output_target, template, mtime=None, events=None):
+  import time
+  from backends import open_output_backend, open_input_backend
+  from events import EventStream
+  from listing import ListingIndex
+  events = events if events is not None else EventStream()
+  started = time.perf_counter()
+  manifests = load_shard_manifests(shard_targets)
+  basepath = manifests[0]["basepath"]
+  failures = {
+    failure["source"]: failure
+    for manifest in manifests
+    for failure in manifest["failures"]
+  }
+  events.emit(
+    "build-started",
+    pages=0,
+    static_files=sum(len(manifest["files"]) for manifest in manifests),
+  )
+  digests = {}
+  with open_output_backend(output_target, mtime) as output:
+    output.clear()
+    for target, manifest in zip(shard_targets, manifests):
+      with open_input_backend(target) as shard_output:
+        for path, digest in sorted(manifest["files"].items()):
+          data = shard_output.read_bytes(path)
+          if hashlib.sha256(data).hexdigest() != digest:
+            raise ShardError(f"{target}: {path} does not match its shard manifest")
+          if digests.setdefault(path, digest) != digest:
+            raise ShardError(f"{path} differs between shards")
+          output.write_bytes(path, data)
+          events.emit("static-copied", source=f"{target}/{path}", dest=path, bytes=len(data))
+    listings = ListingIndex()
+    for manifest in manifests:
+      listings.merge(manifest["listings"])
+    rendered = listings.render(template, [(output, basepath)], events)
+  events.emit(
+    "build-done",
+    pages=len(rendered),
+    failed=len(failures),
+    seconds=time.perf_counter() - started,
+  )
+  return rendered, failures
@@ -0,0 +1,164 @@
+import re
+
+# block and inline rules are registered here and compiled, on first use after
+# a change, into a first-character dispatch table for blocks and a single
+# alternation regex for inline syntax. Registration order is priority order.
+
+class BlockRule:
+  def __init__(self, key, matches, render, first_chars=None):
+    self.key = key
+    self.matches = matches
+    self.render = render
+    # None means the rule can match a block starting with any character
+    self.first_chars = first_chars
+
+class InlineRule:
+  def __init__(self, key, pattern, to_text_node, first_chars=None, delimiter=None):
+    self.key = key
+    self.pattern = re.compile(pattern, re.DOTALL)
+    self.to_text_node = to_text_node
+    self.first_chars = first_chars
+    # a delimiter left unmatched in plain text is reported as unclosed
+    self.delimiter = delimiter
+
+class SyntaxRegistry:
+  def __init__(self, default_block_key, render_default_block, text_node):
+    self.default_block_key = default_block_key
+    self.text_node = text_node
+    self.block_rules = []
+    self.inline_rules = []
+    self.block_renderers = {default_block_key: render_default_block}
+    self.html_renderers = {}
+    self.block_table = None
+    self.any_char_rules = None
+    self.inline_pattern = None
+    self.inline_rules_by_group = None
+    self.stray_delimiter_pattern = None
+
+  def register_block(self, key, matches, render, first_chars=None):
+    self.block_rules.append(BlockRule(key, matches, render, first_chars))
+    self.block_renderers[key] = render
+    self.block_table = None
+
+  def register_inline(
+    self,
+    text_type,
+    pattern,
+    to_text_node,
+    first_chars=None,
+    to_html=None,
+    delimiter=None,
+  ):
+    # to_html turns the rule's text nodes into html nodes when text_type is
+    # not one text_node_to_html_node already knows
+    self.inline_rules.append(
+      InlineRule(text_type, pattern, to_text_node, first_chars, delimiter)
+    )
+    if to_html is not None:
+      self.html_renderers[text_type] = to_html
+    self.inline_pattern = None
+
+  def register_delimiter(self, text_type, delimiter, to_html=None):
+    escaped = re.escape(delimiter)
+    self.register_inline(
+      text_type,
+      f"{escaped}(.*?){escaped}",
+      lambda text: self.text_node(text, text_type),
+      delimiter[0],
+      to_html,
+      delimiter,
+    )
+
+  def compile_blocks(self):
+    first_chars = set()
+    for rule in self.block_rules:
+      first_chars.update(rule.first_chars or "")
+    self.block_table = {
+      char: [
+        rule for rule in self.block_rules
+        if rule.first_chars is None or char in rule.first_chars
+      ]
+      for char in first_chars
+    }
+    self.any_char_rules = [rule for rule in self.block_rules if rule.first_chars is None]
+
+  def compile_inline(self):
+    # each rule's pattern becomes one named alternative; its own groups follow
+    # the named one, so a rule is handed exactly the slice of groups it wrote
+    alternatives = []
+    self.inline_rules_by_group = {}
+    group_index = 0
+    for index, rule in enumerate(self.inline_rules):
+      group = f"rule{index}"
+      alternatives.append(f"(?P<{group}>{rule.pattern.pattern})")
+      # positions in match.groups(), which skips the whole-match group 0
+      self.inline_rules_by_group[group] = (
+        rule,
+        group_index + 1,
+        group_index + 1 + rule.pattern.groups,
+      )
+      group_index += 1 + rule.pattern.groups
+    pattern = "|".join(alternatives)
+    if all(rule.first_chars for rule in self.inline_rules):
+      # a leading character class lets the scan skip plain prose in C
+      first_chars = "".join(sorted({
+        char for rule in self.inline_rules for char in rule.first_chars
+      }))
+      pattern = f"(?=[{re.escape(first_chars)}])(?:{pattern})"
+    self.inline_pattern = re.compile(pattern, re.DOTALL)
+    delimiters = [
+      re.escape(rule.delimiter)
+      for rule in self.inline_rules
+      if rule.delimiter is not None
+    ]
+    self.stray_delimiter_pattern = re.compile("|".join(delimiters)) if delimiters else None
+
+  def block_type(self, block):
+    if self.block_table is None:
+      self.compile_blocks()
+    first_char = block[:1]
+    if first_char.isspace():
+      # unstripped blocks can start anywhere, so every rule gets a look
+      rules = self.block_rules
+    else:
+      rules = self.block_table.get(first_char, self.any_char_rules)
+    for rule in rules:
+      if rule.matches(block):
+        return rule.key
+    return self.default_block_key
+
+  def render_block(self, key, block):
+    render = self.block_renderers.get(key)
+    if render is None:
+      raise Exception("invalid BlockType")
+    return render(block)
+
+  def check_closed(self, text, plain_type):
+    if self.stray_delimiter_pattern is None:
+      return
+    stray = self.stray_delimiter_pattern.search(text)
+    if stray is not None:
+      node = self.text_node(text, plain_type)
+      raise Exception(f"Node '{node}' is missing a closing delimiter '{stray.group()}'")
+
+  def inline_nodes(self, text, plain_type):
+    if self.inline_pattern is None:
+      self.compile_inline()
+    nodes = []
+    position = 0
+    for match in self.inline_pattern.finditer(text):
+      rule, first_group, end_group = self.inline_rules_by_group[match.lastgroup]
+      groups = match.groups()
+      plain = text[position:match.start()]
+      if plain:
+        self.check_closed(plain, plain_type)
+        nodes.append(self.text_node(plain, plain_type))
+      node = rule.to_text_node(*groups[first_group:end_group])
+      if node.text != "":
+        nodes.append(node)
+      position = match.end()
+    plain = text[position:]
+    if plain:
+      self.check_closed(plain, plain_type)
+      nodes.append(self.text_node(plain, plain_type))
+    return nodes
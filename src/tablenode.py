@@ -0,0 +1,31 @@
+from htmlnode import HtmlNode
+
+class TableNode(HtmlNode):
+  def __init__(self, header, rows, props=None):
+    # rows is a callable returning a fresh iterator of row nodes, so body
+    # rows are built and serialized one at a time instead of held as children
+    super().__init__(tag="table", props=props)
+    self.header = header
+    self.rows = rows
+
+  def to_html(self):
+    return "".join(self.iter_html())
+
+  def iter_html(self):
+    if self.header is None:
+      raise ValueError("TableNode must have a header row")
+    yield f"<table{self.props_to_html()}><thead>"
+    yield from self.header.iter_html()
+    yield "</thead>"
+    has_body = False
+    for row in self.rows():
+      if not has_body:
+        yield "<tbody>"
+        has_body = True
+      yield from row.iter_html()
+    if has_body:
+      yield "</tbody>"
+    yield "</table>"
+
+  def __repr__(self):
+    return f"TableNode({self.header}, {self.props})"
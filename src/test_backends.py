@@ -0,0 +1,172 @@
+import io
+import os
+import sys
+import unittest
+import tempfile
+import subprocess
+from backends import (
+  ArchiveUpdate,
+  DirectoryBackend,
+  MemoryBackend,
+  ZipBackend,
+  TarBackend,
+  ContentAddressedBackend,
+  open_output_backend,
+  open_input_backend,
+)
+from test_builder import site_files
+from test_parallel import write_site
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+class TestBackends(unittest.TestCase):
+  def check_round_trip(self, backend, readable=True):
+    backend.write_text("a/b/page.html", "<p>hi</p>")
+    with backend.open_text("a/other.html") as f:
+      f.write("<p>streamed</p>")
+    backend.write_bytes("image.png", b"\x89PNG")
+    self.assertEqual(
+      sorted(backend.list_files()),
+      ["a/b/page.html", "a/other.html", "image.png"],
+    )
+    self.assertEqual(sorted(backend.list_files("a")), ["a/b/page.html", "a/other.html"])
+    self.assertTrue(backend.exists("a/b/page.html"))
+    self.assertFalse(backend.exists("a/b"))
+    if readable:
+      self.assertEqual(backend.read_text("a/other.html"), "<p>streamed</p>")
+      self.assertEqual(backend.read_bytes("image.png"), b"\x89PNG")
+
+  def test_directory_backend(self):
+    with tempfile.TemporaryDirectory() as root:
+      backend = DirectoryBackend(os.path.join(root, "out"))
+      self.check_round_trip(backend)
+      self.assertTrue(os.path.isfile(os.path.join(root, "out", "a", "b", "page.html")))
+      backend.remove("image.png")
+      self.assertFalse(backend.exists("image.png"))
+      backend.clear()
+      self.assertFalse(os.path.exists(os.path.join(root, "out")))
+
+  def test_memory_backend(self):
+    backend = MemoryBackend({"seed.md": "# Seed"})
+    self.assertEqual(backend.read_text("seed.md"), "# Seed")
+    backend.clear()
+    self.check_round_trip(backend)
+    self.assertRaises(FileNotFoundError, backend.read_bytes, "missing")
+
+  def test_memory_backend_version_changes_on_write(self):
+    backend = MemoryBackend({"template.html": "one"})
+    version = backend.version("template.html")
+    backend.write_text("template.html", "two")
+    self.assertNotEqual(backend.version("template.html"), version)
+    version = backend.version("template.html")
+    backend.remove("template.html")
+    self.assertRaises(FileNotFoundError, backend.version, "template.html")
+    # a path written again after removal never reuses an old version
+    backend.write_text("template.html", "one")
+    self.assertNotIn(backend.version("template.html"), (1, version))
+
+  def test_zip_backend(self):
+    archive = io.BytesIO()
+    with ZipBackend(archive, "w") as backend:
+      self.check_round_trip(backend)
+    with ZipBackend(io.BytesIO(archive.getvalue())) as backend:
+      self.assertEqual(backend.read_text("a/b/page.html"), "<p>hi</p>")
+      self.assertRaises(FileNotFoundError, backend.read_bytes, "missing")
+
+  def test_tar_backend(self):
+    archive = io.BytesIO()
+    with TarBackend(archive, "w:gz") as backend:
+      self.check_round_trip(backend, readable=False)
+    with TarBackend(io.BytesIO(archive.getvalue()), "r:gz") as backend:
+      self.assertEqual(sorted(backend.list_files("a")), ["a/b/page.html", "a/other.html"])
+      self.assertEqual(backend.read_text("a/other.html"), "<p>streamed</p>")
+      self.assertEqual(backend.read_bytes("image.png"), b"\x89PNG")
+
+  def test_content_addressed_backend_deduplicates(self):
+    with tempfile.TemporaryDirectory() as root:
+      with ContentAddressedBackend(root) as backend:
+        self.check_round_trip(backend)
+        backend.write_text("copy.html", "<p>hi</p>")
+        self.assertEqual(backend.version("copy.html"), backend.version("a/b/page.html"))
+        self.assertEqual(backend.blobs_written, 3)
+        self.assertEqual(backend.blobs_reused, 1)
+
+      with ContentAddressedBackend(root) as backend:
+        self.assertEqual(backend.read_text("copy.html"), "<p>hi</p>")
+        backend.clear()
+        backend.write_text("a/b/page.html", "<p>hi</p>")
+        backend.write_text("new.html", "<p>new</p>")
+        self.assertEqual(backend.blobs_reused, 1)
+        self.assertEqual(backend.blobs_written, 1)
+        self.assertEqual(backend.collect_garbage(), 2)
+        exported = MemoryBackend()
+        backend.export(exported)
+        self.assertEqual(sorted(exported.files), ["a/b/page.html", "new.html"])
+
+      with ContentAddressedBackend(root) as backend:
+        self.assertEqual(sorted(backend.list_files()), ["a/b/page.html", "new.html"])
+
+  def test_open_output_backend(self):
+    with tempfile.TemporaryDirectory() as root:
+      cases = [
+        (os.path.join(root, "docs"), DirectoryBackend),
+        (os.path.join(root, "site.zip"), ZipBackend),
+        (os.path.join(root, "site.tar"), TarBackend),
+        (os.path.join(root, "site.tar.gz"), TarBackend),
+        ("cas:" + os.path.join(root, "store"), ContentAddressedBackend),
+      ]
+      for target, backend_type in cases:
+        with open_output_backend(target) as backend:
+          self.assertIsInstance(backend, backend_type)
+
+  def test_archive_update_keeps_untouched_entries(self):
+    with tempfile.TemporaryDirectory() as root:
+      for name in ["site.zip", "site.tar", "site.tar.gz"]:
+        target = os.path.join(root, name)
+        with open_output_backend(target) as backend:
+          for path in ["a.html", "b.html", "c.html"]:
+            backend.write_text(path, path)
+        with open_output_backend(target, incremental=True) as backend:
+          self.assertIsInstance(backend, ArchiveUpdate)
+          backend.write_text("a.html", "new")
+          backend.remove("b.html")
+          backend.write_text("d.html", "written then dropped")
+          backend.remove("d.html")
+          self.assertFalse(backend.exists("b.html"))
+          self.assertEqual(backend.list_files(), ["a.html", "c.html"])
+        with open_input_backend(target) as backend:
+          self.assertEqual(backend.list_files(), ["a.html", "c.html"])
+          self.assertEqual(backend.read_text("a.html"), "new")
+          self.assertEqual(backend.read_text("c.html"), "c.html")
+        # a build that fails leaves the archive as it was
+        with self.assertRaises(RuntimeError):
+          with open_output_backend(target, incremental=True) as backend:
+            backend.remove("c.html")
+            raise RuntimeError("build failed")
+        with open_input_backend(target) as backend:
+          self.assertEqual(backend.list_files(), ["a.html", "c.html"])
+      self.assertEqual(sorted(os.listdir(root)), ["site.tar", "site.tar.gz", "site.zip"])
+
+  def test_changed_build_into_archive(self):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, site_files())
+      for name in ["site.zip", "site.tar.gz"]:
+        def run(*args):
+          subprocess.run(
+            [sys.executable, MAIN, "--quiet", "--output", name, *args],
+            cwd=root,
+            check=True,
+            capture_output=True,
+          )
+        run()
+        with open_input_backend(os.path.join(root, name)) as backend:
+          full = backend.list_files()
+        write_site(root, {"content/blog/first/index.md": "# First\n\nEdited"})
+        run("--changed", "content/blog/first/index.md")
+        with open_input_backend(os.path.join(root, name)) as backend:
+          self.assertEqual(backend.list_files(), full)
+          self.assertIn("Edited", backend.read_text("blog/first/index.html"))
+          self.assertIn("Home", backend.read_text("index.html"))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,367 @@
+import io
+import os
+import json
+import unittest
+import tempfile
+from backends import MemoryBackend, TarBackend, ZipBackend
+import builder as builder_module
+from builder import Builder
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+
+def site_files():
+  return {
+    "template.html": TEMPLATE,
+    "static/index.css": "body {}",
+    "static/images/a.png": b"\x89PNG",
+    "content/index.md": '# Home\n\n[Blog](/blog/)\n\n{{< include "footer.md" >}}',
+    "content/blog/first/index.md": "---\ndate: 2024-01-01\n---\n# First\n\nOne",
+    "content/blog/second/index.md": "---\ndate: 2024-02-01\n---\n# Second\n\nTwo",
+    "content/notes.txt": "not markdown",
+    "partials/footer.md": "Footer",
+  }
+
+class TestBuilder(unittest.TestCase):
+  def test_build_in_memory(self):
+    output = MemoryBackend()
+    rendered = Builder(MemoryBackend(site_files()), output, "/site/").build()
+    self.assertEqual(
+      sorted(rendered),
+      [
+        "blog/first/index.html",
+        "blog/index.html",
+        "blog/second/index.html",
+        "index.html",
+      ],
+    )
+    self.assertEqual(
+      sorted(output.files),
+      sorted(rendered + ["images/a.png", "index.css"]),
+    )
+    self.assertEqual(
+      output.read_text("index.html"),
+      '<title>Home</title><link href="/site/index.css"><div><h1>Home</h1>'
+      '<p><a href="/site/blog/">Blog</a></p><p>Footer</p></div>',
+    )
+    self.assertIn(
+      '<li><a href="/site/blog/second">Second</a>',
+      output.read_text("blog/index.html"),
+    )
+
+  def test_build_changed_reuses_in_memory_state(self):
+    source = MemoryBackend(site_files())
+    output = MemoryBackend()
+    builder = Builder(source, output)
+    builder.build()
+    source.write_text("partials/footer.md", "New footer")
+    self.assertEqual(builder.build_changed(["partials/footer.md"]), ["index.html"])
+    self.assertIn("<p>New footer</p>", output.read_text("index.html"))
+    source.write_text("content/blog/third/index.md", "---\ndate: 2024-03-01\n---\n# Third")
+    self.assertEqual(
+      builder.build_changed(["content/blog/third/index.md"]),
+      ["blog/third/index.html", "blog/index.html"],
+    )
+
+  def test_build_changed_template_and_static_files(self):
+    source = MemoryBackend(site_files())
+    output = MemoryBackend()
+    builder = Builder(source, output)
+    builder.build()
+    source.write_text("template.html", "<h6>{{ Title }}</h6>{{ Content }}")
+    source.write_text("static/index.css", "body {margin: 0}")
+    source.remove("static/images/a.png")
+    source.write_text("static/new.css", "p {}")
+    rendered = builder.build_changed(
+      ["template.html", "static/index.css", "static/images/a.png", "static/new.css"]
+    )
+    self.assertEqual(
+      sorted(rendered),
+      ["blog/first/index.html", "blog/index.html", "blog/second/index.html", "index.html"],
+    )
+    self.assertTrue(output.read_text("blog/index.html").startswith("<h6>Blog</h6>"))
+    self.assertEqual(output.read_text("index.css"), "body {margin: 0}")
+    self.assertEqual(output.read_text("new.css"), "p {}")
+    self.assertNotIn("images/a.png", output.files)
+    # a stylesheet alone renders no pages
+    source.write_text("static/new.css", "p {margin: 0}")
+    self.assertEqual(builder.build_changed(["static/new.css"]), [])
+    self.assertEqual(output.read_text("new.css"), "p {margin: 0}")
+
+  def test_body_edit_renders_no_listing_page(self):
+    files = site_files()
+    for day in range(1, 31):
+      files[f"content/blog/post-{day}.md"] = f"---\ndate: 2023-01-{day:02}\n---\n# Post {day}"
+    source = MemoryBackend(files)
+    builder = Builder(source, MemoryBackend())
+    builder.build()
+    source.write_text("content/blog/second/index.md", "---\ndate: 2024-02-01\n---\n# Second\n\nEdited")
+    self.assertEqual(
+      builder.build_changed(["content/blog/second/index.md"]),
+      ["blog/second/index.html"],
+    )
+
+  def test_template_reread_only_when_changed(self):
+    source = MemoryBackend(site_files())
+    builder = Builder(source, MemoryBackend())
+    template = builder.load_template()
+    self.assertIs(builder.load_template(), template)
+    source.write_text("template.html", "{{ Title }}|{{ Content }}")
+    self.assertEqual(builder.load_template(), "{{ Title }}|{{ Content }}")
+
+  def test_render_markdown(self):
+    builder = Builder(MemoryBackend(site_files()), MemoryBackend())
+    self.assertEqual(
+      builder.render_markdown('Hello\n\n{{< include "footer.md" >}}'),
+      "<div><p>Hello</p><p>Footer</p></div>",
+    )
+
+  def test_render_markdown_resolves_wiki_links_per_builder(self):
+    other_files = site_files()
+    other_files["content/blog/first/index.md"] = "# Elsewhere"
+    builder = Builder(MemoryBackend(site_files()), MemoryBackend())
+    other = Builder(MemoryBackend(other_files), MemoryBackend(), "/other/")
+    # neither has built yet; each reads its own site's links
+    builder.load_state()
+    other.load_state()
+    other.build()
+    self.assertEqual(builder.render_markdown("[[First]]"), '<div><p><a href="/blog/first">First</a></p></div>')
+    self.assertEqual(other.render_markdown("[[First]]"), "<div><p>First</p></div>")
+
+  def test_build_zip_to_zip(self):
+    source_archive = io.BytesIO()
+    with ZipBackend(source_archive, "w") as source:
+      for path, data in site_files().items():
+        source.write_bytes(path, data.encode("utf-8") if isinstance(data, str) else data)
+    output_archive = io.BytesIO()
+    with ZipBackend(io.BytesIO(source_archive.getvalue())) as source:
+      with ZipBackend(output_archive, "w") as output:
+        Builder(source, output).build()
+    with ZipBackend(io.BytesIO(output_archive.getvalue())) as output:
+      self.assertIn("<h1>First</h1>", output.read_text("blog/first/index.html"))
+
+  def test_multiple_targets_share_one_parse(self):
+    parse_count = 0
+    markdown_to_html_node = builder_module.markdown_to_html_node
+    def counting_parse(*args):
+      nonlocal parse_count
+      parse_count += 1
+      return markdown_to_html_node(*args)
+    builder_module.markdown_to_html_node = counting_parse
+    try:
+      targets = [(MemoryBackend(), basepath) for basepath in ["/", "/a/", "/b/"]]
+      Builder(MemoryBackend(site_files()), None, targets=targets).build()
+    finally:
+      builder_module.markdown_to_html_node = markdown_to_html_node
+    self.assertEqual(parse_count, 3)
+    for output, basepath in targets:
+      expected = MemoryBackend()
+      Builder(MemoryBackend(site_files()), expected, basepath).build()
+      self.assertEqual(output.files, expected.files)
+
+  def test_locales_fall_back_to_default_rendering(self):
+    source = MemoryBackend({
+      "template.html": "<head>{{ Title }}</head>{{ Content }}",
+      "content/en/blog/post.md": "# Post\n\nHello",
+      "content/en/blog/other.md": "# Other\n\nEnglish",
+      "content/de/blog/other.md": "# Andere\n\nDeutsch",
+    })
+    output = MemoryBackend()
+    parse_count = 0
+    markdown_to_html_node = builder_module.markdown_to_html_node
+    def counting_parse(*args):
+      nonlocal parse_count
+      parse_count += 1
+      return markdown_to_html_node(*args)
+    builder_module.markdown_to_html_node = counting_parse
+    try:
+      builder = Builder(source, output, locales=["en", "de"])
+      rendered = builder.build()
+    finally:
+      builder_module.markdown_to_html_node = markdown_to_html_node
+    self.assertEqual(parse_count, 3)
+    self.assertEqual(
+      sorted(rendered),
+      [
+        "de/blog/index.html",
+        "de/blog/other.html",
+        "de/blog/post.html",
+        "en/blog/index.html",
+        "en/blog/other.html",
+        "en/blog/post.html",
+      ],
+    )
+    self.assertIn("<p>Hello</p>", output.read_text("de/blog/post.html"))
+    self.assertIn("<p>Deutsch</p>", output.read_text("de/blog/other.html"))
+    self.assertIn(
+      '<link rel="alternate" hreflang="de" href="/de/blog/post.html" />',
+      output.read_text("en/blog/post.html"),
+    )
+    self.assertIn('href="/de/blog/post.html">Post</a>', output.read_text("de/blog/index.html"))
+    source.remove("content/de/blog/other.md")
+    builder.build_changed(["content/de/blog/other.md"])
+    self.assertIn("<p>English</p>", output.read_text("de/blog/other.html"))
+
+  def test_keep_going_records_failures_and_retries_them(self):
+    files = site_files()
+    files["content/blog/broken/index.md"] = "---\ndate: 2024-03-01\n---\n# Broken\n\nfine\n\nan **unclosed"
+    files["content/untitled.md"] = "no heading here"
+    source = MemoryBackend(files)
+    output = MemoryBackend()
+    with tempfile.TemporaryDirectory() as cache_dir:
+      builder = Builder(source, output, cache_dir=cache_dir, keep_going=True)
+      rendered = builder.build()
+      self.assertIn("index.html", rendered)
+      self.assertIn("blog/first/index.html", rendered)
+      self.assertEqual(
+        sorted(builder.failures),
+        ["content/blog/broken/index.md", "content/untitled.md"],
+      )
+      self.assertEqual(
+        builder.failures["content/blog/broken/index.md"]["location"],
+        "content/blog/broken/index.md:8",
+      )
+      self.assertNotIn("blog/broken/index.html", output.files)
+      self.assertNotIn("Broken", output.read_text("blog/index.html"))
+      with open(os.path.join(cache_dir, "failures.json"), encoding="utf-8") as f:
+        self.assertEqual(len(json.load(f)), 2)
+
+      source.write_text("content/blog/broken/index.md", "---\ndate: 2024-03-01\n---\n# Broken\n\nfixed **now**")
+      retry = Builder(source, output, cache_dir=cache_dir, keep_going=True)
+      self.assertEqual(
+        retry.build_failed(),
+        ["blog/broken/index.html", "blog/index.html"],
+      )
+      self.assertEqual(sorted(retry.failures), ["content/untitled.md"])
+      self.assertIn("<b>now</b>", output.read_text("blog/broken/index.html"))
+      self.assertIn("<h1>First</h1>", output.read_text("blog/first/index.html"))
+
+  def test_keep_going_leaves_no_partial_page_in_an_archive(self):
+    files = site_files()
+    # the bad cell only fails once the table is being written
+    files["content/a.md"] = "# A\n\n| x |\n| - |\n| an **unclosed |"
+    archive = io.BytesIO()
+    with TarBackend(archive, "w") as output:
+      builder = Builder(MemoryBackend(files), output, keep_going=True)
+      rendered = builder.build()
+    self.assertNotIn("a.html", rendered)
+    self.assertEqual(builder.failures["content/a.md"]["location"], "content/a.md:5")
+    with TarBackend(io.BytesIO(archive.getvalue())) as output:
+      self.assertNotIn("a.html", output.list_files())
+      self.assertIn("<h1>First</h1>", output.read_text("blog/first/index.html"))
+
+  def test_wiki_links_and_backlinks(self):
+    files = site_files()
+    files["template.html"] = "<title>{{ Title }}</title>{{ Content }}{{ Backlinks }}"
+    files["content/blog/first/index.md"] = "---\ndate: 2024-01-01\n---\n# First\n\nSee [[second]]"
+    source = MemoryBackend(files)
+    output = MemoryBackend()
+    builder = Builder(source, output, "/site/")
+    builder.build()
+    self.assertIn(
+      '<p>See <a href="/site/blog/second">second</a></p>',
+      output.read_text("blog/first/index.html"),
+    )
+    self.assertTrue(output.read_text("blog/second/index.html").endswith(
+      '<ul class="backlinks"><li><a href="/site/blog/first">First</a></li></ul>'
+    ))
+    self.assertNotIn("{{ Backlinks }}", output.read_text("blog/index.html"))
+
+    # an edit that keeps the links leaves the linked page alone, and one that
+    # keeps the title and date leaves the listing alone
+    source.write_text("content/blog/first/index.md", "---\ndate: 2024-01-01\n---\n# First\n\n[[Second]] again")
+    self.assertEqual(
+      builder.build_changed(["content/blog/first/index.md"]),
+      ["blog/first/index.html"],
+    )
+    source.write_text("content/blog/first/index.md", "---\ndate: 2024-01-01\n---\n# First\n\nNo links")
+    self.assertEqual(
+      builder.build_changed(["content/blog/first/index.md"]),
+      ["blog/first/index.html", "blog/second/index.html"],
+    )
+    self.assertTrue(output.read_text("blog/second/index.html").endswith("</div>"))
+
+  def test_wiki_link_waits_for_its_page(self):
+    files = site_files()
+    files["content/notes.md"] = "# Notes\n\n[[Third]]"
+    source = MemoryBackend(files)
+    output = MemoryBackend()
+    with tempfile.TemporaryDirectory() as cache_dir:
+      Builder(source, output, cache_dir=cache_dir).build()
+      self.assertIn("<p>Third</p>", output.read_text("notes.html"))
+      source.write_text("content/blog/third/index.md", "---\ndate: 2024-03-01\n---\n# Third")
+      # a fresh builder picks the link graph up from the cache
+      rendered = Builder(source, output, cache_dir=cache_dir).build_changed(
+        ["content/blog/third/index.md"]
+      )
+      self.assertIn("notes.html", rendered)
+      self.assertIn('<a href="/blog/third">Third</a>', output.read_text("notes.html"))
+
+  def test_critical_css_and_prefetch(self):
+    files = site_files()
+    files["template.html"] = (
+      '<head><title>{{ Title }}</title><link href="/index.css" rel="stylesheet"></head>'
+      "<body>{{ Content }}</body>"
+    )
+    files["static/index.css"] = "body {margin: 0} h1 {color: red} table {width: 100%}"
+    files["content/blog/second/index.md"] = "---\ndate: 2024-02-01\n---\n# Second\n\n[[First]]"
+    source = MemoryBackend(files)
+    output = MemoryBackend()
+    builder = Builder(source, output, "/site/", critical_css=True, prefetch_limit=3)
+    builder.build()
+    self.assertEqual(
+      output.read_text("blog/second/index.html"),
+      "<head><title>Second</title><style>body{margin: 0}h1{color: red}</style>"
+      '<link rel="prefetch" href="/site/blog/first"></head><body><div><h1>Second</h1>'
+      '<p><a href="/site/blog/first">First</a></p></div>'
+      '<link href="/site/index.css" rel="stylesheet"></body>',
+    )
+    # first and second share a tag set, so they share one analysis
+    self.assertEqual(len(builder.critical.pages), 2)
+    # the inlined rules come from the stylesheet, so changing it renders again
+    source.write_text("static/index.css", "h1 {color: blue}")
+    self.assertIn("blog/second/index.html", builder.build_changed(["static/index.css"]))
+    self.assertIn("<style>h1{color: blue}</style>", output.read_text("blog/second/index.html"))
+
+  def test_translated_pages_share_one_critical_css_analysis(self):
+    files = {
+      "template.html": '<head><link href="/index.css" rel="stylesheet"></head><body>{{ Content }}</body>',
+      "static/index.css": "h1 {color: red} p {margin: 0}",
+    }
+    for i in range(20):
+      files[f"content/en/page-{i}.md"] = f"# Page {i}\n\nText"
+    output = MemoryBackend()
+    builder = Builder(MemoryBackend(files), output, locales=["en", "de"], critical_css=True)
+    builder.build()
+    self.assertEqual((len(builder.critical.templates), len(builder.critical.pages)), (1, 1))
+    self.assertEqual(
+      output.read_text("de/page-3.html"),
+      "<head><style>h1{color: red}p{margin: 0}</style>"
+      '<link rel="alternate" hreflang="en" href="/en/page-3.html" />'
+      '<link rel="alternate" hreflang="de" href="/de/page-3.html" />'
+      '<link rel="alternate" hreflang="x-default" href="/en/page-3.html" /></head>'
+      '<body><div><h1>Page 3</h1><p>Text</p></div><link href="/index.css" rel="stylesheet"></body>',
+    )
+
+  def test_builders_keep_their_own_highlight_cache(self):
+    files = site_files()
+    files["content/code.md"] = "# Code\n\n```python\nx = 1\n```"
+    with tempfile.TemporaryDirectory() as root:
+      first = Builder(MemoryBackend(files), MemoryBackend(), cache_dir=os.path.join(root, "a"))
+      second = Builder(MemoryBackend(files), MemoryBackend(), cache_dir=os.path.join(root, "b"))
+      first.build()
+      second.build()
+      self.assertEqual((first.highlight_cache.hits, first.highlight_cache.misses), (0, 1))
+      self.assertEqual((second.highlight_cache.hits, second.highlight_cache.misses), (0, 1))
+      self.assertTrue(os.listdir(os.path.join(root, "a", "highlight")))
+      self.assertTrue(os.listdir(os.path.join(root, "b", "highlight")))
+
+  def test_failure_stops_build_without_keep_going(self):
+    files = site_files()
+    files["content/broken.md"] = "# Broken\n\n`unclosed"
+    builder = Builder(MemoryBackend(files), MemoryBackend())
+    with self.assertRaises(Exception) as context:
+      builder.build()
+    self.assertEqual(str(context.exception).split(": ")[0], "content/broken.md:3")
+
+if __name__ == "__main__":
+  unittest.main()
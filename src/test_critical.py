@@ -0,0 +1,80 @@
+import unittest
+from critical import CriticalCss, parse_css, used_css, node_tags, selector_tags
+from parentnode import ParentNode
+from mappedsource import MappedChildren
+from utilities import markdown_to_html_node
+
+CSS = """
+/* base */
+@charset "utf-8";
+body { margin: 0; }
+h1,
+h2 { color: red; }
+pre code { padding: 0; }
+a:hover, .nav a[href] { color: blue; }
+.note { color: gray; }
+@media (max-width: 600px) {
+  table { width: 100%; }
+  p { margin: 0; }
+}
+@font-face { font-family: "X"; }
+"""
+
+TEMPLATE = (
+  '<html><head><title>{{ Title }}</title>\n'
+  '  <link href="/index.css" rel="stylesheet" />\n'
+  '  <link href="/missing.css" rel="stylesheet" />\n'
+  '</head><body>{{ Content }}</body></html>'
+)
+
+class TestCritical(unittest.TestCase):
+  def test_selector_tags(self):
+    self.assertEqual(selector_tags("pre > code.x:hover"), {"pre", "code"})
+    self.assertEqual(selector_tags('.nav a[href="/"]::before'), {"a"})
+    self.assertEqual(selector_tags(".note"), frozenset())
+
+  def test_used_css_keeps_rules_the_tags_can_match(self):
+    from critical import COMMENT_PATTERN
+    rules = parse_css(COMMENT_PATTERN.sub("", CSS))
+    self.assertEqual(
+      used_css(rules, {"body", "h2", "a", "p"}),
+      '@charset "utf-8";body{margin: 0;}h1, h2{color: red;}'
+      'a:hover, .nav a[href]{color: blue;}.note{color: gray;}'
+      '@media (max-width: 600px){p{margin: 0;}}@font-face{font-family: "X";}',
+    )
+
+  def test_node_tags(self):
+    node = markdown_to_html_node("# T\n\n|a|\n|-|\n|b|\n\n```python\nx = 1\n```")
+    self.assertEqual(
+      node_tags(node),
+      {"div", "h1", "table", "thead", "tbody", "tr", "th", "td", "pre", "code", "span"},
+    )
+    self.assertIsNone(node_tags(ParentNode("div", MappedChildren(lambda: iter([])))))
+
+  def test_inline_is_cached_per_template_and_tags(self):
+    files = {"static/index.css": CSS}
+    reads = []
+    def read_text(path):
+      reads.append(path)
+      return files[path]
+    critical = CriticalCss(read_text, files.__contains__)
+    page = critical.inline(TEMPLATE, {"p"})
+    self.assertEqual(
+      page,
+      '<html><head><title>{{ Title }}</title>\n'
+      '  <link href="/missing.css" rel="stylesheet" />\n'
+      '<style>@charset "utf-8";body{margin: 0;}.note{color: gray;}'
+      '@media (max-width: 600px){p{margin: 0;}}'
+      '@font-face{font-family: "X";}</style></head><body>{{ Content }}'
+      '<link href="/index.css" rel="stylesheet" /></body></html>',
+    )
+    self.assertIs(critical.inline(TEMPLATE, {"p"}), page)
+    self.assertIsNot(critical.inline(TEMPLATE, {"p", "h1"}), page)
+    self.assertEqual(reads, ["static/index.css"])
+
+  def test_template_without_local_stylesheets_is_unchanged(self):
+    critical = CriticalCss(lambda path: "", lambda path: False)
+    self.assertEqual(critical.inline(TEMPLATE, {"p"}), TEMPLATE)
+
+if __name__ == "__main__":
+  unittest.main()
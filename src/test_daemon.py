@@ -0,0 +1,134 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from backends import MemoryBackend
+from builder import Builder
+from daemon import ReadWriteLock, RenderServer, RenderClient
+from loadtest import percentile, run_load
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+class TestDaemon(unittest.TestCase):
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.socket_path = os.path.join(self.tmp.name, "ssg.sock")
+    self.source = MemoryBackend({
+      "template.html": "<title>{{ Title }}</title>{{ Content }}",
+      "content/index.md": '# Home\n\n{{< include "footer.md" >}}',
+      "partials/footer.md": "Footer",
+    })
+    self.output = MemoryBackend()
+    self.builder = Builder(self.source, self.output)
+    self.server = RenderServer(self.socket_path, self.builder, workers=4)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.thread.join()
+    self.tmp.cleanup()
+
+  def test_ping_and_render(self):
+    with RenderClient(self.socket_path) as client:
+      self.assertEqual(client.request({"op": "ping"}), {"ok": True})
+      self.assertEqual(
+        client.request({"op": "render", "markdown": "Hi **there**"}),
+        {"ok": True, "html": "<div><p>Hi <b>there</b></p></div>"},
+      )
+      response = client.request({"op": "render", "markdown": "# Page", "full_page": True})
+      self.assertEqual(response["html"], "<title>Page</title><div><h1>Page</h1></div>")
+
+  def test_build_and_rebuild(self):
+    with RenderClient(self.socket_path) as client:
+      self.assertEqual(client.request({"op": "build"}), {"ok": True, "rendered": ["index.html"]})
+      self.source.write_text("partials/footer.md", "New footer")
+      self.assertEqual(
+        client.request({"op": "rebuild", "paths": ["partials/footer.md"]}),
+        {"ok": True, "rendered": ["index.html"]},
+      )
+      self.source.write_text("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+      self.assertEqual(
+        client.request({"op": "rebuild", "paths": ["template.html"]}),
+        {"ok": True, "rendered": ["index.html"]},
+      )
+    self.assertIn("New footer", self.output.read_text("index.html"))
+    self.assertTrue(self.output.read_text("index.html").startswith("<h1>Home</h1>"))
+
+  def test_errors_are_reported(self):
+    with RenderClient(self.socket_path) as client:
+      self.assertFalse(client.request({"op": "nope"})["ok"])
+      response = client.request({"op": "render", "markdown": "**unclosed"})
+      self.assertFalse(response["ok"])
+      self.assertIn("missing a closing delimiter", response["error"])
+      self.assertTrue(client.request({"op": "ping"})["ok"])
+
+  def test_idle_connections_hold_no_worker(self):
+    # more open connections than the server has workers
+    idle = [RenderClient(self.socket_path) for _ in range(6)]
+    try:
+      for client in idle:
+        client.sock.settimeout(5)
+        self.assertEqual(client.request({"op": "ping"}), {"ok": True})
+    finally:
+      for client in idle:
+        client.close()
+
+  def test_concurrent_clients(self):
+    report = run_load(self.socket_path, clients=4, requests_per_client=20)
+    self.assertEqual(report["requests"], 80)
+    self.assertEqual(report["errors"], 0)
+    self.assertLessEqual(report["p50_ms"], report["p99_ms"])
+
+  def test_renders_during_rebuilds(self):
+    with RenderClient(self.socket_path) as client:
+      client.request({"op": "build"})
+    report = run_load(
+      self.socket_path,
+      clients=4,
+      requests_per_client=20,
+      markdown='# Page\n\n{{< include "footer.md" >}}',
+      rebuild_paths=["partials/footer.md", "template.html"],
+    )
+    self.assertEqual((report["requests"], report["errors"]), (80, 0))
+    self.assertGreater(report["rebuilds"], 0)
+
+class TestReadWriteLock(unittest.TestCase):
+  def test_writer_waits_for_readers_and_holds_back_new_ones(self):
+    lock = ReadWriteLock()
+    events = []
+    reading = threading.Event()
+    release_reader = threading.Event()
+    def reader(name, hold=None):
+      with lock.read():
+        events.append(f"{name} reading")
+        reading.set()
+        if hold is not None:
+          hold.wait()
+    def writer():
+      with lock.write():
+        events.append("writing")
+    first = threading.Thread(target=reader, args=("first", release_reader))
+    first.start()
+    reading.wait()
+    writing = threading.Thread(target=writer)
+    writing.start()
+    while not lock.writers_waiting:
+      threading.Event().wait(0.001)
+    second = threading.Thread(target=reader, args=("second",))
+    second.start()
+    release_reader.set()
+    for thread in [first, writing, second]:
+      thread.join()
+    self.assertEqual(events, ["first reading", "writing", "second reading"])
+
+class TestPercentile(unittest.TestCase):
+  def test_percentile(self):
+    samples = list(range(1, 101))
+    self.assertEqual(percentile(samples, 50), 50)
+    self.assertEqual(percentile(samples, 99), 99)
+    self.assertEqual(percentile([5], 99), 5)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,118 @@
+import os
+import unittest
+import tempfile
+from datetime import datetime, timezone
+from backends import DirectoryBackend, MemoryBackend
+from builder import Builder
+from drafts import HeaderIndex, skip_reason
+from frontmatter import read_front_matter
+from test_builder import site_files
+from test_parallel import write_site
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+def draft_site_files():
+  files = site_files()
+  files["content/blog/draft/index.md"] = "---\ndraft: true\n---\n# Draft\n\n[[Second]]"
+  files["content/blog/later/index.md"] = "---\npublish_at: 2024-07-01\n---\n# Later"
+  files["content/about.md"] = "# About\n\n[[Draft]] and [[Later]]"
+  return files
+
+class TestDrafts(unittest.TestCase):
+  def test_read_front_matter_reads_only_the_header(self):
+    text = ("---\ntitle: T\ndraft: yes\n---\n" + "body\n" * 10000).encode("utf-8")
+    sizes = []
+    def read_head(size):
+      sizes.append(size)
+      return text[:size]
+    self.assertEqual(read_front_matter(read_head, 16), {"title": "T", "draft": "yes"})
+    self.assertEqual(sizes, [16, 64])
+    self.assertEqual(read_front_matter(lambda size: b"# No front matter"), {})
+    self.assertEqual(read_front_matter(lambda size: b"---\nunclosed: x\n"), {})
+
+  def test_skip_reason(self):
+    self.assertEqual(skip_reason({"draft": "True"}, NOW), "draft")
+    self.assertIsNone(skip_reason({"draft": "false"}, NOW))
+    self.assertEqual(skip_reason({"publish_at": "2024-06-01T00:00:01"}, NOW), "scheduled")
+    self.assertIsNone(skip_reason({"publish_at": "2024-06-01T02:00:00+02:00"}, NOW))
+    self.assertEqual(skip_reason({"publish_at": "next week"}, NOW), "invalid publish_at")
+
+  def test_header_index_reads_a_file_again_only_when_it_changes(self):
+    source = MemoryBackend({"a.md": "---\ndraft: true\ntitle: A\n---\n# A"})
+    headers = HeaderIndex()
+    self.assertEqual(headers.header(source, "a.md"), {"draft": "true"})
+    self.assertEqual(headers.header(source, "a.md"), {"draft": "true"})
+    self.assertEqual(headers.reads, 1)
+    source.store("a.md", b"# A")
+    self.assertEqual(headers.header(source, "a.md"), {})
+    self.assertEqual(headers.reads, 2)
+
+  def test_unpublished_pages_are_left_out(self):
+    output = MemoryBackend()
+    events = []
+    builder = Builder(MemoryBackend(draft_site_files()), output, now=NOW)
+    builder.events.add_handler(events.append)
+    rendered = builder.build()
+    self.assertNotIn("blog/draft/index.html", rendered)
+    self.assertNotIn("blog/later/index.html", rendered)
+    listing = output.read_text("blog/index.html")
+    self.assertNotIn("Draft", listing)
+    self.assertNotIn("Later", listing)
+    # wiki-links to them stay plain text and they add no backlinks
+    self.assertIn("<p>Draft and Later</p>", output.read_text("about.html"))
+    self.assertEqual(builder.links.backlinks("/blog/second"), [])
+    self.assertEqual(
+      [(event["source"], event["reason"]) for event in events if event["event"] == "file-skipped"],
+      [
+        ("content/blog/draft/index.md", "draft"),
+        ("content/blog/later/index.md", "scheduled"),
+        ("content/notes.txt", "not markdown"),
+      ],
+    )
+    # once its time has come a scheduled page is built
+    builder.now = datetime(2024, 7, 2, tzinfo=timezone.utc)
+    self.assertIn("blog/later/index.html", builder.build())
+
+  def test_parallel_build_gives_every_skip_a_reason(self):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, draft_site_files())
+      events = []
+      builder = Builder(DirectoryBackend(root), DirectoryBackend(os.path.join(root, "out")), now=NOW)
+      builder.events.add_handler(events.append)
+      builder.build(workers=2)
+    self.assertEqual(
+      sorted((event["source"], event["reason"]) for event in events if event["event"] == "file-skipped"),
+      [
+        ("content/blog/draft/index.md", "draft"),
+        ("content/blog/later/index.md", "scheduled"),
+        ("content/notes.txt", "not markdown"),
+      ],
+    )
+
+  def test_changed_page_becoming_a_draft_is_removed(self):
+    source = MemoryBackend(draft_site_files())
+    output = MemoryBackend()
+    builder = Builder(source, output, now=NOW)
+    builder.build()
+    source.store("content/blog/first/index.md", b"---\ndraft: true\n---\n# First")
+    builder.build_changed(["content/blog/first/index.md"])
+    self.assertNotIn("blog/first/index.html", output.files)
+    self.assertNotIn("First", output.read_text("blog/index.html"))
+
+  def test_repeat_build_does_not_open_unchanged_files(self):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, draft_site_files())
+      def build():
+        builder = Builder(
+          DirectoryBackend(root),
+          DirectoryBackend(os.path.join(root, "out")),
+          cache_dir=os.path.join(root, ".cache"),
+          now=NOW,
+        )
+        builder.build()
+        return builder.headers.reads
+      self.assertEqual(build(), 6)
+      self.assertEqual(build(), 0)
+
+if __name__ == "__main__":
+  unittest.main()
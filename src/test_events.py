@@ -0,0 +1,65 @@
+import io
+import json
+import unittest
+from backends import MemoryBackend
+from builder import Builder
+from events import EventStream, JsonLinesWriter, ProgressBar, format_bytes
+from test_builder import site_files
+
+class TestEvents(unittest.TestCase):
+  def test_build_events(self):
+    events = []
+    Builder(MemoryBackend(site_files()), MemoryBackend(), events=EventStream(events.append)).build()
+    kinds = [event["event"] for event in events]
+    self.assertEqual(kinds[0], "build-started")
+    self.assertEqual(kinds[-1], "build-done")
+    self.assertEqual(events[0]["pages"], 3)
+    self.assertEqual(events[0]["static_files"], 2)
+    self.assertEqual(kinds.count("static-copied"), 2)
+    self.assertEqual(kinds.count("file-skipped"), 1)
+    self.assertEqual(kinds.count("page-started"), kinds.count("page-done"))
+    done = [event for event in events if event["event"] == "page-done"]
+    self.assertEqual(len(done), 4)
+    self.assertTrue(all(event["bytes"] > 0 for event in done))
+    self.assertEqual(events[-1]["pages"], 4)
+
+  def test_page_done_bytes_are_encoded_size(self):
+    events = []
+    output = MemoryBackend()
+    source = MemoryBackend({"template.html": "{{ Content }}", "content/index.md": "# Café"})
+    Builder(source, output, events=EventStream(events.append)).build()
+    done = [event for event in events if event["event"] == "page-done"]
+    self.assertEqual(done[0]["bytes"], len(output.read_bytes("index.html")))
+
+  def test_error_event(self):
+    events = []
+    source = MemoryBackend({"template.html": "{{ Content }}", "content/index.md": "no title"})
+    builder = Builder(source, MemoryBackend(), events=EventStream(events.append))
+    self.assertRaises(Exception, builder.build)
+    self.assertEqual(events[-1]["event"], "error")
+    self.assertEqual(events[-1]["source"], "content/index.md")
+
+  def test_json_lines(self):
+    f = io.StringIO()
+    EventStream(JsonLinesWriter(f)).emit("page-done", source="a.md", dest="a.html", bytes=3)
+    event = json.loads(f.getvalue())
+    self.assertEqual(event["event"], "page-done")
+    self.assertEqual(event["bytes"], 3)
+
+  def test_progress_bar_summary(self):
+    f = io.StringIO()
+    events = EventStream(ProgressBar(f))
+    events.emit("build-started", pages=2, static_files=0)
+    events.emit("page-done", source="a.md", dest="a.html", bytes=2048)
+    events.emit("page-done", source="b.md", dest="b.html", bytes=2048)
+    events.emit("build-done", pages=2, seconds=1.0)
+    self.assertTrue(f.getvalue().startswith("[" + "#" * 30 + "] 2/2 files 4.0 KB"))
+    self.assertEqual(f.getvalue().count("\n"), 1)
+
+  def test_format_bytes(self):
+    self.assertEqual(format_bytes(12), "12 B")
+    self.assertEqual(format_bytes(1536), "1.5 KB")
+    self.assertEqual(format_bytes(3 * 1024 ** 3), "3.0 GB")
+
+if __name__ == "__main__":
+  unittest.main()
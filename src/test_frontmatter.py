@@ -0,0 +1,20 @@
+import unittest
+from frontmatter import parse_front_matter
+
+class TestFrontMatter(unittest.TestCase):
+  def test_no_front_matter(self):
+    md = "# Title\n\nBody"
+    self.assertEqual(parse_front_matter(md), ({}, md))
+
+  def test_front_matter(self):
+    md = '---\ntitle: "Hello: World"\nDate: 2024-05-01\n---\n# Title\n'
+    metadata, body = parse_front_matter(md)
+    self.assertEqual(metadata, {"title": "Hello: World", "date": "2024-05-01"})
+    self.assertEqual(body, "# Title\n")
+
+  def test_unclosed_front_matter(self):
+    md = "---\ntitle: Hello\n# Title"
+    self.assertEqual(parse_front_matter(md), ({}, md))
+
+if __name__ == "__main__":
+  unittest.main()
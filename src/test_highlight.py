@@ -0,0 +1,108 @@
+import os
+import unittest
+import tempfile
+import threading
+from unittest import mock
+from highlight import (
+  HIGHLIGHTER_VERSION,
+  HighlightCache,
+  normalize_language,
+  highlight_code,
+  highlight,
+  cache_key,
+)
+from utilities import markdown_to_html_node
+
+class TestHighlight(unittest.TestCase):
+  def test_normalize_language(self):
+    self.assertEqual(normalize_language("py"), "python")
+    self.assertEqual(normalize_language("Go {linenos}"), "go")
+    self.assertEqual(normalize_language(""), None)
+
+  def test_highlight_code_python(self):
+    html = highlight_code('def f():\n  return "<x>" # done', "python")
+    self.assertEqual(
+      html,
+      '<span class="tok-keyword">def</span> f():\n  '
+      '<span class="tok-keyword">return</span> '
+      '<span class="tok-string">"&lt;x&gt;"</span> '
+      '<span class="tok-comment"># done</span>',
+    )
+
+  def test_unclosed_block_comment_runs_to_the_end(self):
+    self.assertEqual(
+      highlight_code("x = 1 /* a /* b", "javascript"),
+      'x = <span class="tok-number">1</span> '
+      '<span class="tok-comment">/* a /* b</span>',
+    )
+
+  def test_highlight_unsupported_language(self):
+    self.assertIsNone(highlight("whatever", "cobol", HighlightCache()))
+
+  def test_cache_key_depends_on_language_and_code(self):
+    self.assertNotEqual(cache_key("python", "x = 1"), cache_key("go", "x = 1"))
+    self.assertNotEqual(cache_key("python", "x = 1"), cache_key("python", "x = 2"))
+
+  def test_disk_cache_reused_across_instances(self):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      first = HighlightCache(cache_dir)
+      html = highlight("x = 1", "python", first)
+      self.assertEqual(first.misses, 1)
+      second = HighlightCache(cache_dir)
+      self.assertEqual(highlight("x = 1", "python", second), html)
+      self.assertEqual(second.hits, 1)
+      self.assertEqual(second.misses, 0)
+      key = cache_key("python", "x = 1")
+      self.assertTrue(os.path.exists(second.path_for(key)))
+
+  def test_threads_write_one_entry_concurrently(self):
+    with tempfile.TemporaryDirectory() as cache_dir:
+      cache = HighlightCache(cache_dir)
+      start = threading.Barrier(8)
+      errors = []
+      def put():
+        start.wait()
+        for i in range(50):
+          try:
+            cache.put(f"key-{i}", "<span>x</span>")
+          except OSError as error:
+            errors.append(error)
+      threads = [threading.Thread(target=put) for _ in range(8)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      self.assertEqual(errors, [])
+      self.assertEqual(HighlightCache(cache_dir).get("key-49"), "<span>x</span>")
+
+  def test_cache_key_depends_on_highlighter_version(self):
+    key = cache_key("python", "x = 1")
+    with mock.patch("highlight.HIGHLIGHTER_VERSION", HIGHLIGHTER_VERSION + "-next"):
+      self.assertNotEqual(cache_key("python", "x = 1"), key)
+
+  def test_markdown_code_block_with_info_string(self):
+    md = """
+```python
+import os
+```
+"""
+    html = markdown_to_html_node(md).to_html()
+    self.assertEqual(
+      html,
+      '<div><pre><code class="language-python"><span class="tok-keyword">import</span> os\n</code></pre></div>',
+    )
+
+  def test_markdown_code_block_unknown_language(self):
+    md = """
+```elflang
+func main(){}
+```
+"""
+    html = markdown_to_html_node(md).to_html()
+    self.assertEqual(
+      html,
+      '<div><pre><code class="language-elflang">func main(){}\n</code></pre></div>',
+    )
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,118 @@
+import os
+import unittest
+import tempfile
+from includes import IncludeResolver, IncludeCycleError
+from utilities import MarkdownError, markdown_to_html_node
+
+class TestIncludes(unittest.TestCase):
+  def setUp(self):
+    self.tmp = tempfile.TemporaryDirectory()
+    self.partials_dir = self.tmp.name
+    self.includes = IncludeResolver(self.partials_dir)
+
+  def tearDown(self):
+    self.tmp.cleanup()
+
+  def write_partial(self, name, markdown):
+    with open(os.path.join(self.partials_dir, name), "w", encoding="utf-8") as f:
+      f.write(markdown)
+
+  def test_split_markdown(self):
+    segments = self.includes.split_markdown(
+      'Before\n\n{{< include "a.md" >}}\n\nAfter'
+    )
+    self.assertEqual(
+      segments,
+      [("Before\n\n", None, 0), ("", "a.md", 2), ("\n\nAfter", None, 2)],
+    )
+
+  def test_error_after_include_names_its_own_line(self):
+    self.write_partial("a.md", "Text")
+    md = 'Text\n\n{{< include "a.md" >}}\n\nText\n\n{{< include "a.md" >}}\n\nText _bad'
+    with self.assertRaises(MarkdownError) as context:
+      markdown_to_html_node(md, self.includes, "content/a.md")
+    self.assertEqual((context.exception.source_path, context.exception.line), ("content/a.md", 9))
+
+  def test_include_outside_partials_is_rejected(self):
+    os.mkdir(os.path.join(self.partials_dir, "partials"))
+    with open(os.path.join(self.partials_dir, "secret.txt"), "w", encoding="utf-8") as f:
+      f.write("SECRET")
+    self.includes = IncludeResolver(os.path.join(self.partials_dir, "partials"))
+    self.partials_dir = self.includes.partials_dir
+    for name in ["../secret.txt", "/../secret.txt", "a/../../secret.txt", ".."]:
+      with self.subTest(name):
+        md = f'Text\n\n{{{{< include "{name}" >}}}}'
+        with self.assertRaises(MarkdownError) as context:
+          markdown_to_html_node(md, self.includes, "content/a.md")
+        self.assertEqual((context.exception.source_path, context.exception.line), ("content/a.md", 3))
+    self.write_partial("note.md", "Note")
+    html = markdown_to_html_node('{{< include "sub/../note.md" >}}', self.includes).to_html()
+    self.assertEqual(html, "<div><p>Note</p></div>")
+
+  def test_include_expanded_in_place(self):
+    self.write_partial("note.md", "A **shared** note")
+    md = 'Intro\n\n{{< include "note.md" >}}\n\nOutro'
+    html = markdown_to_html_node(md, self.includes, "content/a.md").to_html()
+    self.assertEqual(
+      html,
+      "<div><p>Intro</p><p>A <b>shared</b> note</p><p>Outro</p></div>",
+    )
+
+  def test_partial_parsed_once_and_reused(self):
+    self.write_partial("note.md", "Shared")
+    md = '{{< include "note.md" >}}'
+    first = markdown_to_html_node(md, self.includes, "content/a.md")
+    os.remove(os.path.join(self.partials_dir, "note.md"))
+    second = markdown_to_html_node(md, self.includes, "content/b.md")
+    self.assertIs(first.children[0], second.children[0])
+    self.assertEqual(first.to_html(), second.to_html())
+    self.assertEqual(second.to_html(), "<div><p>Shared</p></div>")
+
+  def test_nested_include(self):
+    self.write_partial("outer.md", 'Outer\n\n{{< include "inner.md" >}}')
+    self.write_partial("inner.md", "Inner")
+    md = '{{< include "outer.md" >}}'
+    html = markdown_to_html_node(md, self.includes, "content/a.md").to_html()
+    self.assertEqual(html, "<div><p>Outer</p><p>Inner</p></div>")
+
+  def test_cycle_detected(self):
+    self.write_partial("a.md", '{{< include "b.md" >}}')
+    self.write_partial("b.md", '{{< include "a.md" >}}')
+    with self.assertRaises(IncludeCycleError) as context:
+      markdown_to_html_node('{{< include "a.md" >}}', self.includes, "content/x.md")
+    self.assertIn("a.md -> ", str(context.exception))
+    self.assertTrue(str(context.exception).endswith("a.md"))
+
+  def test_pages_affected_by_partial(self):
+    self.write_partial("outer.md", '{{< include "inner.md" >}}')
+    self.write_partial("inner.md", "Inner")
+    self.write_partial("other.md", "Other")
+    markdown_to_html_node('{{< include "outer.md" >}}', self.includes, "content/a.md")
+    markdown_to_html_node('{{< include "other.md" >}}', self.includes, "content/b.md")
+    markdown_to_html_node("No includes", self.includes, "content/c.md")
+    inner = os.path.join(self.partials_dir, "inner.md")
+    other = os.path.join(self.partials_dir, "other.md")
+    self.assertEqual(self.includes.pages_affected_by([inner]), {"content/a.md"})
+    self.assertEqual(self.includes.pages_affected_by([other]), {"content/b.md"})
+
+  def test_invalidate_drops_changed_and_enclosing_partials(self):
+    self.write_partial("outer.md", '{{< include "inner.md" >}}')
+    self.write_partial("inner.md", "Inner")
+    markdown_to_html_node('{{< include "outer.md" >}}', self.includes, "content/a.md")
+    self.write_partial("inner.md", "Changed")
+    self.includes.invalidate([os.path.join(self.partials_dir, "inner.md")])
+    html = markdown_to_html_node('{{< include "outer.md" >}}', self.includes, "content/a.md").to_html()
+    self.assertEqual(html, "<div><p>Changed</p></div>")
+
+  def test_graph_round_trip(self):
+    self.write_partial("note.md", "Shared")
+    markdown_to_html_node('{{< include "note.md" >}}', self.includes, "content/a.md")
+    graph_path = os.path.join(self.tmp.name, "graph", "includes.json")
+    self.includes.save(graph_path)
+    loaded = IncludeResolver(self.partials_dir)
+    loaded.load(graph_path)
+    note = os.path.join(self.partials_dir, "note.md")
+    self.assertEqual(loaded.pages_affected_by([note]), {"content/a.md"})
+
+if __name__ == "__main__":
+  unittest.main()
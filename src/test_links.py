@@ -0,0 +1,98 @@
+import os
+import unittest
+import tempfile
+from links import LinkGraph, link_target, page_links, with_prefetch_links
+
+class TestLinks(unittest.TestCase):
+  def test_link_target(self):
+    self.assertEqual(link_target("/blog/first/"), "/blog/first")
+    self.assertEqual(link_target("/blog/first#top"), "/blog/first")
+    self.assertEqual(link_target("/blog/index.html"), "/blog")
+    self.assertEqual(link_target("/"), "/")
+    self.assertIsNone(link_target("https://example.com/"))
+    self.assertIsNone(link_target("//example.com/"))
+    self.assertIsNone(link_target("notes.html"))
+
+  def test_page_links(self):
+    links, wiki = page_links(
+      "[Blog](/blog/) and [[Second  Post]], [[first|the first]]\n\n![img](/a.png)"
+    )
+    self.assertEqual(links, {"/blog"})
+    self.assertEqual(wiki, {"second post", "first"})
+
+  def graph(self):
+    graph = LinkGraph()
+    graph.add_page("content/index.md", "Home", {"/blog/first"}, {"second"})
+    graph.add_page("content/blog/first/index.md", "First", set(), {"second"})
+    graph.add_page("content/blog/second/index.md", "Second", set(), set())
+    return graph
+
+  def test_resolve_and_backlinks(self):
+    graph = self.graph()
+    self.assertEqual(graph.resolve("  SECOND "), "/blog/second")
+    self.assertIsNone(graph.resolve("Missing"))
+    self.assertEqual(
+      graph.backlinks("/blog/second"),
+      [("First", "/blog/first"), ("Home", "/")],
+    )
+    self.assertEqual(graph.backlinks("/blog/first"), [("Home", "/")])
+    self.assertEqual(graph.backlinks("/"), [])
+    self.assertEqual(
+      graph.backlinks_html("/blog/first"),
+      '<ul class="backlinks"><li><a href="/">Home</a></li></ul>',
+    )
+    self.assertEqual(graph.backlinks_html("/"), "")
+
+  def test_prefetch_urls_rank_by_links_in(self):
+    graph = self.graph()
+    graph.add_page("content/notes.md", "Notes", {"/", "/blog/first", "/missing"}, {"second"})
+    # second has three pages linking in, first two and home none
+    self.assertEqual(graph.prefetch_urls("/notes.html", 2), ["/blog/second", "/blog/first"])
+    self.assertEqual(graph.prefetch_urls("/notes.html", 5), ["/blog/second", "/blog/first", "/"])
+    self.assertEqual(graph.prefetch_urls("/nowhere", 5), [])
+    self.assertEqual(
+      with_prefetch_links("<head></head>", ["/a"]),
+      '<head><link rel="prefetch" href="/a"></head>',
+    )
+
+  def test_update_returns_only_changed_pages(self):
+    graph = self.graph()
+    # same links, new body: nothing else changes
+    self.assertEqual(
+      graph.update_page("content/index.md", "Home", {"/blog/first"}, {"second"}),
+      set(),
+    )
+    # dropping the link to first only touches first
+    self.assertEqual(
+      graph.update_page("content/index.md", "Home", set(), {"second"}),
+      {"content/blog/first/index.md"},
+    )
+    # a new title relabels every backlink this page appears in
+    self.assertEqual(
+      graph.update_page("content/index.md", "Start", set(), {"second"}),
+      {"content/blog/second/index.md"},
+    )
+
+  def test_new_title_resolves_waiting_wiki_links(self):
+    graph = self.graph()
+    graph.add_page("content/notes.md", "Notes", set(), {"third"})
+    self.assertEqual(
+      graph.update_page("content/blog/third/index.md", "Third", set(), set()),
+      {"content/notes.md"},
+    )
+    self.assertEqual(graph.backlinks("/blog/third"), [("Notes", "/notes.html")])
+    self.assertEqual(graph.remove_page("content/blog/third/index.md"), {"content/notes.md"})
+    self.assertIsNone(graph.resolve("Third"))
+
+  def test_save_and_load(self):
+    graph = self.graph()
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "cache", "links.json")
+      graph.save(path)
+      loaded = LinkGraph()
+      loaded.load(path)
+    self.assertEqual(loaded.backlinks("/blog/second"), graph.backlinks("/blog/second"))
+    self.assertEqual(loaded.resolve("First"), "/blog/first")
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,119 @@
+import os
+import unittest
+import tempfile
+from listing import page_url, SectionIndex, ListingIndex
+from backends import MemoryBackend
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+class TestListing(unittest.TestCase):
+  def test_page_url(self):
+    self.assertEqual(page_url("index.md"), "/")
+    self.assertEqual(page_url(os.path.join("blog", "tom", "index.md")), "/blog/tom")
+    self.assertEqual(page_url(os.path.join("blog", "notes.md")), "/blog/notes.html")
+
+  def test_sorted_by_date_then_title(self):
+    section = SectionIndex("blog")
+    section.add("/blog/b", "B", "2024-01-01")
+    section.add("/blog/undated", "Undated")
+    section.add("/blog/c", "C", "2024-03-01")
+    section.add("/blog/a", "A", "2024-01-01")
+    self.assertEqual(
+      [entry["url"] for entry in section.entries],
+      ["/blog/c", "/blog/a", "/blog/b", "/blog/undated"],
+    )
+
+  def test_re_adding_moves_entry(self):
+    section = SectionIndex("blog")
+    section.add("/blog/a", "A", "2024-01-01")
+    section.add("/blog/b", "B", "2024-02-01")
+    section.add("/blog/a", "A", "2024-03-01")
+    self.assertEqual([entry["url"] for entry in section.entries], ["/blog/a", "/blog/b"])
+
+  def test_dirty_pages_only_from_insertion_point(self):
+    section = SectionIndex("blog", per_page=2)
+    for day in range(1, 7):
+      section.add(f"/blog/{day}", f"Post {day}", f"2024-01-0{day}")
+    self.assertEqual(section.dirty_pages(), [1, 2, 3])
+    section.mark_rendered()
+    self.assertEqual(section.dirty_pages(), [])
+    section.add("/blog/old", "Old", "2023-12-31")
+    self.assertEqual(section.dirty_pages(), [3, 4])
+    section.mark_rendered()
+    section.add("/blog/mid", "Mid", "2024-01-03")
+    self.assertEqual(section.dirty_pages(), [2, 3, 4])
+    section.mark_rendered()
+    section.add("/blog/new", "New", "2024-02-01")
+    self.assertEqual(section.dirty_pages(), [1, 2, 3, 4, 5])
+
+  def test_unchanged_entry_dirties_nothing(self):
+    section = SectionIndex("blog", per_page=2)
+    for day in range(1, 7):
+      section.add(f"/blog/{day}", f"Post {day}", f"2024-01-0{day}")
+    section.mark_rendered()
+    section.add("/blog/6", "Post 6", "2024-01-06")
+    self.assertEqual(section.dirty_pages(), [])
+
+  def test_stale_pages_after_removal(self):
+    section = SectionIndex("blog", per_page=1)
+    section.add("/blog/a", "A", "2024-01-01")
+    section.add("/blog/b", "B", "2024-01-02")
+    section.mark_rendered()
+    section.remove("/blog/a")
+    self.assertEqual(section.dirty_pages(), [1])
+    self.assertEqual(section.stale_pages(), [2])
+
+  def test_page_to_html_node(self):
+    section = SectionIndex("blog", per_page=1)
+    section.add("/blog/a", "A", "2024-01-01")
+    section.add("/blog/b", "B")
+    self.assertEqual(
+      section.page_to_html_node(1).to_html(),
+      '<div><h1>Blog</h1><ul><li><a href="/blog/a">A</a> <time datetime="2024-01-01">2024-01-01</time></li></ul>'
+      '<nav><a href="/blog/page/2/" rel="next">Older</a></nav></div>',
+    )
+
+  def test_render_only_dirty_pages(self):
+    output = MemoryBackend()
+    listings = ListingIndex("content", per_page=2)
+    listings.add_page(os.path.join("content", "contact", "index.md"), {"title": "Contact"})
+    for day in range(1, 5):
+      listings.add_page(
+        os.path.join("content", "blog", str(day), "index.md"),
+        {"title": f"Post {day}", "date": f"2024-01-0{day}"},
+      )
+    rendered = listings.render(TEMPLATE, [(output, "/")])
+    self.assertEqual(rendered, ["blog/index.html", "blog/page/2/index.html"])
+    self.assertEqual(sorted(output.files), rendered)
+    self.assertTrue(output.read_text("blog/index.html").startswith("<title>Blog</title>"))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+      index_path = os.path.join(cache_dir, "listings.json")
+      listings.save(index_path)
+      reloaded = ListingIndex("content", per_page=2)
+      reloaded.load(index_path)
+    self.assertEqual(reloaded.render(TEMPLATE, [(output, "/")]), [])
+    reloaded.add_page(
+      os.path.join("content", "blog", "0", "index.md"),
+      {"title": "Post 0", "date": "2023-12-31"},
+    )
+    self.assertEqual(
+      reloaded.render(TEMPLATE, [(output, "/")]),
+      ["blog/page/2/index.html", "blog/page/3/index.html"],
+    )
+
+  def test_render_removes_stale_pages(self):
+    output = MemoryBackend()
+    listings = ListingIndex("content", per_page=1)
+    for day in range(1, 3):
+      listings.add_page(
+        os.path.join("content", "blog", str(day), "index.md"),
+        {"title": f"Post {day}", "date": f"2024-01-0{day}"},
+      )
+    listings.render(TEMPLATE, [(output, "/")])
+    listings.remove_page(os.path.join("content", "blog", "1", "index.md"))
+    self.assertEqual(listings.render(TEMPLATE, [(output, "/")]), ["blog/index.html"])
+    self.assertEqual(sorted(output.files), ["blog/index.html"])
+
+if __name__ == "__main__":
+  unittest.main()
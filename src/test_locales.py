@@ -0,0 +1,47 @@
+import unittest
+from locales import LocaleIndex, with_alternate_links
+
+class TestLocales(unittest.TestCase):
+  def setUp(self):
+    self.index = LocaleIndex(["en", "de"])
+    for path in [
+      "content/en/index.md",
+      "content/en/about.md",
+      "content/de/index.md",
+      "content/de/impressum.md",
+      "content/index.md",
+    ]:
+      self.index.add(path)
+
+  def test_unlocalized_paths_are_ignored(self):
+    self.assertEqual(self.index.split_path("content/index.md"), (None, None))
+    self.assertEqual(sorted(self.index.pages), ["about.md", "impressum.md", "index.md"])
+
+  def test_fallback_to_default_locale(self):
+    self.assertEqual(self.index.source_for("de", "about.md"), "content/en/about.md")
+    self.assertEqual(self.index.source_for("de", "index.md"), "content/de/index.md")
+    self.assertEqual(self.index.page_locales("about.md"), ["en", "de"])
+    self.assertEqual(self.index.page_locales("impressum.md"), ["de"])
+
+  def test_alternate_links(self):
+    self.assertEqual(
+      self.index.url_map("about.md"),
+      {"en": "/en/about.html", "de": "/de/about.html"},
+    )
+    links = self.index.alternate_links("index.md")
+    self.assertIn('<link rel="alternate" hreflang="de" href="/de" />', links)
+    self.assertIn('<link rel="alternate" hreflang="x-default" href="/en" />', links)
+    self.assertEqual(self.index.alternate_links("impressum.md"), "")
+    self.assertEqual(
+      with_alternate_links("<head></head>", links).count("hreflang"),
+      3,
+    )
+
+  def test_remove(self):
+    self.index.remove("content/de/impressum.md")
+    self.assertNotIn("impressum.md", self.index.pages)
+    self.index.remove("content/de/index.md")
+    self.assertEqual(self.index.sources("index.md"), {"en": "content/en/index.md"})
+
+if __name__ == "__main__":
+  unittest.main()
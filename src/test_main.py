@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+import tempfile
+import subprocess
+from main import parse_args
+from test_builder import site_files
+from test_parallel import write_site
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+class TestMain(unittest.TestCase):
+  def test_build_is_the_default_command(self):
+    args = parse_args(["/blog/", "--output", "site.zip"])
+    self.assertEqual((args.command, args.basepath, args.output), ("build", "/blog/", "site.zip"))
+    self.assertIsNone(parse_args([]).changed)
+
+  def test_changed_stops_at_the_next_flag(self):
+    args = parse_args(["--changed", "a.md", "b.md", "--keep-going", "--output", "out"])
+    self.assertEqual(args.changed, ["a.md", "b.md"])
+    self.assertTrue(args.keep_going)
+    self.assertEqual(args.output, "out")
+
+  def test_values(self):
+    args = parse_args([
+      "--target", "/mirror/=mirror.zip",
+      "--target", "/b/=b",
+      "--locales", "en,de",
+      "--shard", "2/3",
+      "--jobs", "4",
+      "--prefetch", "2",
+    ])
+    self.assertEqual(args.extra_targets, [("/mirror/", "mirror.zip"), ("/b/", "b")])
+    self.assertEqual(args.locales, ["en", "de"])
+    self.assertEqual(args.shard, (2, 3))
+    self.assertEqual((args.workers, args.prefetch_limit), (4, 2))
+
+  def test_merge(self):
+    args = parse_args(["merge", "shard-1", "shard-2", "--output", "site", "--quiet"])
+    self.assertEqual((args.command, args.shards, args.output), ("merge", ["shard-1", "shard-2"], "site"))
+    self.assertTrue(args.quiet)
+
+  def test_preview_resolves_wiki_links(self):
+    files = site_files()
+    files["content/blog/draft/index.md"] = "---\ndraft: true\n---\n# Draft"
+    files["content/about.md"] = "# About\n\n[[Second]] and [[Draft]]"
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, files)
+      result = subprocess.run(
+        [sys.executable, MAIN, "/site/", "--preview", os.path.join("content", "about.md")],
+        cwd=root,
+        check=True,
+        capture_output=True,
+        text=True,
+      )
+    self.assertIn('<p><a href="/site/blog/second">Second</a> and Draft</p>', result.stdout)
+
+if __name__ == "__main__":
+  unittest.main()
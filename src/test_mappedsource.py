@@ -0,0 +1,112 @@
+import os
+import unittest
+import tempfile
+from backends import DirectoryBackend, MemoryBackend
+from builder import Builder
+from mappedsource import MappedMarkdown
+from utilities import markdown_to_blocks, markdown_to_html_node, extract_title, MarkdownError
+from test_builder import site_files
+
+SAMPLES = [
+  "# Title\n\nA paragraph\nover two lines\n\n- one\n- two\n\n   \n\n```\ncode\nmore\n```",
+  "\n\n\n# Leading blanks\n\ntext",
+  "- item\n\n  continued after a blank\n\n    still continued\n\nnew paragraph",
+  "1. first\n\n\tindented with a tab\n\n2. second",
+  "paragraph\n\n  indented but not a list",
+  "# Windows\r\n\r\nline one\r\nline two\r\n\r\n> quote\r\n",
+  "# Ünïcode\n\nCafé — naïve\n\n| a | b |\n| - | - |\n| ä | ö |",
+  "no trailing newline",
+  "",
+]
+
+class TestMappedSource(unittest.TestCase):
+  def test_blocks_match_text_splitter(self):
+    for markdown in SAMPLES:
+      document = MappedMarkdown(markdown.encode("utf-8"))
+      self.assertEqual(list(document.iter_blocks()), markdown_to_blocks(markdown), repr(markdown))
+
+  def test_front_matter_and_title(self):
+    document = MappedMarkdown(b"---\ntitle: Given\ndate: 2024-01-01\n---\n# Heading\n\nBody")
+    self.assertEqual(document.metadata, {"title": "Given", "date": "2024-01-01"})
+    self.assertEqual(document.title(), "Given")
+    self.assertEqual(list(document.iter_blocks()), ["# Heading", "Body"])
+    document = MappedMarkdown(b"## Sub\n\n# Main\n\ntext")
+    self.assertEqual(document.title(), extract_title("## Sub\n\n# Main\n\ntext"))
+
+  def test_node_tree_renders_like_text_path(self):
+    for markdown in SAMPLES[:-1]:
+      html_node = MappedMarkdown(markdown.encode("utf-8")).to_html_node()
+      expected = markdown_to_html_node(markdown).to_html()
+      self.assertEqual(html_node.to_html(), expected)
+      self.assertEqual("".join(html_node.iter_html()), expected)
+
+  def test_mapped_file_releases_pages(self):
+    with tempfile.TemporaryDirectory() as root:
+      path = os.path.join(root, "big.md")
+      paragraphs = [f"Paragraph {i} " + "x" * 200 for i in range(2000)]
+      with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+      document = MappedMarkdown.open(path)
+      document.release_interval = 4096
+      try:
+        self.assertEqual(list(document.iter_blocks()), paragraphs)
+      finally:
+        document.close()
+
+  def test_builder_uses_mapping_for_large_sources(self):
+    with tempfile.TemporaryDirectory() as root:
+      source_root = os.path.join(root, "site")
+      source = DirectoryBackend(source_root)
+      for path, data in site_files().items():
+        source.write_bytes(path, data.encode("utf-8") if isinstance(data, str) else data)
+      mapped_output = MemoryBackend()
+      Builder(source, mapped_output, "/site/", mmap_threshold=0).build()
+      read_output = MemoryBackend()
+      Builder(source, read_output, "/site/", mmap_threshold=None).build()
+      self.assertEqual(mapped_output.files, read_output.files)
+
+  def test_builder_closes_each_mapping_once_the_page_is_written(self):
+    import builder as builder_module
+    documents = []
+    class RecordingMarkdown(MappedMarkdown):
+      def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        documents.append(self)
+    files = site_files()
+    files["content/de/index.md"] = "# Start"
+    with tempfile.TemporaryDirectory() as root:
+      source = DirectoryBackend(os.path.join(root, "site"))
+      for path, data in files.items():
+        source.write_bytes(path, data.encode("utf-8") if isinstance(data, str) else data)
+      builder_module.MappedMarkdown = RecordingMarkdown
+      try:
+        for locales in [None, ["en", "de"]]:
+          output = MemoryBackend()
+          Builder(source, output, mmap_threshold=0, locales=locales).build()
+          self.assertIn("<h1>First</h1>", output.read_text("blog/first/index.html"))
+      finally:
+        builder_module.MappedMarkdown = MappedMarkdown
+    # pages and the index pass each map their sources; none is left open
+    self.assertTrue(documents)
+    self.assertTrue(all(document.buffer.closed for document in documents))
+
+  def test_errors_carry_the_file_line(self):
+    document = MappedMarkdown(b"---\ntitle: T\n---\n# T\n\nok\n\n\nbad _italic\n")
+    with self.assertRaises(MarkdownError) as context:
+      document.to_html_node(source_path="big.md").to_html()
+    self.assertEqual(context.exception.source_path, "big.md")
+    self.assertEqual(context.exception.line, 9)
+
+  def test_repeated_blocks_and_table_rows_carry_their_own_lines(self):
+    markdown = "---\ntitle: T\n---\nsame\n\n- a\n\n  b\n\nsame\n\n| x |\n| - |\n| y |\n| **z |\n"
+    document = MappedMarkdown(markdown.encode("utf-8"))
+    self.assertEqual(
+      [line for line, _ in document.iter_located_blocks()],
+      [4, 6, 10, 12],
+    )
+    with self.assertRaises(MarkdownError) as context:
+      document.to_html_node(source_path="big.md").to_html()
+    self.assertEqual((context.exception.source_path, context.exception.line), ("big.md", 15))
+
+if __name__ == "__main__":
+  unittest.main()
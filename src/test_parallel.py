@@ -0,0 +1,86 @@
+import os
+import json
+import unittest
+import tempfile
+from backends import DirectoryBackend, MemoryBackend
+from builder import Builder
+from parallel import SharedCorpus, CorpusBackend
+from test_builder import site_files
+from utilities import MarkdownError
+
+def write_site(root, files):
+  for path, data in files.items():
+    full_path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(full_path, mode) as f:
+      f.write(data)
+
+class TestParallel(unittest.TestCase):
+  def test_corpus_backend_reads_from_shared_memory(self):
+    source = MemoryBackend({"content/a.md": "# A", "content/b/c.md": "é", "x.md": ""})
+    corpus = SharedCorpus.create(source, ["content/a.md", "content/b/c.md", "x.md"])
+    try:
+      backend = CorpusBackend(corpus)
+      self.assertEqual(backend.list_files("content"), ["content/a.md", "content/b/c.md"])
+      self.assertEqual(backend.read_text("content/b/c.md"), "é")
+      self.assertEqual(backend.read_bytes("x.md"), b"")
+      self.assertTrue(backend.exists("content/a.md"))
+      self.assertFalse(backend.exists("content/missing.md"))
+    finally:
+      corpus.close()
+      corpus.unlink()
+
+  def build_both(self, files, **options):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, files)
+      results = []
+      for name, workers in [("serial", None), ("parallel", 2)]:
+        builder = Builder(
+          DirectoryBackend(root),
+          DirectoryBackend(os.path.join(root, name)),
+          "/site/",
+          cache_dir=os.path.join(root, f".cache-{name}"),
+          **options,
+        )
+        rendered = builder.build(workers)
+        output = DirectoryBackend(os.path.join(root, name))
+        pages = {path: output.read_bytes(path) for path in output.list_files()}
+        with open(os.path.join(root, f".cache-{name}", "includes.json")) as f:
+          includes = json.load(f)
+        results.append((rendered, pages, includes, builder.failures))
+      return results
+
+  def test_parallel_build_matches_serial(self):
+    files = site_files()
+    files["partials/footer.md"] = '{{< include "nested.md" >}}'
+    files["partials/nested.md"] = "Nested [[First]]"
+    serial, parallel = self.build_both(files)
+    self.assertEqual(serial, parallel)
+    self.assertIn(b'<a href="/site/blog/first">First</a>', parallel[1]["index.html"])
+
+  def test_parallel_build_keeps_going(self):
+    files = site_files()
+    files["content/broken.md"] = "# Broken\n\n`unclosed"
+    serial, parallel = self.build_both(files, keep_going=True)
+    self.assertEqual(serial, parallel)
+    self.assertEqual(parallel[3]["content/broken.md"]["location"], "content/broken.md:3")
+
+  def test_parallel_failure_stops_build(self):
+    files = site_files()
+    files["content/broken.md"] = "# Broken\n\n`unclosed"
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, files)
+      builder = Builder(DirectoryBackend(root), DirectoryBackend(os.path.join(root, "out")))
+      with self.assertRaises(MarkdownError) as context:
+        builder.build(workers=2)
+    self.assertEqual(str(context.exception).split(": ")[0], "content/broken.md:3")
+
+  def test_other_outputs_build_in_one_process(self):
+    output = MemoryBackend()
+    rendered = Builder(MemoryBackend(site_files()), output).build(workers=2)
+    self.assertIn("index.html", rendered)
+    self.assertIn("index.html", output.files)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import unittest
+import tempfile
+import subprocess
+from backends import DirectoryBackend
+from shard import ShardError, parse_shard, shard_of, shard_manifest_path
+from test_builder import site_files
+from test_parallel import write_site
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+def sharded_site_files():
+  files = site_files()
+  for i in range(12):
+    files[f"content/blog/post-{i}.md"] = f"---\ndate: 2023-01-{i + 1:02}\n---\n# Post {i}\n\n[[First]]"
+  files["content/about.md"] = "# About\n\nSee [[Post 3]]."
+  return files
+
+class TestShard(unittest.TestCase):
+  def test_parse_shard(self):
+    self.assertEqual(parse_shard("2/4"), (2, 4))
+    for value in ["0/4", "5/4", "2", "a/b"]:
+      with self.assertRaises(ShardError):
+        parse_shard(value)
+
+  def test_shard_of_is_stable_and_covers_every_shard(self):
+    paths = [f"content/page-{i}.md" for i in range(64)]
+    shards = [shard_of(path, 4) for path in paths]
+    self.assertEqual(shards, [shard_of(path, 4) for path in paths])
+    self.assertEqual(set(shards), {1, 2, 3, 4})
+    self.assertEqual(shard_of("content/index.md", 1), 1)
+    self.assertEqual(shard_manifest_path("cas:out/shard-1/"), "out/shard-1.shard.json")
+
+  def run_main(self, root, *args):
+    subprocess.run(
+      [sys.executable, MAIN, *args, "--quiet"],
+      cwd=root,
+      check=True,
+      capture_output=True,
+    )
+
+  def read_output(self, root, name):
+    output = DirectoryBackend(os.path.join(root, name))
+    return {path: output.read_bytes(path) for path in output.list_files()}
+
+  def test_merged_shards_match_a_single_build(self):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, sharded_site_files())
+      self.run_main(root, "/site/", "--output", "single")
+      processes = [
+        subprocess.Popen(
+          [sys.executable, MAIN, "/site/", "--quiet", "--shard", f"{i}/3", "--output", f"shard-{i}"],
+          cwd=root,
+        )
+        for i in range(1, 4)
+      ]
+      self.assertEqual([process.wait() for process in processes], [0, 0, 0])
+      shard_pages = []
+      for i in range(1, 4):
+        with open(os.path.join(root, f"shard-{i}.shard.json")) as f:
+          manifest = json.load(f)
+        self.assertEqual((manifest["shard"], manifest["count"]), (i, 3))
+        shard_pages.append(set(self.read_output(root, f"shard-{i}")))
+      # every file is rendered by exactly one shard and no shard has listings
+      self.assertEqual(sum(len(pages) for pages in shard_pages), len(set().union(*shard_pages)))
+      self.assertNotIn("blog/index.html", set().union(*shard_pages))
+      self.run_main(root, "merge", "shard-1", "shard-2", "shard-3", "--output", "merged")
+      single = self.read_output(root, "single")
+      self.assertEqual(self.read_output(root, "merged"), single)
+      self.assertIn("blog/page/2/index.html", single)
+      self.assertIn(b'<a href="/site/blog/post-3.html">Post 3</a>', single["about.html"])
+
+  def test_merge_rejects_missing_and_tampered_shards(self):
+    with tempfile.TemporaryDirectory() as root:
+      write_site(root, sharded_site_files())
+      for i in range(1, 3):
+        self.run_main(root, "/site/", "--shard", f"{i}/2", "--output", f"shard-{i}")
+      with self.assertRaises(subprocess.CalledProcessError) as context:
+        self.run_main(root, "merge", "shard-1", "--output", "merged")
+      self.assertIn(b"expected shards 1 to 2, got [1]", context.exception.stderr)
+      with open(os.path.join(root, "shard-2", "index.css"), "a") as f:
+        f.write("tampered")
+      self.assertIn("index.css", self.read_output(root, "shard-2"))
+      with self.assertRaises(subprocess.CalledProcessError) as context:
+        self.run_main(root, "merge", "shard-1", "shard-2", "--output", "merged")
+      self.assertIn(b"index.css does not match its shard manifest", context.exception.stderr)
+
+if __name__ == "__main__":
+  unittest.main()
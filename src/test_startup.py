@@ -0,0 +1,29 @@
+import os
+import unittest
+from bench_startup import (
+  main_import_times,
+  preview_import_times,
+  project_import_time,
+)
+
+# generous enough for a loaded CI box; a regression that eagerly imports the
+# builder or archive modules again blows well past it
+MAIN_IMPORT_BUDGET_US = 20_000
+PREVIEW_IMPORT_BUDGET_US = 150_000
+
+class TestStartup(unittest.TestCase):
+  def test_main_import_is_lazy(self):
+    times, top_level = main_import_times()
+    for module in ["utilities", "builder", "backends", "listing"]:
+      self.assertNotIn(module, times)
+    self.assertLess(project_import_time(times, top_level), MAIN_IMPORT_BUDGET_US)
+
+  def test_preview_imports_only_the_parser(self):
+    times, top_level = preview_import_times(os.path.join("content", "index.md"))
+    self.assertIn("utilities", times)
+    for module in ["builder", "backends", "listing", "tarfile", "zipfile", "json"]:
+      self.assertNotIn(module, times)
+    self.assertLess(project_import_time(times, top_level), PREVIEW_IMPORT_BUDGET_US)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,167 @@
+import time
+import random
+import unittest
+from backends import MemoryBackend
+from builder import Builder
+from highlight import highlight_code
+from utilities import (
+  markdown_to_html_node,
+  MarkdownError,
+  RenderDeadline,
+  RenderTimeout,
+)
+
+# worst-case inputs for the block and inline rules and the highlighter: each
+# must render, or fail with a MarkdownError, in time linear in its size.
+# Timings are cpu time, the best of several runs, and the bounds are loose
+# enough for a loaded CI box: the test is after quadratic blowups, which miss
+# them by a wide margin, not after small slowdowns.
+
+SMALL_SIZE = 5_000
+LARGE_SIZE = 40_000
+# 8x the input may take at most this many times longer; linear code takes
+# about 8x and quadratic code about 64x
+SCALING_LIMIT = 24
+# below this timings are mostly noise
+NOISE_FLOOR = 0.02
+RUNS = 5
+# a noisy measurement is taken again before the case fails
+ATTEMPTS = 3
+# per render of the large input; linear cases take a few hundredths of a
+# second, so this only trips on a runaway
+TIME_BUDGET = 2.0
+
+def repeated(unit, tail=""):
+  return lambda size: unit * (size // len(unit)) + tail
+
+MARKDOWN_CASES = {
+  "open brackets": repeated("["),
+  "open wiki-links": repeated("[["),
+  "open images": repeated("!["),
+  "links without targets": repeated("[a]("),
+  "link target runs": repeated("[](" + "x" * 50),
+  "wiki-link labels": repeated("[[a|"),
+  "unbalanced delimiters": repeated("**_~~`", "a"),
+  "stray underscores": repeated("a_b "),
+  "unclosed code span": lambda size: "`" + "a ** b ** " * (size // 10),
+  "quote markers": repeated(">"),
+  "quote lines": repeated(">" + " " * 20 + "a\n", "x"),
+  "quote whitespace": repeated(">   \t", "\nx"),
+  "list markers": repeated("- "),
+  "list lines": repeated("- a\n  - b\n    - c\n"),
+  "ordered list digits": repeated("1" * 50 + ". a\n"),
+  "nested list": lambda size: "".join("  " * i + "- a\n" for i in range(int(size ** 0.5))),
+  "headings": repeated("#"),
+  "fences": lambda size: "```" + "a```" * (size // 4) + "b",
+  "table columns": lambda size: "|" + "a|" * (size // 4) + "\n|" + "-|" * (size // 4) + "\n",
+  "table rows": lambda size: "|a|b|\n|-|-|\n" + "|x|y|\n" * (size // 6),
+}
+
+CODE_CASES = {
+  ("javascript", "open block comments"): repeated("/* "),
+  ("go", "open block comments"): repeated("/* "),
+  ("javascript", "open template string"): lambda size: "`" + "\\a" * (size // 2),
+  ("python", "open triple quotes"): lambda size: '"""' + "'" * size,
+  ("python", "mixed triple quotes"): repeated("'''\"\"\" "),
+  ("bash", "open double quote"): lambda size: '"' + "\\'" * (size // 2),
+}
+
+FUZZ_TOKENS = [
+  "[", "]", "(", ")", "!", "[[", "]]", "|", "**", "_", "`", "```", "~~",
+  ">", "- ", "1. ", "# ", "#", " ", "  ", "\t", "\n", "\n\n", "a", "word",
+  "---", "|-|", "/x", "\\", "```python\n", "```js\n", "/*",
+]
+
+def render_markdown(text):
+  # a timeout is a MarkdownError too, but must not pass for a clean failure
+  with RenderDeadline(TIME_BUDGET):
+    try:
+      markdown_to_html_node(text).to_html()
+    except RenderTimeout:
+      raise
+    except MarkdownError:
+      pass
+
+def best_time(render, text, runs=RUNS):
+  best = None
+  for _ in range(runs):
+    start = time.process_time()
+    render(text)
+    elapsed = time.process_time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+class TestStress(unittest.TestCase):
+  def assert_linear(self, render, make):
+    small_text, large_text = make(SMALL_SIZE), make(LARGE_SIZE)
+    for _ in range(ATTEMPTS):
+      try:
+        small = best_time(render, small_text)
+        large = best_time(render, large_text)
+      except RenderTimeout:
+        self.fail(f"{len(large_text)} characters did not render in {TIME_BUDGET}s")
+      self.assertLess(large, TIME_BUDGET)
+      if large < SCALING_LIMIT * small + NOISE_FLOOR:
+        return
+    self.fail(f"{len(large_text)} characters took {large:.3f}s, {len(small_text)} took {small:.3f}s")
+
+  def test_markdown_scales_linearly(self):
+    for name, make in MARKDOWN_CASES.items():
+      with self.subTest(name):
+        self.assert_linear(render_markdown, make)
+
+  def test_highlighting_scales_linearly(self):
+    for (language, name), make in CODE_CASES.items():
+      with self.subTest(f"{language}: {name}"):
+        self.assert_linear(lambda code: highlight_code(code, language), make)
+
+  def test_fuzzed_markdown_renders_or_fails_cleanly(self):
+    rng = random.Random(0)
+    for _ in range(2000):
+      text = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 80)))
+      with RenderDeadline(TIME_BUDGET):
+        try:
+          markdown_to_html_node(text).to_html()
+        except RenderTimeout:
+          self.fail(f"render timed out on {text!r}")
+        except MarkdownError:
+          pass
+
+class TestRenderDeadline(unittest.TestCase):
+  def test_timeout_names_the_block(self):
+    with RenderDeadline(-1):
+      with self.assertRaises(RenderTimeout) as context:
+        markdown_to_html_node("# Title\n\nbody", source_path="page.md")
+    self.assertEqual(str(context.exception), "page.md:1: render timed out")
+
+  def test_timeout_reaches_table_rows(self):
+    # table rows are built while the page is written, after the blocks
+    node = markdown_to_html_node("# T\n\n|a|\n|-|\n" + "|x|\n" * 50_000, source_path="page.md")
+    with RenderDeadline(-1):
+      with self.assertRaises(RenderTimeout) as context:
+        node.to_html()
+    self.assertEqual(str(context.exception), "page.md:5: render timed out")
+
+  def test_inner_deadline_cannot_extend_outer(self):
+    with RenderDeadline(-1):
+      with RenderDeadline(60):
+        with self.assertRaises(RenderTimeout):
+          markdown_to_html_node("body")
+    self.assertEqual(markdown_to_html_node("body").to_html(), "<div><p>body</p></div>")
+
+  def test_builder_fails_only_the_slow_page(self):
+    source = MemoryBackend({
+      "template.html": "<title>{{ Title }}</title>{{ Content }}",
+      "content/index.md": "# Home",
+    })
+    builder = Builder(source, MemoryBackend(), keep_going=True, render_timeout=-1)
+    self.assertEqual(builder.build(), [])
+    self.assertEqual(builder.failures["content/index.md"]["location"], "content/index.md:1")
+    with self.assertRaises(RenderTimeout):
+      builder.render_markdown("# Preview")
+    builder.render_timeout = None
+    self.assertEqual(builder.build(), ["index.html"])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from leafnode import LeafNode
+from parentnode import ParentNode
+from textnode import TextNode, TextType
+from syntax import SyntaxRegistry
+from utilities import default_syntax, text_to_textnodes, markdown_to_html_node
+
+def paragraph(block):
+  return LeafNode("p", block)
+
+class TestSyntax(unittest.TestCase):
+  def test_block_dispatch_by_first_character(self):
+    checked = []
+    def checker(name, result=True):
+      def matches(block):
+        checked.append(name)
+        return result
+      return matches
+    registry = SyntaxRegistry("paragraph", paragraph, TextNode)
+    registry.register_block("heading", checker("heading"), paragraph, "#")
+    registry.register_block("note", checker("note", False), paragraph, "!")
+    registry.register_block("table", checker("table", False), paragraph)
+    self.assertEqual(registry.block_type("# Title"), "heading")
+    self.assertEqual(checked, ["heading"])
+    checked.clear()
+    self.assertEqual(registry.block_type("!!! note"), "paragraph")
+    self.assertEqual(checked, ["note", "table"])
+    checked.clear()
+    self.assertEqual(registry.block_type("plain"), "paragraph")
+    self.assertEqual(checked, ["table"])
+    self.assertRaises(Exception, registry.render_block, "missing", "x")
+
+  def test_registering_recompiles(self):
+    registry = SyntaxRegistry("paragraph", paragraph, TextNode)
+    self.assertEqual(registry.block_type("!!! note\nbody"), "paragraph")
+    registry.register_block(
+      "admonition",
+      lambda block: block.startswith("!!! "),
+      lambda block: ParentNode("aside", [LeafNode(None, block[4:])]),
+      "!",
+    )
+    self.assertEqual(registry.block_type("!!! note\nbody"), "admonition")
+    self.assertEqual(
+      registry.render_block("admonition", "!!! note").to_html(),
+      "<aside>note</aside>",
+    )
+
+  def test_inline_rules_share_one_scan(self):
+    registry = SyntaxRegistry("paragraph", paragraph, TextNode)
+    registry.register_delimiter(TextType.BOLD, "**")
+    registry.register_inline(
+      "footnote",
+      r"\[\^([^\]]+)\]",
+      lambda label: TextNode(label, "footnote"),
+      "[",
+      to_html=lambda node: LeafNode("sup", node.text),
+    )
+    self.assertEqual(
+      registry.inline_nodes("a **b** c[^1]", TextType.TEXT),
+      [
+        TextNode("a ", TextType.TEXT),
+        TextNode("b", TextType.BOLD),
+        TextNode(" c", TextType.TEXT),
+        TextNode("1", "footnote"),
+      ],
+    )
+    self.assertIn("footnote", registry.html_renderers)
+
+  def test_strikethrough(self):
+    self.assertEqual(
+      text_to_textnodes("keep ~~drop~~ this"),
+      [
+        TextNode("keep ", TextType.TEXT),
+        TextNode("drop", TextType.STRIKETHROUGH),
+        TextNode(" this", TextType.TEXT),
+      ],
+    )
+    self.assertEqual(
+      markdown_to_html_node("~~gone~~").to_html(),
+      "<div><p><s>gone</s></p></div>",
+    )
+
+  def test_leftmost_rule_wins(self):
+    self.assertEqual(
+      text_to_textnodes("`snake_case` and [a_link](/a_b)"),
+      [
+        TextNode("snake_case", TextType.CODE),
+        TextNode(" and ", TextType.TEXT),
+        TextNode("a_link", TextType.LINK, "/a_b"),
+      ],
+    )
+
+  def test_unclosed_delimiter(self):
+    with self.assertRaises(Exception) as context:
+      text_to_textnodes("a **b** and **c")
+    self.assertIn("missing a closing delimiter '**'", str(context.exception))
+
+  def test_default_blocks_registered(self):
+    self.assertEqual(
+      [rule.key.value for rule in default_syntax.block_rules],
+      ["heading", "code", "quote", "unordered_list", "ordered_list", "table"],
+    )
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from tablenode import TableNode
+from parentnode import ParentNode
+from leafnode import LeafNode
+
+def row(tag, *values):
+  return ParentNode("tr", [LeafNode(tag, value) for value in values])
+
+class TestTableNode(unittest.TestCase):
+  def test_to_html_with_rows(self):
+    node = TableNode(
+      row("th", "a", "b"),
+      lambda: iter([row("td", "1", "2"), row("td", "3", "4")]),
+    )
+    self.assertEqual(
+      node.to_html(),
+      "<table><thead><tr><th>a</th><th>b</th></tr></thead>"
+      "<tbody><tr><td>1</td><td>2</td></tr><tr><td>3</td><td>4</td></tr></tbody></table>",
+    )
+
+  def test_to_html_without_body(self):
+    node = TableNode(row("th", "a"), lambda: iter([]))
+    self.assertEqual(
+      node.to_html(),
+      "<table><thead><tr><th>a</th></tr></thead></table>",
+    )
+
+  def test_rows_built_lazily(self):
+    built = []
+
+    def rows():
+      for i in range(3):
+        built.append(i)
+        yield row("td", str(i))
+
+    chunks = TableNode(row("th", "n"), rows).iter_html()
+    for chunk in chunks:
+      if chunk == "<tbody>":
+        break
+    self.assertEqual(built, [0])
+
+  def test_to_html_repeatable(self):
+    node = TableNode(row("th", "n"), lambda: iter([row("td", "1")]))
+    self.assertEqual(node.to_html(), node.to_html())
+
+  def test_to_html_no_header(self):
+    node = TableNode(None, lambda: iter([]))
+    self.assertRaises(ValueError, node.to_html)
+
+if __name__ == "__main__":
+  unittest.main()
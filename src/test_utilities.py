@@ -1,4 +1,5 @@
 import unittest
+import tracemalloc
 from textnode import TextNode, TextType
 from utilities import (
   BlockType,
@@ -13,6 +14,13 @@ from utilities import (
   block_to_block_type,
   markdown_to_html_node,
   extract_title,
+  handle_block_type,
+  render_page_parts,
+  join_page_parts,
+  write_page_to,
+  RenderScope,
+  use_render_scope,
+  MarkdownError,
 )
 
 class TestUtilities(unittest.TestCase):
@@ -293,6 +301,25 @@ class TestUtilities(unittest.TestCase):
         new_nodes,
     )
 
+  def test_text_to_textnodes_wiki_links(self):
+    text = "See [[Home]] and [[Missing|the missing page]]"
+    with use_render_scope(RenderScope(resolve_wiki_link={"Home": "/"}.get)):
+      self.assertListEqual(
+        [
+          TextNode("See ", TextType.TEXT),
+          TextNode("Home", TextType.LINK, "/"),
+          TextNode(" and ", TextType.TEXT),
+          TextNode("the missing page", TextType.TEXT),
+        ],
+        text_to_textnodes(text),
+      )
+    self.assertEqual(text_to_textnodes("[[Home]]"), [TextNode("Home", TextType.TEXT)])
+
+  def test_wiki_links_in_a_table_resolve_when_it_is_written(self):
+    scope = RenderScope(resolve_wiki_link={"Home": "/"}.get)
+    node = markdown_to_html_node("| page |\n| --- |\n| [[Home]] |", scope=scope)
+    self.assertIn('<td><a href="/">Home</a></td>', node.to_html())
+
   def test_text_to_textnodes_just_text(self):
     text = "This is just plain text, making sure there's no extra nodes generated."
     new_nodes = text_to_textnodes(text)
@@ -480,7 +507,7 @@ Here's some other text under the italicized H3 heading
     html = node.to_html()
     self.assertEqual(
       html,
-      "<div><ul><li>unordered list item 1 that has some <i>italic</i> text</li><li>unordered list item 2 that has some <b>bold</b> text</li><li>unordered list item 3 that has some <code>code</code></li></ul></div>",
+      "<div><ul><li>unordered list item 1 that has some <i>italic</i> text<ul><li>unordered list item 2 that has some <b>bold</b> text</li></ul></li><li>unordered list item 3 that has some <code>code</code></li></ul></div>",
     )
 
   def test_markdown_to_html_node_ordered_list(self):
@@ -497,6 +524,108 @@ Here's some other text under the italicized H3 heading
       "<div><ol><li>ordered list item 1 that has some <i>italic</i> text</li><li>ordered list item 2 that has some <b>bold</b> text</li><li>ordered list item 3 that has some <code>code</code></li></ol></div>",
     )
 
+  def test_markdown_to_html_node_nested_lists(self):
+    md = """
+- fruit
+  1. apple
+  2. pear
+     - green
+- vegetables
+  - leek
+"""
+
+    node = markdown_to_html_node(md)
+    html = node.to_html()
+    self.assertEqual(
+      html,
+      "<div><ul><li>fruit<ol><li>apple</li><li>pear<ul><li>green</li></ul></li></ol></li><li>vegetables<ul><li>leek</li></ul></li></ul></div>",
+    )
+
+  def test_markdown_to_html_node_multi_paragraph_list_item(self):
+    md = """
+- first paragraph
+  continues here
+
+  second paragraph of the same item
+- next item
+"""
+
+    node = markdown_to_html_node(md)
+    html = node.to_html()
+    self.assertEqual(
+      html,
+      "<div><ul><li><p>first paragraph continues here</p><p>second paragraph of the same item</p></li><li>next item</li></ul></div>",
+    )
+
+  def test_markdown_to_blocks_keeps_indented_list_continuation(self):
+    md = """
+- item
+
+  more of the item
+
+Not part of the list
+"""
+    blocks = markdown_to_blocks(md)
+    self.assertEqual(
+      blocks,
+      [
+        "- item\n\n  more of the item",
+        "Not part of the list",
+      ],
+    )
+
+  def test_block_to_block_type_unindented_continuation_is_paragraph(self):
+    md_block = "- This looks like a list\nbut is a paragraph"
+    self.assertEqual(block_to_block_type(md_block), BlockType.PARAGRAPH)
+
+  def test_markdown_to_html_node_deep_list(self):
+    md_block = "\n".join(f"{'  ' * (i % 100)}- item {i}" for i in range(5000))
+    self.assertEqual(block_to_block_type(md_block), BlockType.UNORDERED_LIST)
+    html = markdown_to_html_node(md_block).to_html()
+    self.assertEqual(html.count("<li>"), 5000)
+    self.assertEqual(html.count("<ul>"), 5000 - 49)
+
+  def test_block_to_block_type_table(self):
+    md_block = "| a | b |\n| --- | :-: |\n| 1 | 2 |"
+    self.assertEqual(block_to_block_type(md_block), BlockType.TABLE)
+
+  def test_block_to_block_type_table_needs_delimiter_row(self):
+    md_block = "| a | b |\n| 1 | 2 |"
+    self.assertEqual(block_to_block_type(md_block), BlockType.PARAGRAPH)
+
+  def test_markdown_to_html_node_table(self):
+    md = """
+| Name | Age | Ring \\| Bearer |
+| :--- | --: | :-: |
+| **Frodo** | 50 | yes |
+| Sam | 38 |
+"""
+
+    node = markdown_to_html_node(md)
+    html = node.to_html()
+    self.assertEqual(
+      html,
+      '<div><table><thead><tr><th align="left">Name</th><th align="right">Age</th><th align="center">Ring | Bearer</th></tr></thead>'
+      '<tbody><tr><td align="left"><b>Frodo</b></td><td align="right">50</td><td align="center">yes</td></tr>'
+      '<tr><td align="left">Sam</td><td align="right">38</td><td align="center"></td></tr></tbody></table></div>',
+    )
+
+  def test_table_serialization_memory_is_flat(self):
+    def peak_for(row_count):
+      block = "| a | b |\n| - | - |\n" + "\n".join(
+        f"| cell {i} | **{i}** |" for i in range(row_count)
+      )
+      tracemalloc.start()
+      for chunk in handle_block_type(BlockType.TABLE, block).iter_html():
+        pass
+      peak = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+      return peak
+
+    small = peak_for(200)
+    large = peak_for(5000)
+    self.assertLess(large, small * 2)
+
   def test_extract_title(self):
     md = """
 ## This is not the title
@@ -521,5 +650,29 @@ Here's some other text under the italicized H3 heading
 
 
 
+  def test_page_parts_match_streamed_basepath(self):
+    import io
+    template = '<link href="/a.css"><title>{{ Title }}</title>{{ Content }}<img src="/b.png">'
+    html_node = markdown_to_html_node("# T\n\n[x](/x) [y](https://y) ![i](/i.png)")
+    parts = render_page_parts(template, "T", html_node)
+    for basepath in ["/", "/py-ssg/", "https://cdn.example/site/"]:
+      f = io.StringIO()
+      write_page_to(f, template, "T", html_node, basepath)
+      self.assertEqual(join_page_parts(parts, basepath), f.getvalue())
+
+  def test_markdown_error_location(self):
+    md = "# T\n\nok\n\n- a\n- b\n\nsame\n\nsame **unclosed\n\nafter"
+    with self.assertRaises(MarkdownError) as context:
+      markdown_to_html_node(md, source_path="page.md")
+    self.assertEqual(context.exception.line, 10)
+    self.assertTrue(str(context.exception).startswith("page.md:10: "))
+
+  def test_markdown_error_location_of_a_repeated_line(self):
+    # the failing line also appears earlier, inside a code block
+    md = "```\n_oops\n```\n\n_oops"
+    with self.assertRaises(MarkdownError) as context:
+      markdown_to_html_node(md, source_path="page.md")
+    self.assertEqual(context.exception.line, 5)
+
 if __name__ == "__main__":
   unittest.main()
\ No newline at end of file
@@ -0,0 +1,62 @@
+import os
+import time
+import unittest
+import tempfile
+from backends import MemoryBackend, open_output_backend
+from builder import Builder
+from test_builder import site_files
+from verify import BuildDigests, digest_manifest, first_difference, write_manifest
+
+class TestVerify(unittest.TestCase):
+  def build_to(self, target, mtime=0):
+    with open_output_backend(target, mtime) as output:
+      Builder(MemoryBackend(site_files()), output, "/site/").build()
+
+  def test_reproducible_archives_are_byte_identical(self):
+    with tempfile.TemporaryDirectory() as root:
+      for extension in ["zip", "tar", "tar.gz"]:
+        first = os.path.join(root, f"first.{extension}")
+        second = os.path.join(root, f"second.{extension}")
+        self.build_to(first)
+        time.sleep(0.01)
+        self.build_to(second)
+        with open(first, "rb") as f, open(second, "rb") as g:
+          self.assertEqual(f.read(), g.read(), extension)
+
+  def test_reproducible_directory_mtimes(self):
+    with tempfile.TemporaryDirectory() as root:
+      self.build_to(os.path.join(root, "out"), mtime=1700000000)
+      stat = os.stat(os.path.join(root, "out", "blog", "index.html"))
+      self.assertEqual(stat.st_mtime, 1700000000)
+
+  def test_first_difference(self):
+    with tempfile.TemporaryDirectory() as root:
+      first = os.path.join(root, "first")
+      second = os.path.join(root, "second.zip")
+      self.build_to(first)
+      self.build_to(second)
+      with BuildDigests(first) as left, BuildDigests(second) as right:
+        self.assertIsNone(first_difference(left, right))
+      with open(os.path.join(first, "blog", "index.html"), "a") as f:
+        f.write("changed")
+      with open(os.path.join(first, "index.html"), "a") as f:
+        f.write("changed")
+      with BuildDigests(first) as left, BuildDigests(second) as right:
+        self.assertEqual(first_difference(left, right), "blog/index.html")
+      os.remove(os.path.join(first, "blog", "first", "index.html"))
+      with BuildDigests(first) as left, BuildDigests(second) as right:
+        self.assertEqual(first_difference(left, right), "blog/first/index.html")
+
+  def test_manifest_against_build(self):
+    with tempfile.TemporaryDirectory() as root:
+      build_path = os.path.join(root, "out.tar.gz")
+      manifest_path = os.path.join(root, "manifest.json")
+      self.build_to(build_path)
+      with BuildDigests(build_path) as build:
+        write_manifest(digest_manifest(build.backend), manifest_path)
+      with BuildDigests(manifest_path) as left, BuildDigests(build_path) as right:
+        self.assertIsNone(first_difference(left, right))
+        self.assertEqual(left.paths(), sorted(left.paths()))
+
+if __name__ == "__main__":
+  unittest.main()
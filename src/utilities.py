@@ -1,9 +1,14 @@
 import re
-import os
+import time
+import threading
+from contextlib import contextmanager
 from enum import Enum
 from textnode import TextType, TextNode
 from leafnode import LeafNode
 from parentnode import ParentNode
+from tablenode import TableNode
+from highlight import normalize_language, highlight
+from syntax import SyntaxRegistry
 
 class BlockType(Enum):
   PARAGRAPH = "paragraph"
@@ -12,6 +17,107 @@ class BlockType(Enum):
   QUOTE = "quote"
   UNORDERED_LIST = "unordered_list"
   ORDERED_LIST = "ordered_list"
+  TABLE = "table"
+
+# compiled once at import instead of going through the re cache per call
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+WIKI_LINK_PATTERN = re.compile(r"\[\[([^\[\]|]+)(?:\|([^\[\]]+))?\]\]")
+HEADING_PATTERN = re.compile(r"^#{1,6} .+")
+CODE_BLOCK_PATTERN = re.compile(r"^```[\s\S]*?```$")
+QUOTE_BLOCK_PATTERN = re.compile(r'(?:^\s*>.*\n?)+$', re.MULTILINE)
+QUOTE_MARKER_PATTERN = re.compile(r'^\s*>\s*')
+TABLE_CELL_SEPARATOR = re.compile(r"(?<!\\)\|")
+BASEPATH_SLOT_PATTERN = re.compile(r'(?<=href=")/|(?<=src=")/')
+
+class MarkdownError(Exception):
+  # a block that failed to render, located by file and line so a keep-going
+  # build can report it and move on
+  def __init__(self, message, source_path=None, line=None):
+    super().__init__(message)
+    self.message = message
+    self.source_path = source_path
+    self.line = line
+
+  def __str__(self):
+    location = self.source_path or "<markdown>"
+    if self.line is not None:
+      location += f":{self.line}"
+    return f"{location}: {self.message}"
+
+def wiki_link_to_text_node(title, label=None):
+  # [[Title]] and [[Title|label]] resolve through the render scope; with no
+  # resolver, or no page of that title, the label stays plain text
+  label = (label or title).strip()
+  resolve = current_render_scope().resolve_wiki_link
+  url = resolve(title) if resolve is not None else None
+  if url is None:
+    return TextNode(label, TextType.TEXT)
+  return TextNode(label, TextType.LINK, url)
+
+# what a render needs beyond the markdown travels in a RenderScope passed to
+# markdown_to_html_node. It is current for the calling thread only while
+# blocks are rendered, so the rule callbacks can reach it without builders or
+# daemon threads ever seeing each other's
+_render_scope = threading.local()
+
+class RenderScope:
+  def __init__(self, highlight_cache=None, resolve_wiki_link=None):
+    self.highlight_cache = highlight_cache
+    # title -> url, usually a build's LinkGraph.resolve
+    self.resolve_wiki_link = resolve_wiki_link
+
+DEFAULT_RENDER_SCOPE = RenderScope()
+
+@contextmanager
+def use_render_scope(scope):
+  # None keeps whatever scope is already current
+  previous = getattr(_render_scope, "current", None)
+  if scope is not None:
+    _render_scope.current = scope
+  try:
+    yield
+  finally:
+    _render_scope.current = previous
+
+def current_render_scope():
+  return getattr(_render_scope, "current", None) or DEFAULT_RENDER_SCOPE
+
+class RenderTimeout(MarkdownError):
+  pass
+
+_render_deadline = threading.local()
+
+class RenderDeadline:
+  # a per-thread time limit for rendering one page. It is cooperative and
+  # checked between blocks and table rows: a page cannot run on block after
+  # block, and any single block is bounded by the parsers scaling linearly
+  # with its size.
+  def __init__(self, seconds):
+    self.seconds = seconds
+    self.previous = None
+
+  def __enter__(self):
+    self.previous = getattr(_render_deadline, "at", None)
+    if self.seconds is not None:
+      at = time.monotonic() + self.seconds
+      if self.previous is None or at < self.previous:
+        _render_deadline.at = at
+    return self
+
+  def __exit__(self, *exc_info):
+    _render_deadline.at = self.previous
+
+def deadline_passed():
+  at = getattr(_render_deadline, "at", None)
+  return at is not None and time.monotonic() > at
+
+# the file and line of the block being rendered, for rules that do part of
+# their work later and must still report where it failed
+_block_location = threading.local()
+
+def current_block_location():
+  return getattr(_block_location, "current", None) or (None, None)
 
 def text_node_to_html_node(text_node):
   match text_node.text_type:
@@ -23,6 +129,8 @@ def text_node_to_html_node(text_node):
       return LeafNode("i", text_node.text)
     case TextType.CODE:
       return LeafNode("code", text_node.text)
+    case TextType.STRIKETHROUGH:
+      return LeafNode("s", text_node.text)
     case TextType.LINK:
       return LeafNode(
         "a",
@@ -39,7 +147,10 @@ def text_node_to_html_node(text_node):
         },
       )
     case _:
-      raise Exception(f"Invalid Text Type: {text_node.text_type}")
+      to_html = default_syntax.html_renderers.get(text_node.text_type)
+      if to_html is None:
+        raise Exception(f"Invalid Text Type: {text_node.text_type}")
+      return to_html(text_node)
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
   new_nodes = []
@@ -100,202 +211,484 @@ def split_nodes_link(old_nodes):
   return list(filter(lambda node: node.text != "", new_nodes))
     
 def extract_markdown_images(text):
-  return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+  return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text):
-  return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+  return LINK_PATTERN.findall(text)
 
 def text_to_textnodes(text):
-  text_node = TextNode(text, TextType.TEXT)
-  split_nodes = split_nodes_delimiter([text_node], "**", TextType.BOLD)
-  split_nodes = split_nodes_delimiter(split_nodes, "_", TextType.ITALIC)
-  split_nodes = split_nodes_delimiter(split_nodes, "`", TextType.CODE)
-  split_nodes = split_nodes_image(split_nodes)
-  split_nodes = split_nodes_link(split_nodes)
-  return split_nodes
+  # one left-to-right scan with every registered inline rule at once
+  return default_syntax.inline_nodes(text, TextType.TEXT)
 
 def markdown_to_blocks(text):
-  return list(
-    filter(
-      lambda block: block != "",
-      map(
-        lambda block: block.strip(),
-        text.split('\n\n')
-      )
-    )
-  )
+  return [block for _, block in markdown_to_located_blocks(text)]
+
+def markdown_to_located_blocks(text):
+  # (index of the block's first line in text, block), so an error can name
+  # its line without searching for the block again
+  blocks = []
+  lines = []
+  first_line = 0
+  pending_break = False
+  for index, line in enumerate(text.split("\n")):
+    if line.strip() == "":
+      pending_break = bool(lines)
+      continue
+    if pending_break:
+      # an indented line after a blank line continues the previous list item
+      if line[:1] in (" ", "\t") and list_marker(lines[0].expandtabs(4)):
+        lines.append("")
+      else:
+        blocks.append((first_line, join_block_lines(lines)))
+        lines = []
+      pending_break = False
+    if not lines:
+      first_line = index
+    lines.append(line)
+  if lines:
+    blocks.append((first_line, join_block_lines(lines)))
+  return blocks
+
+def join_block_lines(lines):
+  indent = min(len(line) - len(line.lstrip()) for line in lines if line)
+  return "\n".join(line[indent:] for line in lines).strip()
 
 def isHeading(block):
-  return re.match(r"^#{1,6} .+", block) is not None
+  return HEADING_PATTERN.match(block) is not None
 
 def isCodeBlock(block):
-  return re.fullmatch(r"^```[\s\S]*?```$", block) is not None
+  return CODE_BLOCK_PATTERN.fullmatch(block) is not None
 
 def isQuoteBlock(block):
-  return re.fullmatch(r'(?:^\s*>.*\n?)+$', block, re.MULTILINE) is not None
+  return QUOTE_BLOCK_PATTERN.fullmatch(block) is not None
 
 def isUnorderedList(block):
-  return re.fullmatch(r'^(?:\s*- .+\n?)+$', block, re.MULTILINE) is not None
+  return list_block_type(block) == BlockType.UNORDERED_LIST
 
 def isOrderedList(block):
-  return re.fullmatch(r'^(?:\s*\d+\. .+\n?)+$', block, re.MULTILINE) is not None
+  return list_block_type(block) == BlockType.ORDERED_LIST
 
-def block_to_block_type(md_block):
-  checker_map = [
-    (isHeading, BlockType.HEADING),
-    (isCodeBlock, BlockType.CODE),
-    (isQuoteBlock, BlockType.QUOTE),
-    (isUnorderedList, BlockType.UNORDERED_LIST),
-    (isOrderedList, BlockType.ORDERED_LIST),
-  ]
+def list_marker(line):
+  indent = len(line) - len(line.lstrip(" "))
+  i = indent
+  if line.startswith("- ", i):
+    ordered = False
+  else:
+    while i < len(line) and line[i].isdigit():
+      i += 1
+    if i == indent or not line.startswith(". ", i):
+      return None
+    ordered = True
+  i += 2
+  content = line[i:].lstrip(" ")
+  if content == "":
+    return None
+  return indent, ordered, len(line) - len(content)
 
-  for checker, block_type in checker_map:
-      if checker(md_block):
-          return block_type
-  return BlockType.PARAGRAPH
+def list_block_type(block):
+  lines = block.expandtabs(4).split("\n")
+  first = list_marker(lines[0])
+  if first is None:
+    return None
+  root_indent, ordered, _ = first
+  for line in lines[1:]:
+    if line == "" or line.isspace():
+      continue
+    marker = list_marker(line)
+    if marker is None:
+      if line[0] != " ":
+        return None
+    elif marker[0] <= root_indent and marker[1] != ordered:
+      return None
+  return BlockType.ORDERED_LIST if ordered else BlockType.UNORDERED_LIST
 
-def handle_block_type(block_type, block):
-  match block_type:
-    case BlockType.CODE:
-      cleaned_block = block.strip("`").lstrip("\n")
-      return ParentNode(
-        "pre",
-        map(
-          text_node_to_html_node,
-          [
-            TextNode(
-              cleaned_block,
-              TextType.CODE
-            )
-          ],
-        ),
-      )
+def new_list_frame(ordered):
+  return {"ordered": ordered, "content_col": 0, "items": []}
 
-    case BlockType.PARAGRAPH:
-      cleaned_block = block.replace("\n", " ")
-      return ParentNode(
-        "p",
-        map(
-          text_node_to_html_node,
-          text_to_textnodes(cleaned_block),
-        ),
-      )
+def parse_list_block(block):
+  # single pass over the lines with a stack of open lists; every item is a
+  # list of parts, where a part is either a paragraph (list of lines) or a
+  # nested list frame
+  stack = []
+  pending_blank = False
+  for line in block.expandtabs(4).split("\n"):
+    if line == "" or line.isspace():
+      pending_blank = True
+      continue
+    marker = list_marker(line)
+    if marker is None:
+      indent = len(line) - len(line.lstrip(" "))
+      if pending_blank:
+        while len(stack) > 1 and indent < stack[-1]["content_col"]:
+          stack.pop()
+        stack[-1]["items"][-1].append([line.strip()])
+      else:
+        stack[-1]["items"][-1][-1].append(line.strip())
+      pending_blank = False
+      continue
+    indent, ordered, content_col = marker
+    while len(stack) > 1 and indent < stack[-2]["content_col"]:
+      stack.pop()
+    if not stack:
+      stack.append(new_list_frame(ordered))
+    elif indent >= stack[-1]["content_col"]:
+      frame = new_list_frame(ordered)
+      stack[-1]["items"][-1].append(frame)
+      stack.append(frame)
+    elif ordered != stack[-1]["ordered"] and len(stack) > 1:
+      stack.pop()
+      frame = new_list_frame(ordered)
+      stack[-1]["items"][-1].append(frame)
+      stack.append(frame)
+    stack[-1]["content_col"] = content_col
+    stack[-1]["items"].append([[line[content_col:]]])
+    pending_blank = False
+  return stack[0]
 
-    case BlockType.HEADING:
-      i = 0
-      while block[i] == '#':
-        i += 1
-      cleaned_block = block.lstrip("# ")
-      return ParentNode(
-        f"h{i}",
+def list_frame_to_html_node(frame):
+  list_items = []
+  for parts in frame["items"]:
+    paragraph_count = sum(1 for part in parts if isinstance(part, list))
+    children = []
+    for part in parts:
+      if isinstance(part, dict):
+        children.append(list_frame_to_html_node(part))
+        continue
+      inline_nodes = list(
         map(
           text_node_to_html_node,
-          text_to_textnodes(cleaned_block),
-        ),
+          text_to_textnodes(" ".join(part)),
+        )
       )
+      if paragraph_count > 1:
+        children.append(ParentNode("p", inline_nodes))
+      else:
+        children.extend(inline_nodes)
+    list_items.append(ParentNode("li", children))
+  return ParentNode(
+    "ol" if frame["ordered"] else "ul",
+    list_items,
+  )
 
-    case BlockType.QUOTE:
-      quote_text = " ".join(
-        map(
-          lambda line: re.sub(r'^\s*>\s*', '', line),
-          block.splitlines(),
-        )
+def iter_lines(text, start=0):
+  while True:
+    end = text.find("\n", start)
+    if end == -1:
+      yield text[start:]
+      return
+    yield text[start:end]
+    start = end + 1
+
+def split_table_row(line):
+  line = line.strip()
+  if line.startswith("|"):
+    line = line[1:]
+  if line.endswith("|") and not line.endswith("\\|"):
+    line = line[:-1]
+  return [
+    cell.strip().replace("\\|", "|")
+    for cell in TABLE_CELL_SEPARATOR.split(line)
+  ]
+
+def table_alignments(line):
+  alignments = []
+  for cell in split_table_row(line):
+    dashes = cell.strip(":")
+    if dashes == "" or dashes.strip("-") != "":
+      return None
+    if cell.startswith(":") and cell.endswith(":"):
+      alignments.append("center")
+    elif cell.endswith(":"):
+      alignments.append("right")
+    elif cell.startswith(":"):
+      alignments.append("left")
+    else:
+      alignments.append(None)
+  return alignments
+
+def table_head_lines(block):
+  # only the header and delimiter rows are sliced out; the body is never
+  # copied so huge tables can be walked in place
+  header_end = block.find("\n")
+  if header_end == -1:
+    return None
+  delimiter_end = block.find("\n", header_end + 1)
+  if delimiter_end == -1:
+    delimiter_end = len(block)
+  return (
+    block[:header_end],
+    block[header_end + 1:delimiter_end],
+    delimiter_end + 1,
+  )
+
+def isTable(block):
+  head_lines = table_head_lines(block)
+  if head_lines is None or "|" not in head_lines[0]:
+    return False
+  header, delimiter_row, _ = head_lines
+  alignments = table_alignments(delimiter_row)
+  return (
+    alignments is not None
+    and len(alignments) == len(split_table_row(header))
+  )
+
+def table_row_to_html_node(line, alignments, cell_tag):
+  cells = split_table_row(line)
+  cell_nodes = []
+  for i, alignment in enumerate(alignments):
+    text = cells[i] if i < len(cells) else ""
+    cell_nodes.append(
+      ParentNode(
+        cell_tag,
+        list(map(text_node_to_html_node, text_to_textnodes(text))),
+        {"align": alignment} if alignment else None,
       )
-      return ParentNode(
-        "blockquote",
-        map(
-          text_node_to_html_node,
-          text_to_textnodes(quote_text),
+    )
+  return ParentNode("tr", cell_nodes)
+
+def table_block_to_html_node(block):
+  header, delimiter_row, body_start = table_head_lines(block)
+  alignments = table_alignments(delimiter_row)
+
+  # rows are built as the table is written, after the render has returned,
+  # so they take the render's scope and the block's location with them
+  scope = current_render_scope()
+  source_path, block_line = current_block_location()
+
+  def rows():
+    if body_start >= len(block):
+      return
+    # the body starts on the block's third line
+    for row_offset, line in enumerate(iter_lines(block, body_start), 2):
+      if line.strip() == "":
+        continue
+      line_number = block_line + row_offset if block_line is not None else None
+      if deadline_passed():
+        raise RenderTimeout("render timed out", source_path, line_number)
+      try:
+        with use_render_scope(scope):
+          row = table_row_to_html_node(line, alignments, "td")
+      except MarkdownError:
+        raise
+      except Exception as error:
+        raise MarkdownError(str(error), source_path, line_number) from error
+      yield row
+
+  return TableNode(
+    table_row_to_html_node(header, alignments, "th"),
+    rows,
+  )
+
+def block_to_block_type(md_block):
+  return default_syntax.block_type(md_block)
+
+def handle_block_type(block_type, block):
+  return default_syntax.render_block(block_type, block)
+
+def text_to_html_nodes(text):
+  return list(map(text_node_to_html_node, text_to_textnodes(text)))
+
+def code_block_to_html_node(block):
+  stripped_block = block.strip("`")
+  info_string, newline, cleaned_block = stripped_block.partition("\n")
+  if not newline:
+    info_string, cleaned_block = "", stripped_block
+  language = normalize_language(info_string)
+  if language is None:
+    return ParentNode(
+      "pre",
+      [
+        text_node_to_html_node(
+          TextNode(
+            cleaned_block,
+            TextType.CODE
+          )
         ),
-      )
+      ],
+    )
+  highlighted = highlight(cleaned_block, language, current_render_scope().highlight_cache)
+  return ParentNode(
+    "pre",
+    [
+      LeafNode(
+        "code",
+        cleaned_block if highlighted is None else highlighted,
+        {"class": f"language-{language}"},
+      ),
+    ],
+  )
 
-    case BlockType.UNORDERED_LIST:
-      cleaned_block = "\n".join(
-        map(
-          lambda line: re.sub(r'^\s*-\s*', '', line),
-          block.splitlines(),
-        )
-      )
-      child_list = list(
-        map(
-          lambda line: ParentNode(
-            "li",
-            map(
-              text_node_to_html_node,
-              text_to_textnodes(line),
-            ),
-          ),
-          cleaned_block.splitlines(),
-        )
-      )
-      return ParentNode(
-        "ul",
-        child_list,
-      )
+def paragraph_to_html_node(block):
+  return ParentNode("p", text_to_html_nodes(block.replace("\n", " ")))
 
-    case BlockType.ORDERED_LIST:
-      cleaned_block = "\n".join(
-        map(
-          lambda line: re.sub(r'^\s*\d+\.\s*', '', line),
-          block.splitlines(),
-        )
-      )
-      child_list = list(
-        map(
-          lambda line: ParentNode(
-            "li",
-            map(
-              text_node_to_html_node,
-              text_to_textnodes(line),
-            ),
+def heading_to_html_node(block):
+  i = 0
+  while block[i] == '#':
+    i += 1
+  return ParentNode(f"h{i}", text_to_html_nodes(block.lstrip("# ")))
+
+def quote_block_to_html_node(block):
+  quote_text = " ".join(
+    map(
+      lambda line: QUOTE_MARKER_PATTERN.sub('', line),
+      block.splitlines(),
+    )
+  )
+  return ParentNode("blockquote", text_to_html_nodes(quote_text))
+
+def list_block_to_html_node(block):
+  return list_frame_to_html_node(parse_list_block(block))
+
+def markdown_to_html_nodes(markdown, includes=None, source_path=None, scope=None, first_line=0):
+  # first_line is how many lines of source_path come before markdown
+  with use_render_scope(scope):
+    return render_html_nodes(markdown, includes, source_path, first_line)
+
+def render_html_nodes(markdown, includes, source_path, first_line=0):
+  if includes is None:
+    segments = [(markdown, None, 0)]
+  else:
+    segments = includes.split_markdown(markdown)
+  html_nodes = []
+  for text, include_name, segment_line in segments:
+    if include_name is not None:
+      html_nodes.extend(
+        includes.resolve(
+          include_name,
+          source_path,
+          lambda partial, partial_path: render_html_nodes(
+            partial, includes, partial_path
           ),
-          cleaned_block.splitlines(),
+          first_line + segment_line + 1,
         )
       )
-      return ParentNode(
-        "ol",
-        child_list,
-      )
-      
-    case _:
-      raise Exception("invalid BlockType")
+      continue
+    for block_line, block in markdown_to_located_blocks(text):
+      line = first_line + segment_line + block_line + 1
+      if deadline_passed():
+        raise RenderTimeout("render timed out", source_path, line)
+      _block_location.current = (source_path, line)
+      try:
+        block_type = block_to_block_type(block)
+        html_nodes.append(handle_block_type(block_type, block))
+      except MarkdownError:
+        raise
+      except Exception as error:
+        raise MarkdownError(str(error), source_path, line) from error
+  return html_nodes
 
-def markdown_to_html_node(markdown):
-  md_blocks = markdown_to_blocks(markdown)
-  html_nodes = []
-  for block in md_blocks:
-    block_type = block_to_block_type(block)
-    html_nodes.append(handle_block_type(block_type, block))
+def markdown_to_html_node(markdown, includes=None, source_path=None, scope=None):
   return ParentNode(
     "div",
-    html_nodes,
+    markdown_to_html_nodes(markdown, includes, source_path, scope),
   )
 
 def extract_title(markdown):
-  blocks = markdown_to_blocks(markdown)
+  return title_from_blocks(markdown_to_blocks(markdown))
+
+def title_from_blocks(blocks):
   for block in blocks:
     if not isHeading(block):
       continue
     if block[1] == "#":
       continue
     return block[1:].strip()
-    
-def generate_page(from_path, template_path, dest_path, basepath):
-  print(f"Generating page from {from_path} to {dest_path} using {template_path}", end="...")
-  with open(from_path, encoding="utf-8") as f:
-    md = f.read()
-  with open(template_path, encoding="utf-8") as f:
-    template = f.read()
-  md_html = markdown_to_html_node(md).to_html()
-  title = extract_title(md)
-  page_html = template.replace("{{ Title }}", title)
-  page_html = page_html.replace("{{ Content }}", md_html)
-  page_html = page_html.replace('href="/', f'href="{basepath}')
-  page_html = page_html.replace('src="/', f'src="{basepath}')
-  parent_dirs = os.path.dirname(dest_path)
-  if parent_dirs:
-    os.makedirs(parent_dirs, exist_ok=True)
-  with open(dest_path, 'w', encoding="utf-8") as f:
-    f.write(page_html)
-  print("Done!")
-  
\ No newline at end of file
+
+def fill_template(template, title):
+  # placeholders a page has no value for, like {{ Backlinks }} on listing
+  # pages, render empty
+  return template.replace("{{ Title }}", title).replace("{{ Backlinks }}", "")
+
+def write_page_to(f, template, title, html_node, basepath):
+  page_template = fill_template(template, title)
+  template_head, _, template_tail = page_template.partition("{{ Content }}")
+  f.write(apply_basepath(template_head, basepath))
+  write_html_stream(f, html_node.iter_html(), basepath)
+  f.write(apply_basepath(template_tail, basepath))
+
+def apply_basepath(html, basepath):
+  html = html.replace('href="/', f'href="{basepath}')
+  return html.replace('src="/', f'src="{basepath}')
+
+def render_page_parts(template, title, html_node):
+  # a basepath-neutral page split at every root-relative href/src, so each
+  # deployment target only pays for one join instead of a full render
+  page_template = fill_template(template, title)
+  template_head, _, template_tail = page_template.partition("{{ Content }}")
+  html = template_head + "".join(html_node.iter_html()) + template_tail
+  return BASEPATH_SLOT_PATTERN.split(html)
+
+def join_page_parts(parts, basepath):
+  return basepath.join(parts)
+
+def write_page_targets(targets, dest_path, template, title, html_node, stream=True):
+  # without stream the page is rendered in full before anything is written
+  if stream and len(targets) == 1:
+    output, basepath = targets[0]
+    with output.open_text(dest_path) as f:
+      write_page_to(f, template, title, html_node, basepath)
+      f.flush()
+      return f.buffer.bytes_written
+  parts = render_page_parts(template, title, html_node)
+  bytes_written = 0
+  for output, basepath in targets:
+    data = join_page_parts(parts, basepath).encode("utf-8")
+    output.write_bytes(dest_path, data)
+    bytes_written += len(data)
+  return bytes_written
+
+def write_html_stream(f, chunks, basepath, buffer_size=1 << 16):
+  # chunks end on tag boundaries, so batching whole chunks never splits an
+  # attribute that the basepath rewrite has to see
+  buffer = []
+  buffered = 0
+  for chunk in chunks:
+    buffer.append(chunk)
+    buffered += len(chunk)
+    if buffered >= buffer_size:
+      f.write(apply_basepath("".join(buffer), basepath))
+      buffer = []
+      buffered = 0
+  if buffer:
+    f.write(apply_basepath("".join(buffer), basepath))
+
+# the built-in syntax; plugins register further rules on default_syntax
+default_syntax = SyntaxRegistry(BlockType.PARAGRAPH, paragraph_to_html_node, TextNode)
+default_syntax.register_block(BlockType.HEADING, isHeading, heading_to_html_node, "#")
+default_syntax.register_block(BlockType.CODE, isCodeBlock, code_block_to_html_node, "`")
+default_syntax.register_block(BlockType.QUOTE, isQuoteBlock, quote_block_to_html_node, ">")
+default_syntax.register_block(
+  BlockType.UNORDERED_LIST,
+  isUnorderedList,
+  list_block_to_html_node,
+  "-",
+)
+default_syntax.register_block(
+  BlockType.ORDERED_LIST,
+  isOrderedList,
+  list_block_to_html_node,
+  "0123456789",
+)
+default_syntax.register_block(BlockType.TABLE, isTable, table_block_to_html_node)
+default_syntax.register_delimiter(TextType.BOLD, "**")
+default_syntax.register_delimiter(TextType.ITALIC, "_")
+default_syntax.register_delimiter(TextType.CODE, "`")
+default_syntax.register_delimiter(TextType.STRIKETHROUGH, "~~")
+default_syntax.register_inline(
+  TextType.IMAGE,
+  IMAGE_PATTERN.pattern,
+  lambda alt, url: TextNode(alt, TextType.IMAGE, url),
+  "!",
+)
+default_syntax.register_inline(
+  TextType.LINK,
+  LINK_PATTERN.pattern,
+  lambda text, url: TextNode(text, TextType.LINK, url),
+  "[",
+)
+default_syntax.register_inline(
+  TextType.LINK,
+  WIKI_LINK_PATTERN.pattern,
+  wiki_link_to_text_node,
+  "[",
+)
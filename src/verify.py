@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from backends import open_input_backend
+
+# a build is given as an output target (directory, archive or cas:DIR) or as
+# a digest manifest written by `main.py --manifest FILE`
+
+def file_digest(backend, path):
+  return hashlib.sha256(backend.read_bytes(path)).hexdigest()
+
+def digest_manifest(backend, workers=None):
+  paths = backend.list_files()
+  with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as executor:
+    digests = executor.map(lambda path: file_digest(backend, path), paths)
+    return dict(zip(paths, digests))
+
+def write_manifest(manifest, manifest_path):
+  tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+  with open(tmp_path, "w", encoding="utf-8") as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+    f.write("\n")
+  os.replace(tmp_path, manifest_path)
+
+class BuildDigests:
+  def __init__(self, target):
+    self.backend = None
+    self.manifest = None
+    if target.endswith(".json"):
+      with open(target, encoding="utf-8") as f:
+        self.manifest = json.load(f)
+    else:
+      self.backend = open_input_backend(target)
+
+  def paths(self):
+    if self.manifest is not None:
+      return list(self.manifest)
+    return self.backend.list_files()
+
+  def digest(self, path, paths):
+    if path not in paths:
+      return None
+    if self.manifest is not None:
+      return self.manifest[path]
+    return file_digest(self.backend, path)
+
+  def close(self):
+    if self.backend is not None:
+      self.backend.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+def first_difference(left, right, workers=None):
+  # files are hashed in parallel but reported in sorted order, so the answer
+  # is the same however the work is scheduled
+  left_paths = set(left.paths())
+  right_paths = set(right.paths())
+  paths = sorted(left_paths | right_paths)
+  def differs(path):
+    return left.digest(path, left_paths) != right.digest(path, right_paths)
+  executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4)
+  try:
+    for path, is_different in zip(paths, executor.map(differs, paths)):
+      if is_different:
+        return path
+    return None
+  finally:
+    executor.shutdown(cancel_futures=True)
+
+def main():
+  if len(sys.argv) != 3:
+    print("usage: verify.py BUILD BUILD", file=sys.stderr)
+    sys.exit(2)
+  with BuildDigests(sys.argv[1]) as left, BuildDigests(sys.argv[2]) as right:
+    path = first_difference(left, right)
+  if path is not None:
+    print(f"builds differ, first at {path}")
+    sys.exit(1)
+  print("builds are identical")
+
+if __name__ == "__main__":
+  main()